@@ -0,0 +1,457 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+''' Throughput, latency and memory of actor families
+
+    $ python benchmarks/bench_actors.py [--quick] [--family NAME] [--scenario NAME] [--json PATH]
+
+Every scenario is a graph of relay actors: a message injected by the
+driver is forwarded by actors along the graph and reported to the results
+inbox by the last one with its end-to-end latency. Messages are actor
+deliveries, so `msg/s` of different scenarios is comparable.
+'''
+import sys
+import time
+import asyncio
+import argparse
+import importlib
+import tracemalloc
+
+if '' not in sys.path:
+    sys.path.insert(0, '')
+
+from pyactors.inbox import QueueInbox, ProcessInbox
+from pyactors.exceptions import EmptyInboxException
+
+from benchmarks.common import Result, print_table, dump_json
+
+# how the driver runs actors of the family
+RM_SUPERVISED = 1
+RM_COOPERATIVE = 2
+RM_THREADS = 3
+RM_ASYNCIO = 4
+
+# seconds to wait for one case
+CASE_TIMEOUT = 120
+
+
+class Relay(object):
+    ''' Relay behaviour: forwards (seq, created, hops) messages to targets,
+    the last actor of the graph puts message latency to results
+
+    hops - forwards left, -1 for graphs ending with actor without targets
+    '''
+
+    targets = ()
+    results = None
+    fanin = 1
+
+    def setup(self, targets=None, results=None, fanin=1):
+        ''' set targets inboxes, results inbox and number of copies to wait for
+        '''
+        self.targets = tuple(targets) if targets else ()
+        self.results = results
+        self.fanin = fanin
+        self._copies = dict()
+
+    def handle(self, message):
+        ''' forward message or report its latency
+        '''
+        seq, created, hops = message
+        if self.targets and hops != 0:
+            forwarded = (seq, created, hops - 1)
+            for target in self.targets:
+                target.put(forwarded)
+            return
+        if self.fanin > 1:
+            copies = self._copies.get(seq, 0) + 1
+            if copies < self.fanin:
+                self._copies[seq] = copies
+                return
+            del self._copies[seq]
+        self.results.put(time.time() - created)
+
+
+class GeneratorRelay(Relay):
+    ''' Relay for generator, threaded and forked generator actors
+    '''
+
+    def loop(self):
+        while self.processing:
+            try:
+                self.handle(self.inbox.get())
+            except EmptyInboxException:
+                self.waiting = True
+            yield
+
+
+class GreenletRelay(Relay):
+    ''' Relay for gevent and eventlet actors
+    '''
+
+    def loop(self):
+        while self.processing:
+            try:
+                self.handle(self.inbox.get())
+            except EmptyInboxException:
+                self.waiting = True
+                self.sleep(0)
+
+
+class AsyncioRelay(Relay):
+    ''' Relay for asyncio actors
+    '''
+
+    async def loop(self):
+        while self.processing:
+            message = await self.receive()
+            if message is None:
+                break
+            self.handle(message)
+
+
+class Family(object):
+    ''' Actor family under benchmark
+    '''
+
+    def __init__(self, name, module, base, relay, mode):
+        ''' __init__
+        '''
+        self.name = name
+        self.module = module
+        self.base = base
+        self.relay = relay
+        self.mode = mode
+        self._actor_class = None
+        self._base_class = None
+
+    def load(self):
+        ''' import family module, raise ImportError if its library is missing
+        '''
+        if self._actor_class is None:
+            module = importlib.import_module(self.module)
+            self._base_class = getattr(module, self.base)
+            self._actor_class = type('{}{}'.format(self.base, self.relay.__name__),
+                                     (self.relay, self._base_class), dict())
+
+    @property
+    def in_process(self):
+        ''' True if actors of family live in the driver process
+        '''
+        return self.mode in (RM_SUPERVISED, RM_COOPERATIVE, RM_ASYNCIO)
+
+    def actor(self):
+        ''' return new relay actor
+        '''
+        return self._actor_class()
+
+    def parent(self):
+        ''' return new parent actor of the family
+        '''
+        return self._base_class()
+
+
+FAMILIES = [
+    Family('generator', 'pyactors.generator', 'GeneratorActor', GeneratorRelay, RM_SUPERVISED),
+    Family('greenlet', 'pyactors.green', 'GreenletActor', GreenletRelay, RM_COOPERATIVE),
+    Family('eventlet', 'pyactors.event', 'EventletActor', GreenletRelay, RM_COOPERATIVE),
+    Family('threaded', 'pyactors.thread', 'ThreadedGeneratorActor', GeneratorRelay, RM_THREADS),
+    Family('forked-generator', 'pyactors.generator', 'ForkedGeneratorActor', GeneratorRelay, RM_THREADS),
+    Family('forked-greenlet', 'pyactors.green', 'ForkedGreenletActor', GreenletRelay, RM_THREADS),
+    Family('forked-eventlet', 'pyactors.event', 'ForkedEventletActor', GreenletRelay, RM_THREADS),
+    Family('asyncio', 'pyactors.aio', 'AsyncioActor', AsyncioRelay, RM_ASYNCIO),
+]
+
+
+class Graph(object):
+    ''' Actors of scenario and the way to inject messages into them
+    '''
+
+    def __init__(self, actors, heads, hops=-1, deliveries=1, window=1):
+        ''' __init__
+
+        heads - function returning inboxes for message `seq`,
+        deliveries - actor deliveries per injected message,
+        window - injected messages in flight
+        '''
+        self.actors = actors
+        self.heads = heads
+        self.hops = hops
+        self.deliveries = deliveries
+        self.window = window
+
+    def inject(self, seq):
+        ''' put message `seq` to the graph
+        '''
+        message = (seq, time.time(), self.hops)
+        for inbox in self.heads(seq):
+            inbox.put(message)
+
+
+def ping_pong(family, results, count, width, depth):
+    ''' two actors bouncing one message at a time
+    '''
+    ping, pong = family.actor(), family.actor()
+    ping.setup([pong.inbox], results)
+    pong.setup([ping.inbox], results)
+    heads = (ping.inbox,)
+    return Graph([ping, pong], lambda seq: heads, hops=2, deliveries=3, window=1)
+
+
+def fan_out(family, results, count, width, depth):
+    ''' source broadcasts to `width` workers, sink waits for all copies
+    '''
+    source, sink = family.actor(), family.actor()
+    workers = [family.actor() for _ in range(width)]
+    source.setup([worker.inbox for worker in workers], results)
+    for worker in workers:
+        worker.setup([sink.inbox], results)
+    sink.setup(None, results, fanin=width)
+    heads = (source.inbox,)
+    return Graph([source, sink] + workers, lambda seq: heads, deliveries=1 + 2 * width, window=100)
+
+
+def pipeline(family, results, count, width, depth):
+    ''' chain of `depth` stages
+    '''
+    stages = [family.actor() for _ in range(depth)]
+    for stage, following in zip(stages, stages[1:]):
+        stage.setup([following.inbox], results)
+    stages[-1].setup(None, results)
+    heads = (stages[0].inbox,)
+    return Graph(stages, lambda seq: heads, deliveries=depth, window=100)
+
+
+def many_idle(family, results, count, width, depth):
+    ''' `count` idle actors, each of them gets one message
+    '''
+    actors = [family.actor() for _ in range(count)]
+    for actor in actors:
+        actor.setup(None, results)
+    return Graph(actors, lambda seq: (actors[seq].inbox,), window=count)
+
+
+class Scenario(object):
+    ''' Benchmark scenario
+    '''
+
+    def __init__(self, name, build, count, memory=False, in_process=False):
+        ''' __init__, count - injected messages in full run
+        '''
+        self.name = name
+        self.build = build
+        self.count = count
+        self.memory = memory
+        self.in_process = in_process
+
+
+SCENARIOS = [
+    Scenario('ping-pong', ping_pong, 2000),
+    Scenario('fan-out-fan-in', fan_out, 2000),
+    Scenario('pipeline', pipeline, 5000),
+    Scenario('many-idle', many_idle, 10000, memory=True, in_process=True),
+]
+
+
+def drain(inbox, timeout=None):
+    ''' return messages of inbox, wait up to timeout for the first one
+    '''
+    messages = list()
+    try:
+        messages.append(inbox.get(timeout=timeout))
+        while True:
+            messages.append(inbox.get())
+    except EmptyInboxException:
+        pass
+    return messages
+
+
+def drive(graph, count, pump):
+    ''' inject `count` messages keeping `graph.window` of them in flight,
+    return latencies. pump() runs actors and returns new latencies
+    '''
+    deadline = time.time() + CASE_TIMEOUT
+    latencies = list()
+    sent = 0
+    while len(latencies) < count:
+        while sent < count and sent - len(latencies) < graph.window:
+            graph.inject(sent)
+            sent += 1
+        latencies.extend(pump())
+        if time.time() > deadline:
+            raise RuntimeError('timeout, {} of {} messages'.format(len(latencies), count))
+    return latencies
+
+
+async def adrive(graph, count, results):
+    ''' drive() for asyncio actors
+    '''
+    deadline = time.time() + CASE_TIMEOUT
+    latencies = list()
+    sent = 0
+    while len(latencies) < count:
+        while sent < count and sent - len(latencies) < graph.window:
+            graph.inject(sent)
+            sent += 1
+        try:
+            latencies.extend(await results.aget_many(count, timeout=1))
+        except EmptyInboxException:
+            pass
+        if time.time() > deadline:
+            raise RuntimeError('timeout, {} of {} messages'.format(len(latencies), count))
+    return latencies
+
+
+def build(family, scenario, results, count, width, depth, start):
+    ''' build scenario graph and start it, return (graph, memory per actor)
+    '''
+    if scenario.memory:
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+    graph = scenario.build(family, results, count, width, depth)
+    start(graph.actors)
+    memory = None
+    if scenario.memory:
+        memory = float(tracemalloc.get_traced_memory()[0] - before) / len(graph.actors)
+        tracemalloc.stop()
+    return graph, memory
+
+
+def run_sync(family, scenario, count, width, depth):
+    ''' run case of supervised, cooperative and threaded families,
+    return (latencies, elapsed, memory per actor, deliveries per message)
+    '''
+    results = ProcessInbox() if family.mode == RM_THREADS and family.base.startswith('Forked') else QueueInbox()
+    parent = family.parent() if family.mode == RM_SUPERVISED else None
+
+    def start(actors):
+        if parent is not None:
+            for actor in actors:
+                parent.add_child(actor)
+            parent.start()
+        else:
+            for actor in actors:
+                actor.start()
+
+    graph, memory = build(family, scenario, results, count, width, depth, start)
+    if family.mode == RM_SUPERVISED:
+        def pump():
+            parent.run_once()
+            return drain(results)
+    elif family.mode == RM_COOPERATIVE:
+        def pump():
+            graph.actors[0].sleep(0)
+            return drain(results)
+    else:
+        def pump():
+            return drain(results, timeout=0.1)
+
+    try:
+        started = time.perf_counter()
+        latencies = drive(graph, count, pump)
+        elapsed = time.perf_counter() - started
+    finally:
+        if parent is not None:
+            parent.stop()
+        else:
+            for actor in graph.actors:
+                actor.stop()
+            for actor in graph.actors:
+                actor.join(5)
+    return latencies, elapsed, memory, graph.deliveries
+
+
+def run_asyncio(family, scenario, count, width, depth):
+    ''' run case of asyncio family
+    '''
+    from pyactors.inbox.aio import AsyncioInbox
+
+    async def main():
+        results = AsyncioInbox()
+        results.bind(asyncio.get_running_loop())
+
+        def start(actors):
+            for actor in actors:
+                actor.start()
+
+        graph, memory = build(family, scenario, results, count, width, depth, start)
+        try:
+            started = time.perf_counter()
+            latencies = await adrive(graph, count, results)
+            elapsed = time.perf_counter() - started
+        finally:
+            for actor in graph.actors:
+                actor.stop()
+            await asyncio.gather(*[actor.ajoin(5) for actor in graph.actors])
+        return latencies, elapsed, memory, graph.deliveries
+
+    return asyncio.run(main())
+
+
+def run_case(family, scenario, quick=False, width=4, depth=5):
+    ''' return Result of scenario for family
+    '''
+    count = max(scenario.count // 10, 10) if quick else scenario.count
+    result = Result('actors', scenario.name, family.name)
+    if scenario.in_process and not family.in_process:
+        result.error = 'in-process families only'
+        return result
+    try:
+        family.load()
+    except ImportError as err:
+        result.error = str(err)
+        return result
+    try:
+        if family.mode == RM_ASYNCIO:
+            latencies, elapsed, memory, deliveries = run_asyncio(family, scenario, count, width, depth)
+        else:
+            latencies, elapsed, memory, deliveries = run_sync(family, scenario, count, width, depth)
+    except Exception as err:
+        result.error = '{}: {}'.format(err.__class__.__name__, err)
+        return result
+    result.messages = count * deliveries
+    result.elapsed = elapsed
+    result.latencies = latencies
+    result.memory = memory
+    return result
+
+
+def run(families=None, scenarios=None, quick=False, width=4, depth=5):
+    ''' run benchmarks, filtered by family and scenario names, return results
+    '''
+    results = list()
+    for scenario in SCENARIOS:
+        if scenarios and scenario.name not in scenarios:
+            continue
+        for family in FAMILIES:
+            if families and family.name not in families:
+                continue
+            results.append(run_case(family, scenario, quick=quick, width=width, depth=depth))
+    return results
+
+
+def add_arguments(parser):
+    ''' add arguments of actor benchmarks to parser
+    '''
+    parser.add_argument('--family', action='append', choices=[family.name for family in FAMILIES],
+                        help='actor family, all by default')
+    parser.add_argument('--scenario', action='append', choices=[scenario.name for scenario in SCENARIOS],
+                        help='scenario, all by default')
+    parser.add_argument('--width', type=int, default=4, help='workers of fan-out-fan-in')
+    parser.add_argument('--depth', type=int, default=5, help='stages of pipeline')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--quick', action='store_true', help='10 times less messages')
+    parser.add_argument('--json', metavar='PATH', help='write results to JSON file, - for stdout')
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    results = run(args.family, args.scenario, quick=args.quick, width=args.width, depth=args.depth)
+    print_table(results)
+    if args.json:
+        dump_json(results, args.json)
+
+
+if __name__ == '__main__':
+    main()
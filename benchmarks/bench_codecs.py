@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+''' Compare registered codecs on BaseActor-like message dicts
+
+    $ python benchmarks/bench_codecs.py [--number N]
+'''
+import sys
+import uuid
+import timeit
+import argparse
+
+if '' not in sys.path:
+    sys.path.insert(0, '')
+
+from pyactors.serialization import codecs, get_codec
+
+
+def messages():
+    ''' return (name, message) pairs of representative messages
+    '''
+    small = dict(ssid=uuid.uuid4().hex, mid=uuid.uuid4().hex, route=3, hop=1, value=42)
+    medium = dict(small, values=list(range(100)), weights=[i / 3.0 for i in range(100)],
+                  tags=['tag-%d' % i for i in range(20)])
+    large = dict(small, text=u'lorem ipsum dolor sit amet ' * 400,
+                 records=[dict(id=i, name='name-%d' % i, score=i * 0.5) for i in range(200)])
+    return [('small', small), ('medium', medium), ('large', large)]
+
+
+def bench(codec, message, number):
+    ''' return encoded size, dumps and loads time per message in microseconds
+    '''
+    data = codec.dumps(message)
+    dumps = timeit.timeit(lambda: codec.dumps(message), number=number) / number * 1e6
+    loads = timeit.timeit(lambda: codec.loads(data), number=number) / number * 1e6
+    return len(data), dumps, loads
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--number', type=int, default=2000, help='iterations per measurement')
+    args = parser.parse_args()
+
+    print('{:<10} {:<8} {:>8} {:>10} {:>10}'.format('codec', 'message', 'bytes', 'dumps, us', 'loads, us'))
+    for name, message in messages():
+        for codec_name in codecs():
+            size, dumps, loads = bench(get_codec(codec_name), message, args.number)
+            print('{:<10} {:<8} {:>8} {:>10.2f} {:>10.2f}'.format(codec_name, name, size, dumps, loads))
+
+
+if __name__ == '__main__':
+    main()
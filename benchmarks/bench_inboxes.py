@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+''' Throughput and latency of inbox classes
+
+    $ python benchmarks/bench_inboxes.py [--quick] [--inbox NAME] [--json PATH]
+
+put-get: one put and one get per message, latency is the time of the pair.
+batch: put_many() and get_many() of `batch` messages, latency is the time
+of one batch round divided by its size.
+'''
+import sys
+import time
+import shutil
+import asyncio
+import argparse
+import tempfile
+
+if '' not in sys.path:
+    sys.path.insert(0, '')
+
+from benchmarks.common import Result, print_table, dump_json
+
+# message of the same shape as actor messages
+MESSAGE = dict(seq=0, value=42, name='message')
+
+
+class InboxCase(object):
+    ''' Inbox class under benchmark
+    '''
+
+    def __init__(self, name, create, close=None, in_loop=False):
+        ''' __init__
+
+        create() returns new inbox and raises ImportError or connection errors
+        if the inbox can't be used, close(inbox) releases it,
+        in_loop - inbox is used in running asyncio event loop
+        '''
+        self.name = name
+        self.create = create
+        self.close = close
+        self.in_loop = in_loop
+
+
+def _deque():
+    from pyactors.inbox import DequeInbox
+    return DequeInbox()
+
+
+def _queue():
+    from pyactors.inbox import QueueInbox
+    return QueueInbox()
+
+
+def _priority():
+    from pyactors.inbox import PriorityInbox
+    return PriorityInbox()
+
+
+def _process():
+    from pyactors.inbox import ProcessInbox
+    return ProcessInbox()
+
+
+def _shm():
+    from pyactors.inbox.shm import SharedMemoryInbox
+    return SharedMemoryInbox()
+
+
+def _mmap():
+    from pyactors.inbox.mmapq import MmapInbox
+    return MmapInbox(tempfile.mkdtemp(prefix='bench-mmap-'))
+
+
+def _close_mmap(inbox):
+    inbox.close()
+    shutil.rmtree(inbox.path, ignore_errors=True)
+
+
+def _asyncio():
+    from pyactors.inbox.aio import AsyncioInbox
+    inbox = AsyncioInbox()
+    inbox.bind(asyncio.get_running_loop())
+    return inbox
+
+
+def _gevent():
+    from pyactors.inbox.green import GeventInbox
+    return GeventInbox()
+
+
+def _eventlet():
+    from pyactors.inbox.event import EventletInbox
+    return EventletInbox()
+
+
+def _redis():
+    from pyactors.inbox.redismq import RedisInbox
+    name = 'bench-%s' % time.time()
+    return RedisInbox(get_queue=name, put_queue=name)
+
+
+def _rabbitmq():
+    from pyactors.inbox.rabbitmq import RabbitMQInbox
+    name = 'bench-%s' % time.time()
+    return RabbitMQInbox(get_queue=name, put_queue=name)
+
+
+INBOXES = [
+    InboxCase('DequeInbox', _deque),
+    InboxCase('QueueInbox', _queue),
+    InboxCase('PriorityInbox', _priority),
+    InboxCase('ProcessInbox', _process),
+    InboxCase('SharedMemoryInbox', _shm, close=lambda inbox: inbox.close()),
+    InboxCase('MmapInbox', _mmap, close=_close_mmap),
+    InboxCase('AsyncioInbox', _asyncio, in_loop=True),
+    InboxCase('GeventInbox', _gevent),
+    InboxCase('EventletInbox', _eventlet),
+    InboxCase('RedisInbox', _redis),
+    InboxCase('RabbitMQInbox', _rabbitmq),
+]
+
+
+def put_get(inbox, count, batch):
+    ''' return latencies of put and get pairs
+    '''
+    timer = time.perf_counter
+    latencies = list()
+    for _ in range(count):
+        started = timer()
+        inbox.put(MESSAGE)
+        inbox.get(timeout=1)
+        latencies.append(timer() - started)
+    return latencies
+
+
+def batches(inbox, count, batch):
+    ''' return latencies per message of put_many and get_many rounds
+    '''
+    timer = time.perf_counter
+    messages = [MESSAGE] * batch
+    latencies = list()
+    for _ in range(max(count // batch, 1)):
+        started = timer()
+        inbox.put_many(messages)
+        received = 0
+        while received < batch:
+            received += len(inbox.get_many(batch - received, timeout=1))
+        latencies.append((timer() - started) / batch)
+    return latencies
+
+
+# scenario name, function and messages in full run
+SCENARIOS = [
+    ('put-get', put_get, 50000),
+    ('batch', batches, 200000),
+]
+
+
+def measure(case, scenario, count, batch):
+    ''' return latencies and elapsed seconds of scenario for new inbox
+    '''
+    inbox = case.create()
+    try:
+        started = time.perf_counter()
+        latencies = scenario(inbox, count, batch)
+        elapsed = time.perf_counter() - started
+    finally:
+        if case.close is not None:
+            case.close(inbox)
+    return latencies, elapsed
+
+
+def run_case(case, name, scenario, count, quick=False, batch=100):
+    ''' return Result of scenario for inbox case
+    '''
+    count = max(count // 10, batch) if quick else count
+    result = Result('inboxes', name, case.name)
+    try:
+        if case.in_loop:
+            async def main():
+                return measure(case, scenario, count, batch)
+            latencies, elapsed = asyncio.run(main())
+        else:
+            latencies, elapsed = measure(case, scenario, count, batch)
+    except Exception as err:
+        result.error = '{}: {}'.format(err.__class__.__name__, err)
+        return result
+    result.messages = count if scenario is put_get else max(count // batch, 1) * batch
+    result.elapsed = elapsed
+    result.latencies = latencies
+    return result
+
+
+def run(inboxes=None, scenarios=None, quick=False, batch=100):
+    ''' run benchmarks, filtered by inbox and scenario names, return results
+    '''
+    results = list()
+    for name, scenario, count in SCENARIOS:
+        if scenarios and name not in scenarios:
+            continue
+        for case in INBOXES:
+            if inboxes and case.name not in inboxes:
+                continue
+            results.append(run_case(case, name, scenario, count, quick=quick, batch=batch))
+    return results
+
+
+def add_arguments(parser):
+    ''' add arguments of inbox benchmarks to parser
+    '''
+    parser.add_argument('--inbox', action='append', choices=[case.name for case in INBOXES],
+                        help='inbox class, all by default')
+    parser.add_argument('--batch', type=int, default=100, help='messages per put_many and get_many')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--quick', action='store_true', help='10 times less messages')
+    parser.add_argument('--json', metavar='PATH', help='write results to JSON file, - for stdout')
+    parser.add_argument('--scenario', action='append', choices=[name for name, _, _ in SCENARIOS],
+                        help='scenario, all by default')
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    results = run(args.inbox, args.scenario, quick=args.quick, batch=args.batch)
+    print_table(results)
+    if args.json:
+        dump_json(results, args.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+''' Shared helpers of benchmarks: results, statistics and reports
+'''
+import sys
+import json
+import time
+import platform
+
+if '' not in sys.path:
+    sys.path.insert(0, '')
+
+import pyactors
+
+
+class Result(object):
+    ''' Result of one benchmark case
+    '''
+
+    def __init__(self, suite, scenario, subject, messages=0, elapsed=0.0, latencies=None,
+                 memory=None, error=None):
+        ''' __init__, latencies in seconds, memory in bytes per actor
+        '''
+        self.suite = suite
+        self.scenario = scenario
+        self.subject = subject
+        self.messages = messages
+        self.elapsed = elapsed
+        self.latencies = latencies if latencies else list()
+        self.memory = memory
+        self.error = error
+
+    @property
+    def rate(self):
+        ''' messages per second
+        '''
+        return self.messages / self.elapsed if self.elapsed > 0 else 0.0
+
+    def as_dict(self):
+        ''' return result as dict for JSON report
+        '''
+        return dict(suite=self.suite, scenario=self.scenario, subject=self.subject,
+                    messages=self.messages, elapsed=self.elapsed, rate=self.rate,
+                    p50=percentile(self.latencies, 50), p99=percentile(self.latencies, 99),
+                    memory_per_actor=self.memory, error=self.error)
+
+
+def percentile(values, percent):
+    ''' return percentile of values, None if there are no values
+    '''
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(percent / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def timed(func, *args, **kwargs):
+    ''' return (result of func, elapsed seconds)
+    '''
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def _format(value, pattern):
+    ''' format value or dash if it's not defined
+    '''
+    return '-' if value is None else pattern.format(value)
+
+
+def print_table(results, stream=None):
+    ''' print results as table
+    '''
+    stream = sys.stdout if stream is None else stream
+    row = '{:<8} {:<16} {:<22} {:>9} {:>12} {:>10} {:>10} {:>12}'
+    stream.write(row.format('suite', 'scenario', 'subject', 'messages', 'msg/s',
+                            'p50, us', 'p99, us', 'bytes/actor') + '\n')
+    for result in results:
+        if result.error:
+            stream.write(row.format(result.suite, result.scenario, result.subject, '-', 'skipped',
+                                    '-', '-', '-') + '  ' + result.error + '\n')
+            continue
+        data = result.as_dict()
+        stream.write(row.format(result.suite, result.scenario, result.subject, result.messages,
+                                _format(data['rate'], '{:.0f}'),
+                                _format(data['p50'] and data['p50'] * 1e6, '{:.1f}'),
+                                _format(data['p99'] and data['p99'] * 1e6, '{:.1f}'),
+                                _format(result.memory, '{:.0f}')) + '\n')
+
+
+def dump_json(results, path):
+    ''' write results with environment details to JSON file, '-' - to stdout
+    '''
+    report = dict(version=pyactors.__version__, python=platform.python_version(),
+                  implementation=platform.python_implementation(), platform=platform.platform(),
+                  created=time.time(), results=[result.as_dict() for result in results])
+    if path == '-':
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    else:
+        with open(path, 'w') as report_file:
+            json.dump(report, report_file, indent=2)
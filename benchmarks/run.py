@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+''' Run actor and inbox benchmarks, print one table and write JSON report
+
+    $ python benchmarks/run.py [--quick] [--suite actors|inboxes] [--json PATH]
+
+Filters of bench_actors.py (--family, --scenario) and bench_inboxes.py
+(--inbox) are accepted. Families and inboxes which libraries or servers
+are not available are reported as skipped.
+'''
+import sys
+import argparse
+
+if '' not in sys.path:
+    sys.path.insert(0, '')
+
+from benchmarks import bench_actors, bench_inboxes
+from benchmarks.common import print_table, dump_json
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--quick', action='store_true', help='10 times less messages')
+    parser.add_argument('--json', metavar='PATH', help='write results to JSON file, - for stdout')
+    parser.add_argument('--suite', action='append', choices=['actors', 'inboxes'], help='suite, all by default')
+    bench_actors.add_arguments(parser)
+    bench_inboxes.add_arguments(parser)
+    args = parser.parse_args()
+
+    results = list()
+    if not args.suite or 'actors' in args.suite:
+        results.extend(bench_actors.run(args.family, args.scenario, quick=args.quick,
+                                        width=args.width, depth=args.depth))
+    if not args.suite or 'inboxes' in args.suite:
+        results.extend(bench_inboxes.run(args.inbox, quick=args.quick, batch=args.batch))
+    print_table(results)
+    if args.json:
+        dump_json(results, args.json)
+
+
+if __name__ == '__main__':
+    main()
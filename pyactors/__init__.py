@@ -26,3 +26,5 @@ __author__ = '''
 '''
 
 __version__ = '0.5.2'
+
+from .base import Actor, ActorSystem
@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+import time
+import asyncio
+import functools
+
+from .base import Actor, BaseActor, AF_ASYNCIO
+from .exceptions import EmptyInboxException
+from .inbox.aio import AsyncioInbox, running_loop
+
+
+class AsyncioActor(Actor):
+    ''' Asyncio Actor
+
+    loop() and supervise() are coroutines, the actor runs as a task of the
+    event loop it's started in. Actors await messages by receive(), so
+    thousands of idle actors cost nothing but their tasks. Children of
+    asyncio actor must be asyncio actors, they run in the same event loop.
+    '''
+
+    def __init__(self, name=None, logger=None):
+        ''' __init__
+        '''
+        super(AsyncioActor, self).__init__(name=name, logger=logger)
+
+        # inbox
+        self.inbox = AsyncioInbox()
+
+        # Actor Family
+        self._family = AF_ASYNCIO
+
+        self._loop = None
+        self._task = None
+        self._changed = None
+
+    async def sleep(self, timeout=0):
+        ''' actor sleep for timeout
+        '''
+        await asyncio.sleep(timeout)
+
+    def start(self):
+        ''' start actor in running event loop, use run() to start it in new one
+        '''
+        loop = running_loop()
+        if loop is None:
+            raise RuntimeError('AsyncioActor must be started in running event loop, {}'.format(self))
+        self._loop = loop
+        self.inbox.bind(loop)
+        super(AsyncioActor, self).start()
+        self._task = loop.create_task(self._main())
+
+    async def _main(self):
+        ''' actor task, run loop() or supervise() if actor has children
+        '''
+        try:
+            if len(self.children) > 0:
+                await self.supervise()
+            else:
+                await self.loop()
+        except Exception as err:
+            self.logger.error(err)
+        finally:
+            if self.processing:
+                self.stop()
+
+    def stop(self, timeout=None):
+        ''' stop actor, wake up its receive() and supervise()
+        '''
+        report = super(AsyncioActor, self).stop(timeout=timeout)
+        self.inbox.wakeup()
+        self._notify()
+        return report
+
+    async def ajoin(self, timeout=None):
+        ''' await actor termination, return True if actor is terminated
+        '''
+        if self._task is not None and not self._task.done():
+            done, _ = await asyncio.wait((self._task,), timeout=timeout)
+            if not done:
+                return False
+        return self._terminated.is_set()
+
+    def run(self):
+        ''' run actor in new event loop until it's over
+        '''
+        async def main():
+            self.start()
+            await self.ajoin()
+        asyncio.run(main())
+
+    async def receive(self, timeout=None):
+        ''' await next message up to timeout seconds, None - until it comes.
+        Return None if actor is stopped or timeout is over
+        '''
+        deadline = None if timeout is None else time.time() + timeout
+        while self.handle_system():
+            if len(self.inbox) > 0:
+                return self.inbox.get()
+            remaining = None if deadline is None else deadline - time.time()
+            if remaining is not None and remaining <= 0:
+                break
+            self.waiting = True
+            try:
+                return await self.inbox.aget(remaining)
+            except EmptyInboxException:
+                continue
+            finally:
+                self.waiting = False
+        return None
+
+    async def loop(self):
+        ''' processing loop, used for actor without children
+        '''
+        raise RuntimeError('AsyncioActor.loop() is not implemented')
+
+    def _notify(self):
+        ''' wake up supervise(), from any thread
+        '''
+        changed, loop = self._changed, self._loop
+        if changed is None:
+            return
+        if loop is running_loop():
+            changed.set()
+        else:
+            loop.call_soon_threadsafe(changed.set)
+
+    def _child_done(self, running, address, task):
+        ''' forget terminated child, wake up supervise()
+        '''
+        running.discard(address)
+        self._notify()
+
+    async def supervise(self):
+        ''' supervising loop, used when actor has children
+
+        sleeps until a child task is over, a system message comes or the
+        actor is stopped, so supervising costs nothing while children work
+        '''
+        self.logger.debug('supervise started')
+        self._changed = asyncio.Event()
+        self.inbox.subscribe(self._notify)
+        running = set()
+        for child in self.children:
+            if child._task is not None and not child._task.done():
+                running.add(child.address)
+                child._task.add_done_callback(functools.partial(self._child_done, running, child.address))
+        try:
+            while running and self.handle_system():
+                self._changed.clear()
+                await self._changed.wait()
+        finally:
+            self.inbox.unsubscribe(self._notify)
+            self._changed = None
+        self.logger.debug('supervise stopped')
+
+
+class BaseAsyncioActor(AsyncioActor, BaseActor):
+    ''' BaseActor on event loop, messages are awaited by receive() and
+    process() may be a coroutine
+    '''
+
+    async def loop(self):
+        ''' main loop, see BaseActor.loop()
+        '''
+        self.logger.debug("{0} --- Call loop.".format(self))
+
+        while self.processing:
+            timeout = self.wait_timeout if self.is_waiting_message else 0
+            message = await self.receive(timeout)
+            if message is None:
+                if self.is_waiting_message or not self.processing:
+                    break
+                message = self.message if self.envelope is None else self.envelope
+
+            self.message = message
+            self.recieve()
+            if self.validate():
+                result = self.process()
+                if asyncio.iscoroutine(result):
+                    await result
+            await asyncio.sleep(0)
+        self.end()
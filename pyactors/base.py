@@ -1,20 +1,53 @@
 #!/usr/bin/env python
 # -*- coding: utf8 -*-
+import time
 import uuid
 import logging
+import threading
+import functools
+import collections
 
 from .exceptions import EmptyInboxException
+from .registry import ActorRegistry
+from .routing import route_table
+from .reply import reply_channel
+from .messages import Envelope, MessageView, SystemMessage, SM_STOP, SM_PING, SM_PONG
 
 # Actor Family
 AF_GENERATOR = 0
 AF_GREENLET = 1
 AF_THREAD = 2
 AF_PROCESS = 3
+AF_ASYNCIO = 4
+
+
+class StopReport(object):
+    ''' Result of stopping actor's children '''
+
+    def __init__(self, stopped=None, failed=None):
+        self.stopped = stopped if stopped else list()
+        self.failed = failed if failed else list()
+
+    def __bool__(self):
+        ''' return True if all children are stopped '''
+        return not self.failed
+
+    def __str__(self):
+        return u'stopped: {}, failed: {}'.format(len(self.stopped), ', '.join(str(actor) for actor in self.failed))
 
 
 class Actor(object):
     ''' Base class for creation actors '''
 
+    # how long the waiting actor blocks on its inbox, None - until new message or stop
+    idle_timeout = None
+    # child turns between two iteractions of supervise()
+    supervise_budget = 1
+    # run_once() iterations given to a ready child per turn
+    supervise_throughput = 1
+    # how long stop() waits for termination of children, None - forever
+    stop_timeout = 10.0
+
     def __init__(self, name=None, logger=None):
         self.logger = logger if logger else logging.getLogger(self.__class__.__name__)
 
@@ -28,6 +61,19 @@ class Actor(object):
         self._processing = False
         self.processing_loop = None
         self.supervise_loop = None
+        self.stop_report = None
+
+        # set while actor is not running
+        self._terminated = threading.Event()
+        self._terminated.set()
+
+        self._registry = ActorRegistry()
+        self._registry.register(self)
+
+        # supervise() ready queue, defined while actor is supervising
+        self._ready = None
+        self._scheduled = set()
+        self._listeners = dict()
 
     def __str__(self):
         ''' represent actor as string '''
@@ -71,18 +117,44 @@ class Actor(object):
         else:
             raise RuntimeError('Incorrect processing type, {}. It must be boolean'.format(type(value)))
 
+    @property
+    def registry(self):
+        ''' property get registry of actor's system '''
+        return self._registry
+
+    def _subtree(self):
+        ''' iterate over actor and all its descendants '''
+        stack = [self]
+        while stack:
+            actor = stack.pop()
+            yield actor
+            stack.extend(actor._children.values())
+
     def add_child(self, actor):
         ''' add actor's child '''
-        if actor not in self.children:
+        if actor.address not in self._children:
+            for member in list(actor._subtree()):
+                member._registry.unregister(member)
+                self._registry.register(member)
+                member._registry = self._registry
             actor.parent = self
             self._children[actor.address] = actor
+            if self._ready is not None:
+                self._watch(actor)
         else:
             raise RuntimeError('Actor exists: %s', actor)
 
     def remove_child(self, address):
         ''' remove child by its address '''
-        if address in self._children.keys():
-            self._children.pop(address)
+        if address in self._children:
+            actor = self._children.pop(address)
+            actor.parent = None
+            self._unwatch(actor)
+            registry = ActorRegistry()
+            for member in list(actor._subtree()):
+                self._registry.unregister(member)
+                registry.register(member)
+                member._registry = registry
         else:
             raise RuntimeError('Actor does not exist, address: %s', address)
 
@@ -91,6 +163,15 @@ class Actor(object):
         ''' return list of actor's children '''
         return list(self._children.values())
 
+    def _ancestors(self):
+        ''' return list of actor's parent, grandparent and so on '''
+        ancestors = list()
+        actor = self.parent
+        while actor is not None:
+            ancestors.append(actor)
+            actor = actor.parent
+        return ancestors
+
     def find(self, address=None, actor_class=None, actor_name=None):
         """ find children by criterias
 
@@ -107,67 +188,133 @@ class Actor(object):
         the given name.
 
         return existing actors by criterias.
+
+        Known actors are the children, the ancestors and the children of the
+        ancestors. Candidates are taken from the registry indexes, so the cost
+        is O(matches + depth) instead of a scan of the tree.
         """
-        known_actors = list()
-        known_actors.extend(self.children)
-        if self.parent:
-            known_actors.append(self.parent)
-            known_actors.extend(self.parent.find(address, actor_class, actor_name))
-        known_actors = list(set(known_actors))
-        result = list()
+        ancestors = self._ancestors()
 
         if address:
-            # when address is only one
-            if isinstance(address, str):
-                result.extend([actor for actor in known_actors if actor.address == address])
-            # when address if multiple
-            elif isinstance(address, (list, tuple)):
-                result.extend([actor for actor in known_actors if actor.address in address])
-            return result
-
-        if actor_class:
-            result.extend([actor for actor in known_actors if isinstance(actor, actor_class)])
-            return result
-
-        if actor_name:
-            result.extend([actor for actor in known_actors if actor._name == actor_name])
-            return result
-
-        return known_actors
+            candidates = self._registry.by_address(address)
+        elif actor_class:
+            candidates = self._registry.by_class(actor_class)
+        elif actor_name:
+            candidates = self._registry.by_name(actor_name)
+        else:
+            known_actors = self.children
+            for ancestor in ancestors:
+                known_actors.append(ancestor)
+                known_actors.extend(ancestor._children.values())
+            return known_actors
+
+        scopes = set(ancestor.address for ancestor in ancestors)
+        visible = set(scopes)
+        visible.add(self.address)
+        return [actor for actor in candidates
+                if actor.address in scopes or (actor.parent is not None and actor.parent.address in visible)]
 
     def start(self):
         ''' start actor
         '''
         self.waiting = False
         self.processing = True
+        self._terminated.clear()
 
         if len(self.children) > 0:
             # start child-actors
             for child in self.children:
                 child.start()
 
-    def _stop_children(self):
-        ''' stop children
+    def join(self, timeout=None):
+        ''' wait for actor termination, return True if actor is terminated
         '''
-        if len(self.children) == 0:
-            return
-        # stop child-actors
-        while True:
-            stopped_children = 0
-            for child in self.children:
-                if child.processing:
-                    child.stop()
-                else:
-                    stopped_children += 1
-            if stopped_children == len(self.children):
-                break
+        return self._terminated.wait(timeout)
 
-    def stop(self):
-        ''' stop actor and its children
+    def metrics(self):
+        ''' return inbox metrics of actor: depth, dropped and blocked messages
+        '''
+        if self.inbox is None:
+            return dict(depth=0, dropped=0, blocked=0)
+        metrics = getattr(self.inbox, 'metrics', None)
+        if metrics is None:
+            return dict(depth=len(self.inbox), dropped=0, blocked=0)
+        return metrics()
+
+    def _stop_children(self, timeout=None):
+        ''' stop children and wait for their termination, return StopReport
         '''
-        self._stop_children()
+        children = self.children
+        for child in children:
+            if child.processing:
+                child.stop()
+
+        deadline = None if timeout is None else time.time() + timeout
+        report = StopReport()
+        for child in children:
+            remaining = None if deadline is None else max(deadline - time.time(), 0)
+            if child.join(remaining):
+                report.stopped.append(child)
+            else:
+                report.failed.append(child)
+        if report.failed:
+            self.logger.warning(u'{} - children did not stop in time: {}'.format(self, report))
+        return report
+
+    def stop(self, timeout=None):
+        ''' stop actor and its children, return StopReport
+
+        `timeout` limits waiting for children termination, by default `stop_timeout`.
+        Threaded and forked actors are terminated when their run() is over,
+        other actors when they are stopped.
+        '''
+        report = self._stop_children(self.stop_timeout if timeout is None else timeout)
         self.processing = False
+        if self.waiting:
+            wakeup = getattr(self.inbox, 'wakeup', None)
+            if wakeup is not None:
+                wakeup()
         self.waiting = False
+        if self._family not in (AF_THREAD, AF_PROCESS):
+            self._terminated.set()
+        self.stop_report = report
+        return report
+
+    def request_stop(self):
+        ''' ask actor to stop by system message, the actor stops before it takes
+        queued messages. Works for actors running in other threads and processes
+        '''
+        put_system = getattr(self.inbox, 'put_system', None)
+        if put_system is None:
+            return self.stop()
+        put_system(SystemMessage(SM_STOP))
+
+    def handle_system(self):
+        ''' handle system messages waiting in inbox, return False if actor is stopped
+        '''
+        get_system = getattr(self.inbox, 'get_system', None)
+        if get_system is None:
+            return self.processing
+        message = get_system()
+        while message is not None:
+            self.on_system(message)
+            if not self.processing:
+                break
+            message = get_system()
+        return self.processing
+
+    def on_system(self, message):
+        ''' handle one system message, override to handle other kinds
+        '''
+        if message.kind == SM_STOP:
+            self.stop()
+        elif message.kind == SM_PING:
+            for actor in self.registry.by_address(message.sender) if message.sender else []:
+                actor.inbox.put_system(SystemMessage(SM_PONG, sender=self.address, payload=message.payload))
+        elif message.kind == SM_PONG:
+            self.logger.debug(u'{} - pong from {}'.format(self, message.sender))
+        else:
+            self.logger.warning(u'{} - unknown system message: {}'.format(self, message))
 
     def run(self):
         ''' run actor
@@ -184,64 +331,224 @@ class Actor(object):
         '''
         self.inbox.put(message)
 
+    def ask(self, message, timeout=None):
+        ''' send message to actor in Envelope with new correlation id, return
+        ReplyFuture of the reply. The future fails with ReplyError if there is
+        no reply in timeout seconds
+        '''
+        future = reply_channel.open(timeout)
+        self.inbox.put(Envelope(message, target=self.address, cid=future.cid))
+        return future
+
+    def reply(self, result, envelope=None):
+        ''' reply to the asked message, by default to the current envelope of BaseActor
+        '''
+        envelope = getattr(self, 'envelope', None) if envelope is None else envelope
+        if envelope is None or envelope.cid is None:
+            raise RuntimeError('Nothing to reply to, the message is not asked: {}'.format(self))
+        self._reply(envelope.cid, True, result)
+
+    def _reply(self, cid, ok, result):
+        ''' complete the reply future of this process or pass the reply to parent,
+        forked actors deliver it to the process that started them
+        '''
+        replies = getattr(self, '_replies', None)
+        if replies is not None and replies.forked and not reply_channel.pending(cid):
+            replies.put(cid, ok, result)
+            return
+        delivered = reply_channel.resolve(cid, result) if ok else reply_channel.fail(cid, result)
+        if delivered:
+            return
+        if self.parent is not None:
+            self.parent._reply(cid, ok, result)
+        else:
+            self.logger.warning(u'{} - nobody waits for reply, correlation id: {}'.format(self, cid))
+
     def loop(self):
         ''' main loop
         '''
         raise RuntimeError('Actor.loop() is not implemented')
 
+    def _schedule(self, child):
+        ''' put child to ready queue of supervise() '''
+        if child.address not in self._scheduled:
+            self._scheduled.add(child.address)
+            self._ready.append(child)
+
+    def _watch(self, child):
+        ''' make child ready, wake it up on new messages if inbox supports listeners '''
+        if child.family not in (AF_GENERATOR, AF_GREENLET):
+            return
+        subscribe = getattr(child.inbox, 'subscribe', None)
+        if subscribe is not None and child.address not in self._listeners:
+            listener = functools.partial(self._schedule, child)
+            self._listeners[child.address] = listener
+            subscribe(listener)
+        self._schedule(child)
+
+    def _unwatch(self, child):
+        ''' forget child in supervise() ready queue '''
+        listener = self._listeners.pop(child.address, None)
+        if listener is not None:
+            child.inbox.unsubscribe(listener)
+        self._scheduled.discard(child.address)
+
+    def _turn(self, child):
+        ''' run child for up to `supervise_throughput` iterations, return True if child is ready '''
+        for _ in range(max(self.supervise_throughput, 1)):
+            child.waiting = False
+            try:
+                child.run_once()
+            except Exception as err:
+                self.logger.error(err)
+            if not child.processing:
+                return False
+            if child.waiting and len(child.inbox) == 0:
+                # parked until the next message, if inbox can notify about it
+                return child.address not in self._listeners
+        return True
+
     def supervise(self):
         ''' supervise loop
+
+        Only ready children are stepped: a child is ready while its generator
+        has work to do, a child waiting for messages is parked until the next
+        put to its inbox. Stopped children are detected while stepping; when
+        nobody is ready all children are checked.
         '''
         self.logger.debug('supervise started')
-        while self.processing:
-            stopped_children = 0
-            for child in self.children:
-                if child.processing:
-                    if child.family in (AF_GENERATOR, AF_GREENLET):
-                        try:
-                            child.run_once()
-                        except Exception as err:
-                            self.logger.error(err)
-                else:
-                    stopped_children += 1
+        self._ready = collections.deque()
+        for child in self.children:
+            self._watch(child)
+        try:
+            while self.processing:
+                if not self._ready:
+                    if not any(child.processing for child in self.children):
+                        break
+                    yield
+                    continue
+
+                for _ in range(max(self.supervise_budget, 1)):
+                    if not self._ready:
+                        break
+                    child = self._ready.popleft()
+                    self._scheduled.discard(child.address)
+                    if child.address not in self._children:
+                        continue
+                    if child.processing and self._turn(child):
+                        self._schedule(child)
+                    elif not child.processing:
+                        self._unwatch(child)
                 yield
-
-            if len(self.children) == stopped_children:
-                break
+        finally:
+            for child in self.children:
+                self._unwatch(child)
+            self._ready = None
         self.logger.debug('supervise stopped')
 
 
 class ActorSystem(Actor):
-    ''' Actor System '''
-    pass
+    ''' Actor System
+
+    Root of actors tree. The system keeps the registry (see `registry` property)
+    shared by all actors added to the tree, it's used by find() for lookups.
+
+    The system can host generator and greenlet actors in a pool of worker
+    processes, see start_pool() and spawn(), or asyncio actors in a pool of
+    event loop processes, see start_loop_pool().
+    '''
+
+    pool = None
+
+    def placement(self, address, workers):
+        ''' return index of pool worker for actor address '''
+        return int(address, 16) % workers
+
+    def start_pool(self, workers=None):
+        ''' start process pool, by default with one worker per CPU core '''
+        from .pool import ProcessPool
+
+        if self.pool is not None:
+            raise RuntimeError('Process pool is started already')
+        self.pool = ProcessPool(workers=workers, placement=self.placement, logger=self.logger)
+        self.pool.start()
+        return self.pool
+
+    def start_loop_pool(self, workers=None, use_uvloop=None):
+        ''' start pool of event loop processes for asyncio actors, one worker per
+        CPU core by default. Workers use uvloop if it's installed and `use_uvloop`
+        is not False, see pyactors.loop_pool.loop_policy()
+        '''
+        from .loop_pool import LoopPool
+
+        if self.pool is not None:
+            raise RuntimeError('Process pool is started already')
+        self.pool = LoopPool(workers=workers, placement=self.placement, logger=self.logger,
+                             use_uvloop=use_uvloop)
+        self.pool.start()
+        return self.pool
+
+    def spawn(self, actor_class, *args, **kwargs):
+        ''' create actor in process pool, return reference to the actor '''
+        if self.pool is None:
+            raise RuntimeError('Process pool is not started')
+        return self.pool.spawn(actor_class, *args, **kwargs)
+
+    def stop(self, timeout=None):
+        ''' stop actor system, its children and process pool '''
+        report = super(ActorSystem, self).stop(timeout=timeout)
+        if self.pool is not None:
+            self.pool.stop(timeout=self.stop_timeout if timeout is None else timeout)
+            self.pool = None
+        return report
 
 
 class BaseActor(Actor):
     message = None
+    # envelope of the current message, None for plain dict messages
+    envelope = None
     steps = list()
 
+    # how long loop() waits for the next message before the loop ends
+    wait_timeout = 0.01
+    # messages taken from inbox per wakeup of loop()
+    batch_size = 1
+
     def __init__(self, **kwargs):
         self.allow_parent = kwargs.pop('allow_parent', getattr(self, 'allow_parent', False))
         super(BaseActor, self).__init__(name=kwargs.get('name'), logger=kwargs.get('logger'))
+        self._route = None
+        self._route_targets = dict()
 
     def loop(self):
         self.logger.debug("{0} --- Call loop.".format(self))
 
         while self.processing:
+            if not self.handle_system():
+                break
 
             try:
-                self.message = self.inbox.get()
+                if self.batch_size > 1:
+                    messages = self.inbox.get_many(self.batch_size, timeout=self._wait_timeout)
+                else:
+                    messages = (self.inbox.get(timeout=self._wait_timeout),)
             except EmptyInboxException:
                 if self.is_waiting_message:
-                    self.sleep()
                     break
+                messages = (self.message if self.envelope is None else self.envelope,)
             if len(self.inbox) > 0:
                 self.logger.debug("{0} --- Execute loop. Inbox: {1}".format(self, len(self.inbox)))
 
-            self.recieve()
+            for index, message in enumerate(messages):
+                if index and not self.processing:
+                    self.logger.warning("{0} --- Stopped, {1} messages of batch are dropped".format(
+                        self, len(messages) - index))
+                    break
+                self.message = message
+                self.recieve()
 
-            if self.validate():
-                self.process()
+                if self.validate():
+                    self.process()
         self.end()
 
     def send(self, **message):
@@ -250,18 +557,24 @@ class BaseActor(Actor):
         message = dict() if not isinstance(message, dict) else message
 
         if self.message and not overwrite:
-            data = self.message.copy()
-            data.update(message)
+            # copy-on-write, the next hop gets only the new fields on top of the message
+            current = self.message if isinstance(self.message, MessageView) else MessageView(self.message)
+            data = current.merge(message)
         else:
-            data = message
-
-        if self.steps:
-            steps = self.steps[:]
-            next_class = steps.pop(0)
-            data['steps'] = steps
+            data = MessageView(message)
+
+        route = self._current_route()
+        if route is not None:
+            route_id, hop = route
+            actors, crosses_process = self._resolve_route(route_id, hop)
+            # route ids are local to the process, forked actors get the steps
+            steps = list(route_table.steps(route_id)[hop + 1:]) if crosses_process else None
+            envelope = self.envelope
+            cid = envelope.cid if envelope is not None else None
+            created = envelope.created if envelope is not None else None
 
-            actors = self.find(actor_class=next_class)
             if not actors:
+                next_class = route_table.steps(route_id)[hop]
                 error_message = dict(message=u"Coudn't find next target in system: {0}".format(next_class))
                 error_message.update(dict(sid=data.get('ssid'))) if 'ssid' in data else None
                 error_message.update(dict(sid=data.get('mid'))) if 'mid' in data else None
@@ -269,14 +582,41 @@ class BaseActor(Actor):
 
             for actor in actors:
                 self.logger.debug("<{0}> - Send Message: {{{1}}} To: {2}".format(self, data.keys(), actor))
-                actor.inbox.put(data)
+                # every target gets its own view, changes of one are not seen by others
+                actor.inbox.put(Envelope(data.share(), sender=self.address, target=actor.address, route=route_id,
+                                         hop=hop + 1, steps=steps, cid=cid, created=created))
                 actor.start()
         elif self.parent and (allow_parent or self.allow_parent):
             self.parent.send(data)
         else:
             self.logger.debug(u"<{0}> - Send To Next: {1}".format(self, data))
 
-        self.sleep()
+        if self._family != AF_ASYNCIO:
+            # asyncio actors yield to event loop in their loop()
+            self.sleep(0)
+
+    def _current_route(self):
+        ''' return (route id, hop) of the next step or None if the route is over '''
+        if self._route is None:
+            if not self.steps:
+                return None
+            self._route = (route_table.compile(self.steps), 0)
+        route_id, hop = self._route
+        if hop >= len(route_table.steps(route_id)):
+            return None
+        return self._route
+
+    def _resolve_route(self, route_id, hop):
+        ''' return target actors of the route step, cached until the topology changes '''
+        key = (route_id, hop)
+        registry = self._registry
+        cached = self._route_targets.get(key)
+        if cached is None or cached[0] is not registry or cached[1] != registry.version:
+            actors = self.find(actor_class=route_table.steps(route_id)[hop])
+            crosses_process = any(getattr(actor, '_family', None) == AF_PROCESS for actor in actors)
+            cached = (registry, registry.version, actors, crosses_process)
+            self._route_targets[key] = cached
+        return cached[2], cached[3]
 
     def error(self, message=None, **kwargs):
         self.logger.error(u"<{0}> - Got Error: {1}".format(self, message))
@@ -293,6 +633,8 @@ class BaseActor(Actor):
             out.update(kwargs)
 
             self.parent.send(out)
+        if self.envelope is not None and self.envelope.cid is not None:
+            self._reply(self.envelope.cid, False, message)
         self.stop()
 
     def sleep(self, timeout=None):
@@ -302,17 +644,55 @@ class BaseActor(Actor):
             self._sleep(timeout)
 
     def _sleep(self, timeout=None):
-        timeout = timeout if timeout else 0.01
-        return super(BaseActor, self).sleep(timeout)
+        timeout = 0.01 if timeout is None else timeout
+        time.sleep(timeout)
+
+    @property
+    def _wait_timeout(self):
+        ''' timeout for blocking inbox get, None when the actor must not block
+
+        generator actors and greenlets of forked actors share their thread
+        with other actors, they check inbox without blocking
+        '''
+        if self._family == AF_GENERATOR or getattr(self, '_subfamily', None) == AF_GREENLET:
+            return None
+        return self.wait_timeout
 
     def recieve(self):
-        if self.message:
-            source_steps = self.message.get('steps', None)
-            if source_steps:
-                self.steps = source_steps
+        if isinstance(self.message, Envelope):
+            self.envelope = envelope = self.message
+            self.message = envelope.payload
+            if isinstance(self.message, dict):
+                # the payload is shared with the sender, changes go to the view
+                self.message = MessageView(self.message)
+            if envelope.steps:
+                self.steps = envelope.steps
+                self._route = None
+            elif envelope.route is not None:
+                self._follow(envelope.route, envelope.hop)
+        elif self.message:
+            # plain dict messages put to inbox from outside of actors tree
+            self.envelope = None
+            if isinstance(self.message, dict):
+                self.message = MessageView(self.message)
+            if 'steps' in self.message:
+                source_steps = self.message.get('steps', None)
+                if source_steps:
+                    self.steps = source_steps
+                    self._route = None
+            elif self.message.get('route') is not None:
+                self._follow(self.message['route'], self.message.get('hop', 0))
 
         return self.after_recieve()
 
+    def _follow(self, route_id, hop):
+        ''' continue the route from the hop '''
+        try:
+            self.steps = route_table.steps(route_id)[hop:]
+            self._route = (route_id, hop)
+        except KeyError as err:
+            self.logger.error(u"<{0}> - {1}".format(self, err))
+
     def after_recieve(self):
         """ Override """
         pass
@@ -329,10 +709,10 @@ class BaseActor(Actor):
         """ Override """
         self.logger.debug("{0} --- Stop loop".format(self))
         self.steps = list()
+        self._route = None
         self.message = None
-        if len(self.inbox) > 0:
-            self.sleep()
-        else:
+        self.envelope = None
+        if len(self.inbox) == 0:
             self.stop()
 
     @property
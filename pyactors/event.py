@@ -6,6 +6,7 @@ from multiprocessing import Process
 
 from .base import Actor, BaseActor, AF_GREENLET, AF_PROCESS
 from .inbox import ProcessInbox
+from .reply import ReplyPipe
 from .inbox.event import EventletInbox
 
 
@@ -38,15 +39,19 @@ class EventletActor(Actor):
         else:
             self.processing_loop = eventlet.spawn(self.loop)
 
-    def stop(self):
+    def stop(self, timeout=None):
         ''' stop actor '''
 
-        super(EventletActor, self).stop()
+        return super(EventletActor, self).stop(timeout=timeout)
 
     def run_once(self):
         ''' one actor iteraction (processing + supervising) '''
 
-        self.sleep()
+        # system messages are handled ahead of inbox
+        if not self.handle_system():
+            return False
+
+        self.sleep(0)
 
         # processing
         if self.processing_loop is not None:
@@ -89,14 +94,20 @@ class ForkedEventletActor(EventletActor):
 
         # Actor Family
         self._family = AF_PROCESS
+        self._subfamily = AF_GREENLET
 
         self.inbox = ProcessInbox()
 
         self._processing = Event()
         self._waiting = Event()
+        self._terminated = Event()
+        self._terminated.set()
 
         self._process = Process(name=self._name, target=self.run)
         self._process.daemon = False
+
+        # replies to ask() made in the starting process
+        self._replies = ReplyPipe()
         self._logger = None
 
     @property
@@ -137,10 +148,20 @@ class ForkedEventletActor(EventletActor):
         else:
             self._waiting.clear()
 
+    def run(self):
+        ''' run actor, signal termination when it's over
+        '''
+        try:
+            super(ForkedEventletActor, self).run()
+        finally:
+            self._replies.close()
+            self._terminated.set()
+
     def start(self):
         ''' start actor
         '''
         super(ForkedEventletActor, self).start()
+        self._replies.listen(self._reply)
         self._process.start()
 
 
@@ -1 +1,8 @@
 from .inbox.exceptions import *
+
+
+class ReplyError(Exception):
+    ''' The exception is raised by future of Actor.ask() when the actor
+        replies with error or doesn't reply in time
+    '''
+    pass
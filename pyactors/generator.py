@@ -5,6 +5,7 @@ from multiprocessing import Process
 
 from .base import Actor, BaseActor, AF_GENERATOR, AF_PROCESS
 from .inbox import DequeInbox, ProcessInbox
+from .reply import ReplyPipe
 
 
 class GeneratorActor(Actor):
@@ -30,17 +31,21 @@ class GeneratorActor(Actor):
     def run_once(self):
         ''' one actor iteraction (processing + supervising)
         '''
+        # system messages are handled ahead of inbox
+        if not self.handle_system():
+            return False
+
         # processing
         if self.processing_loop:
             try:
-                self.processing_loop.next()
+                next(self.processing_loop)
             except StopIteration:
                 self.processing_loop = None
 
         # children supervising
         if self.supervise_loop:
             try:
-                self.supervise_loop.next()
+                next(self.supervise_loop)
             except StopIteration:
                 self.supervise_loop = None
 
@@ -52,7 +57,11 @@ class GeneratorActor(Actor):
 
     def run(self):
         ''' run actor
+
+        threaded and forked actors block on inbox while they are waiting
+        for new messages, instead of spinning over run_once()
         '''
+        blocking = self._family != AF_GENERATOR
         while self.processing:
             try:
                 if not self.run_once():
@@ -60,6 +69,9 @@ class GeneratorActor(Actor):
             except Exception as err:
                 self.logger.error(err)
                 break
+            if blocking and self.waiting and self.processing:
+                self.inbox.wait(self.idle_timeout)
+                self.waiting = False
 
 
 class ForkedGeneratorActor(GeneratorActor):
@@ -79,10 +91,15 @@ class ForkedGeneratorActor(GeneratorActor):
 
         self._processing = Event()
         self._waiting = Event()
+        self._terminated = Event()
+        self._terminated.set()
 
         self._process = Process(name=self._name, target=self.run)
         self._process.daemon = False
 
+        # replies to ask() made in the starting process
+        self._replies = ReplyPipe()
+
     @property
     def processing(self):
         ''' return True if actor is processing
@@ -121,10 +138,20 @@ class ForkedGeneratorActor(GeneratorActor):
         else:
             self._waiting.clear()
 
+    def run(self):
+        ''' run actor, signal termination when it's over
+        '''
+        try:
+            super(ForkedGeneratorActor, self).run()
+        finally:
+            self._replies.close()
+            self._terminated.set()
+
     def start(self):
         ''' start actor
         '''
         super(ForkedGeneratorActor, self).start()
+        self._replies.listen(self._reply)
         self._process.start()
 
 
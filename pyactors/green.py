@@ -5,7 +5,9 @@ from multiprocessing import Event
 from multiprocessing import Process
 
 from .base import Actor, BaseActor, AF_GREENLET, AF_PROCESS
-from .inbox import DequeInbox, ProcessInbox
+from .inbox import ProcessInbox
+from .inbox.green import GeventInbox
+from .reply import ReplyPipe
 
 
 class GreenletActor(Actor):
@@ -18,7 +20,7 @@ class GreenletActor(Actor):
         super(GreenletActor, self).__init__(name=name, logger=logger)
 
         # inbox
-        self.inbox = DequeInbox()
+        self.inbox = GeventInbox()
 
         # Actor Family
         self._family = AF_GREENLET
@@ -37,14 +39,18 @@ class GreenletActor(Actor):
         else:
             self.processing_loop = gevent.spawn(self.loop)
 
-    def stop(self):
+    def stop(self, timeout=None):
         ''' stop actor
         '''
-        super(GreenletActor, self).stop()
+        return super(GreenletActor, self).stop(timeout=timeout)
 
     def run_once(self):
         ''' one actor iteraction (processing + supervising)
         '''
+        # system messages are handled ahead of inbox
+        if not self.handle_system():
+            return False
+
         self.sleep()
 
         # processing
@@ -55,7 +61,7 @@ class GreenletActor(Actor):
         # children supervising
         if self.supervise_loop is not None:
             try:
-                self.supervise_loop.next()
+                next(self.supervise_loop)
             except StopIteration:
                 self.supervise_loop = None
 
@@ -67,13 +73,18 @@ class GreenletActor(Actor):
 
     def run(self):
         ''' run actor
+
+        actor without children joins its processing greenlet instead of
+        spinning over run_once()
         '''
         while self.processing:
             try:
+                if self.supervise_loop is None and self.processing_loop is not None:
+                    self.processing_loop.join()
                 if not self.run_once():
                     break
             except Exception as err:
-                self._logger.error(err)
+                self.logger.error(err)
                 break
 
 
@@ -94,10 +105,15 @@ class ForkedGreenletActor(GreenletActor):
 
         self._processing = Event()
         self._waiting = Event()
+        self._terminated = Event()
+        self._terminated.set()
 
         self._process = Process(name=self._name, target=self.run)
         self._process.daemon = False
 
+        # replies to ask() made in the starting process
+        self._replies = ReplyPipe()
+
     @property
     def processing(self):
         ''' return True if actor is processing
@@ -136,10 +152,20 @@ class ForkedGreenletActor(GreenletActor):
         else:
             self._waiting.clear()
 
+    def run(self):
+        ''' run actor, signal termination when it's over
+        '''
+        try:
+            super(ForkedGreenletActor, self).run()
+        finally:
+            self._replies.close()
+            self._terminated.set()
+
     def start(self):
         ''' start actor
         '''
         super(ForkedGreenletActor, self).start()
+        self._replies.listen(self._reply)
         self._process.start()
 
 
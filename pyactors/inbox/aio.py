@@ -0,0 +1,243 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+import asyncio
+import logging
+import collections
+
+from .base import Wakeup, OF_BLOCK, OF_DROP_HEAD, OF_DROP_TAIL, OF_RAISE
+from .exceptions import EmptyInboxException, FullInboxException
+
+__all__ = ['AsyncioInbox']
+
+
+def running_loop():
+    ''' return event loop running in the current thread, None if there is no one
+    '''
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+class AsyncioInbox(object):
+    ''' Inbox of asyncio actors on asyncio.Queue
+
+    Coroutines await messages by aget()/aget_many(), get() and get_many()
+    don't wait and raise EmptyInboxException at once. The inbox is bound to
+    the event loop of the actor by bind(), puts from other threads are
+    passed to the loop by call_soon_threadsafe().
+
+    `maxsize` limits the number of messages, 0 - unbounded. put() never
+    blocks the event loop: OF_BLOCK and OF_RAISE raise FullInboxException
+    when the inbox is full, OF_DROP_HEAD and OF_DROP_TAIL drop the oldest
+    or the new message. `await aput()` waits for room with OF_BLOCK.
+    With OF_BLOCK and OF_RAISE put() from other threads waits until the
+    loop has taken the messages, so FullInboxException reaches the caller,
+    OF_BLOCK waits up to timeout seconds for room there.
+
+    System messages are kept apart from regular ones, see put_system().
+    '''
+
+    def __init__(self, logger=None, maxsize=0, overflow=OF_BLOCK):
+        ''' __init__
+        '''
+        if overflow not in (OF_BLOCK, OF_DROP_HEAD, OF_DROP_TAIL, OF_RAISE):
+            raise RuntimeError('Unsupported overflow policy of AsyncioInbox: {}'.format(overflow))
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.dropped = 0
+        self.blocked = 0
+
+        # messages and wakeups, the number of messages is kept in _count
+        self._queue = asyncio.Queue()
+        self._count = 0
+        self._system = collections.deque()
+        self._room = None
+        self._loop = None
+        self._listeners = tuple()
+
+        if logger is None:
+            self._logger = logging.getLogger('%s.%s' % (__name__, self.__class__.__name__))
+        else:
+            self._logger = logger
+
+    def bind(self, loop):
+        ''' bind inbox to event loop of its actor
+        '''
+        self._loop = loop
+
+    def _threadsafe(self, func, *args):
+        ''' call func in event loop of inbox, at once if it's the current one
+        '''
+        loop = self._loop
+        if loop is None or loop is running_loop():
+            func(*args)
+        else:
+            loop.call_soon_threadsafe(func, *args)
+
+    def _take(self):
+        ''' return next message without waiting, None if there are only wakeups
+        '''
+        while self._count:
+            message = self._queue.get_nowait()
+            if not isinstance(message, Wakeup):
+                self._count -= 1
+                if self._room is not None:
+                    self._room.set()
+                return message
+        return None
+
+    def get(self, timeout=None):
+        ''' get message without waiting, use aget() to await it
+        '''
+        if not self._count:
+            raise EmptyInboxException
+        return self._take()
+
+    def get_many(self, max_n, timeout=None):
+        ''' get up to max_n messages without waiting, use aget_many() to await them
+        '''
+        if not self._count:
+            raise EmptyInboxException
+        return [self._take() for _ in range(min(max_n, self._count))]
+
+    async def aget(self, timeout=None):
+        ''' await message up to timeout seconds, None - until it comes. Raise
+        EmptyInboxException when timeout is over or the inbox is woken up
+        '''
+        if self._count:
+            return self._take()
+        try:
+            if timeout is None:
+                message = await self._queue.get()
+            else:
+                message = await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            raise EmptyInboxException
+        if isinstance(message, Wakeup):
+            raise EmptyInboxException
+        self._count -= 1
+        if self._room is not None:
+            self._room.set()
+        return message
+
+    async def aget_many(self, max_n, timeout=None):
+        ''' await up to max_n messages, up to timeout seconds for the first one
+        '''
+        result = [await self.aget(timeout)]
+        while len(result) < max_n and self._count:
+            result.append(self._take())
+        return result
+
+    def put(self, message, timeout=None):
+        ''' put message to inbox, from any thread
+        '''
+        self.put_many((message,), timeout=timeout)
+
+    def put_many(self, messages, timeout=None):
+        ''' put messages to inbox, from any thread, other threads wait up to
+        timeout seconds for room with OF_BLOCK
+        '''
+        loop = self._loop
+        if loop is None or loop is running_loop():
+            self._put_many(messages)
+        elif self.maxsize and self.overflow in (OF_BLOCK, OF_RAISE) and loop.is_running():
+            # the result brings FullInboxException of the loop back to this thread
+            asyncio.run_coroutine_threadsafe(self._aput_many(list(messages), timeout), loop).result()
+        else:
+            loop.call_soon_threadsafe(self._put_many, list(messages))
+
+    async def aput(self, message):
+        ''' put message, wait for room if the inbox is full and overflow is OF_BLOCK
+        '''
+        await self._aput_many((message,))
+
+    async def _aput_many(self, messages, timeout=None):
+        ''' put messages, wait up to timeout seconds for room of each one with OF_BLOCK
+        '''
+        if self.overflow != OF_BLOCK or not self.maxsize:
+            self._put_many(messages)
+            return
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        try:
+            for message in messages:
+                if self._count >= self.maxsize:
+                    self.blocked += 1
+                while self._count >= self.maxsize:
+                    if self._room is None:
+                        self._room = asyncio.Event()
+                    self._room.clear()
+                    try:
+                        await asyncio.wait_for(self._room.wait(),
+                                               None if deadline is None else deadline - loop.time())
+                    except asyncio.TimeoutError:
+                        raise FullInboxException
+                self._queue.put_nowait(message)
+                self._count += 1
+        finally:
+            for listener in self._listeners:
+                listener()
+
+    def _put_many(self, messages):
+        ''' put messages by overflow policy, in event loop of inbox
+        '''
+        for message in messages:
+            if self.maxsize and self._count >= self.maxsize:
+                if self.overflow == OF_DROP_TAIL:
+                    self.dropped += 1
+                    continue
+                elif self.overflow == OF_DROP_HEAD:
+                    self._take()
+                    self.dropped += 1
+                else:
+                    raise FullInboxException
+            self._queue.put_nowait(message)
+            self._count += 1
+        for listener in self._listeners:
+            listener()
+
+    def put_system(self, message):
+        ''' put system message, it's taken by get_system() ahead of regular messages
+        '''
+        self._system.append(message)
+        self.wakeup()
+        for listener in self._listeners:
+            listener()
+
+    def get_system(self):
+        ''' return the next system message, None if there is nothing
+        '''
+        if self._system:
+            return self._system.popleft()
+        return None
+
+    def wait(self, timeout=None):
+        ''' return True if inbox is not empty, asyncio actors await aget() instead
+        '''
+        return self._count > 0 or len(self._system) > 0
+
+    def wakeup(self):
+        ''' wake up coroutine awaiting messages, its aget() raises EmptyInboxException
+        '''
+        self._threadsafe(self._queue.put_nowait, Wakeup())
+
+    def subscribe(self, listener):
+        ''' call listener() after each put
+        '''
+        self._listeners = self._listeners + (listener,)
+
+    def unsubscribe(self, listener):
+        ''' stop calling listener after put
+        '''
+        self._listeners = tuple(l for l in self._listeners if l != listener)
+
+    def metrics(self):
+        ''' return inbox counters: depth, dropped and blocked messages
+        '''
+        return dict(depth=len(self), dropped=self.dropped, blocked=self.blocked)
+
+    def __len__(self):
+        ''' return length of inbox
+        '''
+        return self._count
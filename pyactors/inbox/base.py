@@ -1,112 +1,842 @@
 #!/usr/bin/env python
 # -*- coding: utf8 -*-
+import io
 import queue
+import pickle
 import logging
+import tempfile
+import threading
 import collections
 import multiprocessing
 
-from .exceptions import EmptyInboxException
+from .exceptions import EmptyInboxException, FullInboxException
+from ..serialization import get_codec
 
-__all__ = ['DequeInbox', 'QueueInbox', 'ProcessInbox']
+__all__ = ['DequeInbox', 'QueueInbox', 'PriorityInbox', 'ProcessInbox', 'GreenInbox',
+           'OF_BLOCK', 'OF_DROP_HEAD', 'OF_DROP_TAIL', 'OF_RAISE', 'OF_SPILL',
+           'PRIORITY_HIGH', 'PRIORITY_NORMAL', 'PRIORITY_LOW']
+
+# Overflow policies of bounded inboxes
+OF_BLOCK = 0        # put() waits for room
+OF_DROP_HEAD = 1    # the oldest message is dropped
+OF_DROP_TAIL = 2    # the new message is dropped
+OF_RAISE = 3        # put() raises FullInboxException
+OF_SPILL = 4        # new messages are spilled to temporary file until there is room
+
+# Message priorities of PriorityInbox
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+
+class Wakeup(object):
+    ''' Marker put in cross-process inboxes to wake up the waiting actor
+    '''
+    pass
+
+
+class Batch(list):
+    ''' Messages sent by put_many() as one queue item
+    '''
+    pass
+
+
+class Spill(object):
+    ''' FIFO of messages overflowed to temporary file
+    '''
+
+    def __init__(self):
+        ''' __init__
+        '''
+        self._file = None
+        self._offset = 0
+        self._count = 0
+
+    def put(self, message):
+        ''' append message to the end of file
+        '''
+        if self._file is None:
+            self._file = tempfile.TemporaryFile()
+        self._file.seek(0, io.SEEK_END)
+        pickle.dump(message, self._file, pickle.HIGHEST_PROTOCOL)
+        self._count += 1
+
+    def get(self):
+        ''' read the oldest message, the file is removed when it's read out
+        '''
+        self._file.seek(self._offset)
+        message = pickle.load(self._file)
+        self._offset = self._file.tell()
+        self._count -= 1
+        if not self._count:
+            self._file.close()
+            self._file = None
+            self._offset = 0
+        return message
+
+    def __len__(self):
+        ''' return number of spilled messages
+        '''
+        return self._count
 
 
 class DequeInbox(object):
     ''' Inbox from collections.deque
+
+    Messages are taken without lock. put() is lock-free while the inbox is
+    unbounded and nobody waits for messages, waiting actors are woken up
+    by condition.
+
+    `maxsize` limits the number of messages in memory, 0 - unbounded. When
+    the inbox is full put() follows `overflow` policy: OF_BLOCK waits up to
+    timeout for room, OF_DROP_HEAD drops the oldest message, OF_DROP_TAIL
+    drops the new one, OF_RAISE raises FullInboxException, OF_SPILL writes
+    new messages to temporary file and moves them back as the inbox is
+    drained. OF_BLOCK needs the producer and the actor in different threads.
+    Dropped messages and puts which had to wait are counted in metrics().
+
+    System messages are kept apart from regular ones: put_system() doesn't
+    count against `maxsize` and get_system() takes them ahead of the queue.
     '''
 
-    def __init__(self, logger=None):
+    def __init__(self, logger=None, maxsize=0, overflow=OF_BLOCK):
         ''' __init__
         '''
+        if overflow not in (OF_BLOCK, OF_DROP_HEAD, OF_DROP_TAIL, OF_RAISE, OF_SPILL):
+            raise RuntimeError('Unknown overflow policy: {}'.format(overflow))
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.dropped = 0
+        self.blocked = 0
+
         self.__inbox = collections.deque()
+        self.__system = collections.deque()
+        self.__spill = Spill() if overflow == OF_SPILL else None
+        self.__lock = threading.Lock()
+        self.__not_empty = threading.Condition(self.__lock)
+        self.__not_full = threading.Condition(self.__lock)
+        self.__waiters = 0
+        self.__blocking = 0
+        self.__woken = False
+        self.__listeners = tuple()
+
         if logger is None:
-            self._logger = logging.getLogger('%s.DequeInbox' % __name__)
+            self._logger = logging.getLogger('%s.%s' % (__name__, self.__class__.__name__))
         else:
             self._logger = logger
 
-    def get(self):
-        ''' get data from inbox
+    def get(self, timeout=None):
+        ''' get data from inbox, wait up to timeout seconds if timeout is defined
         '''
         try:
-            result = self.__inbox.popleft()
+            message = self.__inbox.popleft()
         except IndexError:
+            if timeout is None or not self.wait(timeout):
+                raise EmptyInboxException
+            try:
+                message = self.__inbox.popleft()
+            except IndexError:
+                raise EmptyInboxException
+        if self.__blocking or self.__spill:
+            self._release()
+        return message
+
+    def get_many(self, max_n, timeout=None):
+        ''' get up to max_n messages, wait up to timeout seconds for the first one
+        '''
+        if not self.__inbox and (timeout is None or not self.wait(timeout)):
             raise EmptyInboxException
+        result = list()
+        popleft = self.__inbox.popleft
+        try:
+            for _ in range(max_n):
+                result.append(popleft())
+        except IndexError:
+            if not result:
+                raise EmptyInboxException
+        if self.__blocking or self.__spill:
+            self._release()
         return result
 
-    def put(self, message):
-        ''' put message to inbox
+    def _release(self):
+        ''' refill inbox from spill file, wake up producers waiting for room
+        '''
+        with self.__lock:
+            while self.__spill and len(self.__inbox) < self.maxsize:
+                self.__inbox.append(self.__spill.get())
+            self.__not_full.notify_all()
+
+    def put(self, message, timeout=None):
+        ''' put message to inbox, wait up to timeout seconds for room (OF_BLOCK only)
         '''
+        self.put_many((message,), timeout=timeout)
+
+    def put_many(self, messages, timeout=None):
+        ''' put messages to inbox
+        '''
+        if not self.maxsize:
+            self.__inbox.extend(messages)
+            if self.__waiters:
+                with self.__lock:
+                    self.__not_empty.notify()
+        else:
+            with self.__lock:
+                for message in messages:
+                    self._offer(message, timeout)
+                if self.__waiters:
+                    self.__not_empty.notify()
+        for listener in self.__listeners:
+            listener()
+
+    def _offer(self, message, timeout=None):
+        ''' put message to bounded inbox by overflow policy, the lock must be held
+        '''
+        if len(self.__inbox) >= self.maxsize or self.__spill:
+            if self.overflow == OF_DROP_HEAD:
+                self.__inbox.popleft()
+                self.dropped += 1
+            elif self.overflow == OF_DROP_TAIL:
+                self.dropped += 1
+                return
+            elif self.overflow == OF_RAISE:
+                raise FullInboxException
+            elif self.overflow == OF_SPILL:
+                self.__spill.put(message)
+                return
+            else:
+                self.blocked += 1
+                self.__blocking += 1
+                try:
+                    if not self.__not_full.wait_for(lambda: len(self.__inbox) < self.maxsize, timeout):
+                        raise FullInboxException
+                finally:
+                    self.__blocking -= 1
         self.__inbox.append(message)
 
+    def put_system(self, message):
+        ''' put system message, it's taken by get_system() ahead of regular messages
+        '''
+        self.__system.append(message)
+        if self.__waiters:
+            with self.__lock:
+                self.__not_empty.notify()
+        for listener in self.__listeners:
+            listener()
+
+    def get_system(self):
+        ''' return the next system message, None if there is nothing
+        '''
+        if self.__system:
+            return self.__system.popleft()
+        return None
+
+    def wait(self, timeout=None):
+        ''' wait for new messages, return True if inbox is not empty
+        '''
+        if self.__inbox or self.__system:
+            return True
+        with self.__lock:
+            # announce the waiter before the check, put() without lock looks at waiters after append
+            self.__waiters += 1
+            try:
+                if not self.__inbox and not self.__system and not self.__woken:
+                    self.__not_empty.wait(timeout)
+            finally:
+                self.__waiters -= 1
+            self.__woken = False
+        return len(self.__inbox) > 0 or len(self.__system) > 0
+
+    def wakeup(self):
+        ''' wake up actor waiting for new messages
+        '''
+        with self.__lock:
+            self.__woken = True
+            self.__not_empty.notify_all()
+
+    def subscribe(self, listener):
+        ''' call listener() after each put
+        '''
+        self.__listeners = self.__listeners + (listener,)
+
+    def unsubscribe(self, listener):
+        ''' stop calling listener after put
+        '''
+        self.__listeners = tuple(l for l in self.__listeners if l != listener)
+
+    def metrics(self):
+        ''' return inbox counters: depth, dropped and blocked messages
+        '''
+        return dict(depth=len(self), dropped=self.dropped, blocked=self.blocked)
+
     def __len__(self):
-        ''' return length of inbox
+        ''' return length of inbox, spilled messages included
         '''
+        if self.__spill:
+            return len(self.__inbox) + len(self.__spill)
         return len(self.__inbox)
 
 
-class QueueInbox(object):
-    ''' Inbox from Queue.Queue
+class QueueInbox(DequeInbox):
+    ''' Thread-safe inbox, DequeInbox shared by the actor's thread and
+    senders from other threads. Bounded by `maxsize` the same way.
+    '''
+    pass
+
+
+class PriorityInbox(object):
+    ''' Inbox with priority levels
+
+    Every level is a deque, get() takes the oldest message of the highest
+    level (PRIORITY_HIGH is 0), so put and get cost O(levels) for a few
+    levels. System messages are taken by get_system() ahead of all levels.
+
+    `maxsize` limits the number of messages of all levels, 0 - unbounded,
+    with the overflow policies of DequeInbox except OF_SPILL: spilled
+    messages would be taken after queued ones of lower priority.
+    OF_DROP_HEAD drops the oldest message of the lowest non-empty level.
     '''
 
-    def __init__(self, logger=None):
+    # number of priority levels
+    levels = 3
+
+    def __init__(self, logger=None, levels=None, maxsize=0, overflow=OF_BLOCK):
         ''' __init__
         '''
-        self.__inbox = queue.Queue()
+        if overflow not in (OF_BLOCK, OF_DROP_HEAD, OF_DROP_TAIL, OF_RAISE):
+            raise RuntimeError('Overflow policy is not supported by PriorityInbox: {}'.format(overflow))
+        if levels is not None:
+            self.levels = levels
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.dropped = 0
+        self.blocked = 0
+
+        self.__queues = tuple(collections.deque() for _ in range(self.levels))
+        self.__system = collections.deque()
+        self.__lock = threading.Lock()
+        self.__not_empty = threading.Condition(self.__lock)
+        self.__not_full = threading.Condition(self.__lock)
+        self.__waiters = 0
+        self.__blocking = 0
+        self.__woken = False
+        self.__listeners = tuple()
 
         if logger is None:
-            self._logger = logging.getLogger('%s.QueueInbox' % __name__)
+            self._logger = logging.getLogger('%s.PriorityInbox' % __name__)
         else:
             self._logger = logger
 
-    def get(self):
-        ''' get data from inbox
+    def _take(self):
+        ''' pop message of the highest non-empty level
+        '''
+        for level in self.__queues:
+            if level:
+                return level.popleft()
+        raise IndexError
+
+    def get(self, timeout=None):
+        ''' get data from inbox, wait up to timeout seconds if timeout is defined
         '''
         try:
-            result = self.__inbox.get_nowait()
-            self.__inbox.task_done()
-        except queue.Empty:
+            message = self._take()
+        except IndexError:
+            if timeout is None or not self.wait(timeout):
+                raise EmptyInboxException
+            try:
+                message = self._take()
+            except IndexError:
+                raise EmptyInboxException
+        if self.__blocking:
+            self._release()
+        return message
+
+    def get_many(self, max_n, timeout=None):
+        ''' get up to max_n messages by priority, wait up to timeout seconds for the first one
+        '''
+        if not len(self) and (timeout is None or not self.wait(timeout)):
+            raise EmptyInboxException
+        result = list()
+        for level in self.__queues:
+            while level and len(result) < max_n:
+                result.append(level.popleft())
+        if not result:
             raise EmptyInboxException
+        if self.__blocking:
+            self._release()
         return result
 
-    def put(self, message):
-        ''' put message to inbox
+    def _release(self):
+        ''' wake up producers waiting for room
         '''
-        self.__inbox.append(message)
+        with self.__lock:
+            self.__not_full.notify_all()
+
+    def put(self, message, priority=PRIORITY_NORMAL, timeout=None):
+        ''' put message to inbox with priority, 0 - the highest. Wait up to
+        timeout seconds for room (OF_BLOCK only)
+        '''
+        self.put_many((message,), priority=priority, timeout=timeout)
+
+    def put_many(self, messages, priority=PRIORITY_NORMAL, timeout=None):
+        ''' put messages to inbox with priority
+        '''
+        level = self.__queues[priority]
+        if not self.maxsize:
+            level.extend(messages)
+            if self.__waiters:
+                with self.__lock:
+                    self.__not_empty.notify()
+        else:
+            with self.__lock:
+                for message in messages:
+                    self._offer(level, message, timeout)
+                if self.__waiters:
+                    self.__not_empty.notify()
+        for listener in self.__listeners:
+            listener()
+
+    def _offer(self, level, message, timeout=None):
+        ''' put message to level of bounded inbox by overflow policy, the lock must be held
+        '''
+        if len(self) >= self.maxsize:
+            if self.overflow == OF_DROP_HEAD:
+                for lowest in reversed(self.__queues):
+                    if lowest:
+                        lowest.popleft()
+                        break
+                self.dropped += 1
+            elif self.overflow == OF_DROP_TAIL:
+                self.dropped += 1
+                return
+            elif self.overflow == OF_RAISE:
+                raise FullInboxException
+            else:
+                self.blocked += 1
+                self.__blocking += 1
+                try:
+                    if not self.__not_full.wait_for(lambda: len(self) < self.maxsize, timeout):
+                        raise FullInboxException
+                finally:
+                    self.__blocking -= 1
+        level.append(message)
+
+    def put_system(self, message):
+        ''' put system message, it's taken by get_system() ahead of regular messages
+        '''
+        self.__system.append(message)
+        if self.__waiters:
+            with self.__lock:
+                self.__not_empty.notify()
+        for listener in self.__listeners:
+            listener()
+
+    def get_system(self):
+        ''' return the next system message, None if there is nothing
+        '''
+        if self.__system:
+            return self.__system.popleft()
+        return None
+
+    def wait(self, timeout=None):
+        ''' wait for new messages, return True if inbox is not empty
+        '''
+        if len(self) or self.__system:
+            return True
+        with self.__lock:
+            # announce the waiter before the check, put() without lock looks at waiters after append
+            self.__waiters += 1
+            try:
+                if not len(self) and not self.__system and not self.__woken:
+                    self.__not_empty.wait(timeout)
+            finally:
+                self.__waiters -= 1
+            self.__woken = False
+        return len(self) > 0 or len(self.__system) > 0
+
+    def wakeup(self):
+        ''' wake up actor waiting for new messages
+        '''
+        with self.__lock:
+            self.__woken = True
+            self.__not_empty.notify_all()
+
+    def subscribe(self, listener):
+        ''' call listener() after each put
+        '''
+        self.__listeners = self.__listeners + (listener,)
+
+    def unsubscribe(self, listener):
+        ''' stop calling listener after put
+        '''
+        self.__listeners = tuple(l for l in self.__listeners if l != listener)
+
+    def metrics(self):
+        ''' return inbox counters: depth, dropped and blocked messages
+        '''
+        return dict(depth=len(self), dropped=self.dropped, blocked=self.blocked)
 
     def __len__(self):
         ''' return length of inbox
         '''
-        return len(self.__inbox)
+        return sum(len(level) for level in self.__queues)
 
 
 class ProcessInbox(object):
     ''' Inbox from multiprocessing.Queue
+
+    put_many() sends messages as one framed batch, so the batch is pickled
+    and written to the pipe once.
+
+    The length of inbox is kept by two shared counters instead of qsize():
+    `puts` is incremented by writers under a lock before a message is sent,
+    `gets` is incremented by the only reader without locking, so len() is
+    a lock-free read of both and never less than the number of messages
+    which are sent but not received yet.
+
+    `maxsize` bounds the inbox by the same counters. Writers live in other
+    processes and can't take messages from the pipe, so only OF_BLOCK,
+    OF_DROP_TAIL and OF_RAISE overflow policies are supported.
+
+    System messages go through their own queue, the reader looks at it only
+    when the shared counter of system messages shows something new.
+
+    Messages are pickled by multiprocessing.Queue, or encoded by `codec`
+    (see pyactors.serialization) if it's defined.
     '''
 
-    def __init__(self, logger=None):
+    def __init__(self, logger=None, maxsize=0, overflow=OF_BLOCK, codec=None):
         ''' __init__
         '''
+        self._codec = get_codec(codec) if codec is not None else None
+        if overflow not in (OF_BLOCK, OF_DROP_TAIL, OF_RAISE):
+            raise RuntimeError('Overflow policy is not supported by ProcessInbox: {}'.format(overflow))
+        self.maxsize = maxsize
+        self.overflow = overflow
+
         self.__inbox = multiprocessing.Queue()
+        self.__pending = collections.deque()
+        self.__puts = multiprocessing.RawValue('Q', 0)
+        self.__puts_lock = multiprocessing.Lock()
+        self.__gets = multiprocessing.RawValue('Q', 0)
+        self.__dropped = multiprocessing.RawValue('Q', 0)
+        self.__blocked = multiprocessing.RawValue('Q', 0)
+        self.__system = multiprocessing.Queue()
+        self.__system_puts = multiprocessing.RawValue('Q', 0)
+        self.__system_gets = 0
+        # free places of bounded blocking inbox
+        self.__slots = multiprocessing.Semaphore(maxsize) if maxsize and overflow == OF_BLOCK else None
 
         if logger is None:
             self._logger = logging.getLogger('%s.ProcessInbox' % __name__)
         else:
             self._logger = logger
 
-    def get(self):
-        ''' get data from inbox
+    def _fetch(self, block=False, timeout=None):
+        ''' move next queue item to pending messages, return False if there is nothing
+
+        Messages counted by writers are read even without blocking, they
+        may be on their way yet. Wakeup markers are skipped, a marker ends
+        blocking but not reading of counted messages
+        '''
+        while True:
+            if not block and self.__puts.value - self.__gets.value > len(self.__pending):
+                block, timeout = True, 1.0
+            try:
+                item = self.__inbox.get(block, timeout)
+            except queue.Empty:
+                return False
+            if not isinstance(item, Wakeup):
+                break
+            block, timeout = False, None
+        if isinstance(item, Batch):
+            if self._codec is not None:
+                item = [self._codec.loads(data) for data in item]
+            self.__pending.extend(item)
+        else:
+            self.__pending.append(item if self._codec is None else self._codec.loads(item))
+        return len(self.__pending) > 0
+
+    def get(self, timeout=None):
+        ''' get data from inbox, wait up to timeout seconds if timeout is defined
+        '''
+        if not self.__pending and not self._fetch(timeout is not None, timeout):
+            raise EmptyInboxException
+        self.__gets.value += 1
+        if self.__slots is not None:
+            self.__slots.release()
+        return self.__pending.popleft()
+
+    def get_many(self, max_n, timeout=None):
+        ''' get up to max_n messages, wait up to timeout seconds for the first one
+        '''
+        if not self.__pending and not self._fetch(timeout is not None, timeout):
+            raise EmptyInboxException
+        while len(self.__pending) < max_n and self._fetch():
+            pass
+        messages = [self.__pending.popleft() for _ in range(min(max_n, len(self.__pending)))]
+        self.__gets.value += len(messages)
+        if self.__slots is not None:
+            for _ in messages:
+                self.__slots.release()
+        return messages
+
+    def put(self, message, timeout=None):
+        ''' put message to inbox, wait up to timeout seconds for room (OF_BLOCK only)
+        '''
+        if self._count_puts(1, timeout):
+            self.__inbox.put_nowait(message if self._codec is None else self._codec.dumps(message))
+
+    def put_many(self, messages, timeout=None):
+        ''' put messages to inbox as one batch
+        '''
+        if self._codec is not None:
+            batch = Batch(self._codec.dumps(message) for message in messages)
+        else:
+            batch = Batch(messages)
+        if batch:
+            count = self._count_puts(len(batch), timeout)
+            if count < len(batch):
+                batch = Batch(batch[:count])
+            if batch:
+                self.__inbox.put_nowait(batch)
+
+    def _count_puts(self, count, timeout=None):
+        ''' add messages to shared puts counter by overflow policy, writers may
+        live in many processes. Return number of messages to send
+        '''
+        if self.__slots is not None:
+            self._take_slots(count, timeout)
+        with self.__puts_lock:
+            if self.maxsize and self.__slots is None:
+                room = max(self.maxsize - (self.__puts.value - self.__gets.value), 0)
+                if room < count:
+                    if self.overflow == OF_RAISE:
+                        raise FullInboxException
+                    self.__dropped.value += count - room
+                    count = room
+            self.__puts.value += count
+        return count
+
+    def _take_slots(self, count, timeout=None):
+        ''' take free places for count messages, wait up to timeout seconds
+        '''
+        for taken in range(count):
+            if self.__slots.acquire(False):
+                continue
+            with self.__puts_lock:
+                self.__blocked.value += 1
+            if not self.__slots.acquire(True, timeout):
+                for _ in range(taken):
+                    self.__slots.release()
+                raise FullInboxException
+
+    def put_system(self, message):
+        ''' put system message and wake up the reader, works across processes
         '''
+        with self.__puts_lock:
+            self.__system_puts.value += 1
+            self.__system.put_nowait(message)
+        self.__inbox.put_nowait(Wakeup())
+
+    def get_system(self):
+        ''' return the next system message, None if there is nothing
+        '''
+        if self.__system_puts.value == self.__system_gets:
+            return None
         try:
-            result = self.__inbox.get_nowait()
+            # the counter is incremented before put, the message may be on its way yet
+            message = self.__system.get(True, 1.0)
         except queue.Empty:
+            return None
+        self.__system_gets += 1
+        return message
+
+    def wait(self, timeout=None):
+        ''' wait for new messages, return True if inbox is not empty
+        '''
+        return bool(self.__pending) or self._fetch(True, timeout)
+
+    def wakeup(self):
+        ''' wake up actor waiting for new messages, works across processes
+        '''
+        self.__inbox.put_nowait(Wakeup())
+
+    def metrics(self):
+        ''' return inbox counters: depth, puts, gets, dropped and blocked messages
+        '''
+        puts, gets = self.__puts.value, self.__gets.value
+        return dict(depth=max(puts - gets, 0), puts=puts, gets=gets,
+                    dropped=self.__dropped.value, blocked=self.__blocked.value)
+
+    def __len__(self):
+        ''' return length of inbox
+        '''
+        return max(self.__puts.value - self.__gets.value, 0)
+
+
+class GreenInbox(object):
+    ''' Inbox for green threads
+
+    The base of GeventInbox and EventletInbox, subclasses set the queue,
+    its Empty exception and the semaphore of their library.
+
+    `maxsize` limits the number of queued messages, 0 - unbounded. When the
+    inbox is full put() follows `overflow` policy like DequeInbox, except
+    OF_SPILL. OF_BLOCK needs the producer and the actor in different green
+    threads.
+
+    System messages are kept apart from regular ones: put_system() doesn't
+    count against `maxsize` and get_system() takes them ahead of the queue.
+    '''
+
+    queue_class = None
+    empty_exception = None
+    semaphore_class = None
+
+    def __init__(self, logger=None, maxsize=0, overflow=OF_BLOCK):
+        ''' __init__
+        '''
+        if overflow not in (OF_BLOCK, OF_DROP_HEAD, OF_DROP_TAIL, OF_RAISE):
+            raise RuntimeError('Overflow policy is not supported by {}: {}'.format(
+                self.__class__.__name__, overflow))
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.dropped = 0
+        self.blocked = 0
+
+        self.__slots = self.semaphore_class(maxsize) if maxsize else None
+        self.__inbox = self.queue_class()
+        self.__pending = collections.deque()
+        self.__system = collections.deque()
+        self.__markers = 0
+        self.__listeners = tuple()
+
+        if logger is None:
+            self._logger = logging.getLogger(self.__class__.__name__)
+        else:
+            self._logger = logger
+
+    def _fetch(self, block=False, timeout=None):
+        ''' move next queue item to pending messages, return False if there is nothing
+
+        Wakeup markers are skipped, a marker ends blocking but not reading
+        of messages queued behind it
+        '''
+        while True:
+            try:
+                item = self.__inbox.get(block, timeout)
+            except self.empty_exception:
+                return False
+            if not isinstance(item, Wakeup):
+                break
+            self.__markers -= 1
+            block, timeout = False, None
+        self.__pending.append(item)
+        return True
+
+    def get(self, timeout=None):
+        ''' get data from inbox, wait up to timeout seconds if timeout is defined
+        '''
+        if not self.__pending and not self._fetch(timeout is not None, timeout):
+            raise EmptyInboxException
+        if self.__slots is not None:
+            self.__slots.release()
+        return self.__pending.popleft()
+
+    def get_many(self, max_n, timeout=None):
+        ''' get up to max_n messages, wait up to timeout seconds for the first one
+        '''
+        if not self.__pending and not self._fetch(timeout is not None, timeout):
             raise EmptyInboxException
+        while len(self.__pending) < max_n and self._fetch():
+            pass
+        result = [self.__pending.popleft() for _ in range(min(max_n, len(self.__pending)))]
+        if self.__slots is not None:
+            for _ in result:
+                self.__slots.release()
         return result
 
-    def put(self, message):
-        ''' put message to inbox
+    def put(self, message, timeout=None):
+        ''' put message to inbox, wait up to timeout seconds for room (OF_BLOCK only)
+        '''
+        self.put_many((message,), timeout=timeout)
+
+    def put_many(self, messages, timeout=None):
+        ''' put messages to inbox
+        '''
+        if self.__slots is None:
+            for message in messages:
+                self.__inbox.put(message)
+        else:
+            for message in messages:
+                self._offer(message, timeout)
+        for listener in self.__listeners:
+            listener()
+
+    def _offer(self, message, timeout=None):
+        ''' put message to bounded inbox by overflow policy
+        '''
+        if not self.__slots.acquire(False):
+            if self.overflow == OF_DROP_HEAD:
+                # the slot of the oldest message is taken over by the new one
+                if self.__pending or self._fetch():
+                    self.__pending.popleft()
+                self.dropped += 1
+            elif self.overflow == OF_DROP_TAIL:
+                self.dropped += 1
+                return
+            elif self.overflow == OF_RAISE:
+                raise FullInboxException
+            else:
+                self.blocked += 1
+                if not self.__slots.acquire(True, timeout):
+                    raise FullInboxException
+        self.__inbox.put(message)
+
+    def put_system(self, message):
+        ''' put system message, it's taken by get_system() ahead of regular messages
+        '''
+        self.__system.append(message)
+        self.wakeup()
+        for listener in self.__listeners:
+            listener()
+
+    def get_system(self):
+        ''' return the next system message, None if there is nothing
+        '''
+        if self.__system:
+            return self.__system.popleft()
+        return None
+
+    def wait(self, timeout=None):
+        ''' wait for new messages, return True if inbox is not empty
+        '''
+        if self.__pending or self.__system:
+            return True
+        return self._fetch(True, timeout) or bool(self.__system)
+
+    def wakeup(self):
+        ''' wake up green thread waiting for new messages
+        '''
+        self.__markers += 1
+        self.__inbox.put(Wakeup())
+
+    def subscribe(self, listener):
+        ''' call listener() after each put
+        '''
+        self.__listeners = self.__listeners + (listener,)
+
+    def unsubscribe(self, listener):
+        ''' stop calling listener after put
+        '''
+        self.__listeners = tuple(l for l in self.__listeners if l != listener)
+
+    def metrics(self):
+        ''' return inbox counters: depth, dropped and blocked messages
         '''
-        self.__inbox.put_nowait(message)
+        return dict(depth=len(self), dropped=self.dropped, blocked=self.blocked)
 
     def __len__(self):
         ''' return length of inbox
         '''
-        return self.__inbox.qsize()
+        return self.__inbox.qsize() - self.__markers + len(self.__pending)
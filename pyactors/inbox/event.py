@@ -1,36 +1,16 @@
-from logging import getLogger
 from eventlet.queue import Queue as EventletQueue
 from eventlet.queue import Empty as EventletEmpty
+from eventlet.semaphore import Semaphore
 
-from .exceptions import EmptyInboxException
+from .base import GreenInbox
 
 
-class EventletInbox(object):
-    def __init__(self, logger=None):
-        ''' __init__ '''
+class EventletInbox(GreenInbox):
+    ''' Inbox for eventlet
 
-        self.__inbox = EventletQueue()
+    OF_BLOCK needs the producer and the actor in different greenthreads.
+    '''
 
-        if logger is None:
-            self._logger = getLogger(self.__class__.__name__)
-        else:
-            self._logger = logger
-
-    def get(self):
-        ''' get data from inbox '''
-        try:
-            result = self.__inbox.get_nowait()
-        except EventletEmpty:
-            raise EmptyInboxException
-
-        return result
-
-    def put(self, message):
-        ''' put message to inbox '''
-
-        self.__inbox.put(message)
-
-    def __len__(self):
-        ''' return length of inbox '''
-
-        return self.__inbox.qsize()
+    queue_class = EventletQueue
+    empty_exception = EventletEmpty
+    semaphore_class = Semaphore
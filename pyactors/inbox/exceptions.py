@@ -7,6 +7,11 @@ class EmptyInboxException(Exception):
     pass
 
 
+class FullInboxException(Exception):
+    ''' The exception is raised when bounded actor's inbox is full '''
+    pass
+
+
 class QueueConnectionError(Exception):
     ''' The exception is raised when used external queue service
         and actor can't connect to queue server
@@ -0,0 +1,16 @@
+from gevent.queue import Queue as GeventQueue
+from gevent.queue import Empty as GeventEmpty
+from gevent.lock import Semaphore
+
+from .base import GreenInbox
+
+
+class GeventInbox(GreenInbox):
+    ''' Inbox for gevent
+
+    OF_BLOCK needs the producer and the actor in different greenlets.
+    '''
+
+    queue_class = GeventQueue
+    empty_exception = GeventEmpty
+    semaphore_class = Semaphore
@@ -0,0 +1,344 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+import os
+import mmap
+import time
+import struct
+import logging
+import threading
+
+from .base import OF_BLOCK, OF_DROP_HEAD, OF_DROP_TAIL, OF_RAISE
+from .exceptions import EmptyInboxException, FullInboxException
+from ..serialization import get_codec
+
+__all__ = ['MmapInbox']
+
+# record header: payload length
+RECORD = struct.Struct('<I')
+# cursor: segment id and offset of the next record to read
+CURSOR = struct.Struct('<QQ')
+# record length marking the end of written data in segment
+SEGMENT_END = 0xFFFFFFFF
+
+
+class Segment(object):
+    ''' Append-only segment file, memory-mapped as a whole
+    '''
+
+    def __init__(self, path, sid, size=None):
+        ''' __init__, the segment is created with the size if it doesn't exist
+        '''
+        self.sid = sid
+        self.path = os.path.join(path, '%016x.seg' % sid)
+        if size is not None and not os.path.exists(self.path):
+            with open(self.path, 'wb') as segment:
+                segment.truncate(size)
+        self._file = open(self.path, 'r+b')
+        self.map = mmap.mmap(self._file.fileno(), 0)
+        self.size = len(self.map)
+
+    def records(self, offset=0):
+        ''' iterate over (offset, length) of records starting from offset
+        '''
+        while offset + RECORD.size <= self.size:
+            length = RECORD.unpack_from(self.map, offset)[0]
+            if length == 0 or length == SEGMENT_END:
+                break
+            yield offset, length
+            offset += RECORD.size + length
+
+    def flush(self):
+        ''' write changes of segment to disk
+        '''
+        self.map.flush()
+
+    def close(self):
+        ''' unmap and close segment file
+        '''
+        self.map.close()
+        self._file.close()
+
+    def remove(self):
+        ''' close and delete segment file
+        '''
+        self.close()
+        os.remove(self.path)
+
+
+class MmapInbox(object):
+    ''' Persistent inbox in memory-mapped segment files
+
+    Messages are appended to preallocated segment files in `path` as length
+    prefixed records, the read position is kept in memory-mapped cursor
+    file, so the inbox survives restarts and is limited by disk instead of
+    RAM. Changes are flushed to disk every `sync_every` puts and gets or by
+    flush(), segments are deleted as soon as they are read out.
+
+    `maxsize` limits the number of queued messages, 0 - unbounded. When the
+    inbox is full put() follows `overflow` policy: OF_BLOCK waits up to
+    timeout for room, OF_DROP_HEAD drops the oldest message, OF_DROP_TAIL
+    drops the new one, OF_RAISE raises FullInboxException. OF_SPILL is not
+    supported, the messages are on disk already. Dropped messages and puts
+    which had to wait are counted in metrics().
+
+    Messages are encoded by `codec` (see pyactors.serialization). The inbox
+    is used by one process, puts from other threads are allowed.
+    '''
+
+    # size of new segment files, bytes
+    segment_size = 1 << 24
+    # puts and gets between flushes to disk, 1 - flush every change
+    sync_every = 100
+
+    def __init__(self, path, logger=None, segment_size=None, sync_every=None, codec=None,
+                 maxsize=0, overflow=OF_BLOCK):
+        ''' __init__
+        '''
+        if overflow not in (OF_BLOCK, OF_DROP_HEAD, OF_DROP_TAIL, OF_RAISE):
+            raise RuntimeError('Overflow policy is not supported by MmapInbox: {}'.format(overflow))
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.dropped = 0
+        self.blocked = 0
+
+        self._codec = get_codec(codec)
+        if segment_size is not None:
+            self.segment_size = segment_size
+        if sync_every is not None:
+            self.sync_every = sync_every
+        if logger is None:
+            self._logger = logging.getLogger('%s.MmapInbox' % __name__)
+        else:
+            self._logger = logger
+
+        self.path = path
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._room = threading.Condition(self._lock)
+        self._waiters = 0
+        self._blocking = 0
+        self._woken = False
+        self._changes = 0
+
+        self._cursor = self._open_cursor()
+        sids = sorted(int(name[:-4], 16) for name in os.listdir(path) if name.endswith('.seg'))
+        if not sids:
+            sids = [0]
+        read_sid, read_offset = CURSOR.unpack_from(self._cursor)
+        if read_sid not in sids:
+            read_sid, read_offset = sids[0], 0
+
+        # segments from the read one to the write one
+        self._segments = dict()
+        for sid in sids:
+            if sid < read_sid:
+                os.remove(os.path.join(path, '%016x.seg' % sid))
+            else:
+                self._segments[sid] = Segment(path, sid, self.segment_size)
+        self._read_sid, self._read_offset = read_sid, read_offset
+        self._write_sid = sids[-1]
+        self._write_offset = 0
+        self._count = 0
+        for sid in sorted(self._segments):
+            offset = read_offset if sid == read_sid else 0
+            for offset, length in self._segments[sid].records(offset):
+                self._count += 1
+            if sid == self._write_sid:
+                self._write_offset = self._end(self._segments[sid], offset)
+
+    def _open_cursor(self):
+        ''' return memory-mapped cursor file
+        '''
+        path = os.path.join(self.path, 'cursor')
+        if not os.path.exists(path):
+            with open(path, 'wb') as cursor:
+                cursor.write(CURSOR.pack(0, 0))
+        self._cursor_file = open(path, 'r+b')
+        return mmap.mmap(self._cursor_file.fileno(), CURSOR.size)
+
+    @staticmethod
+    def _end(segment, offset):
+        ''' return offset after the last record of segment, starting search from offset
+        '''
+        end = offset
+        for offset, length in segment.records(offset):
+            end = offset + RECORD.size + length
+        return end
+
+    def _append(self, payload):
+        ''' append record to the write segment, the lock must be held
+        '''
+        size = RECORD.size + len(payload)
+        segment = self._segments[self._write_sid]
+        # room for the record and the end marker
+        if self._write_offset + size + RECORD.size > segment.size:
+            RECORD.pack_into(segment.map, self._write_offset, SEGMENT_END)
+            segment.flush()
+            self._write_sid += 1
+            segment = Segment(self.path, self._write_sid, max(self.segment_size, size + RECORD.size))
+            self._segments[self._write_sid] = segment
+            self._write_offset = 0
+        offset = self._write_offset
+        # payload goes first, reader sees the record when its length is written
+        segment.map[offset + RECORD.size:offset + size] = payload
+        RECORD.pack_into(segment.map, offset, len(payload))
+        self._write_offset += size
+        self._count += 1
+
+    def _take(self):
+        ''' read the next record, move cursor, the lock must be held
+        '''
+        while True:
+            segment = self._segments[self._read_sid]
+            length = RECORD.unpack_from(segment.map, self._read_offset)[0]
+            if length != SEGMENT_END:
+                break
+            # the segment is read out
+            self._segments.pop(self._read_sid).remove()
+            self._read_sid += 1
+            self._read_offset = 0
+        start = self._read_offset + RECORD.size
+        payload = bytes(segment.map[start:start + length])
+        self._read_offset = start + length
+        CURSOR.pack_into(self._cursor, 0, self._read_sid, self._read_offset)
+        self._count -= 1
+        return payload
+
+    def _offer(self, payload, deadline=None):
+        ''' append record by overflow policy, the lock must be held. Return True if it is appended
+        '''
+        if self.maxsize and self._count >= self.maxsize:
+            if self.overflow == OF_DROP_TAIL:
+                self.dropped += 1
+                return False
+            elif self.overflow == OF_RAISE:
+                raise FullInboxException
+            elif self.overflow == OF_DROP_HEAD:
+                self._take()
+                self.dropped += 1
+            else:
+                self.blocked += 1
+                self._blocking += 1
+                try:
+                    while self._count >= self.maxsize:
+                        remaining = None if deadline is None else deadline - time.time()
+                        if remaining is not None and remaining <= 0:
+                            raise FullInboxException
+                        self._room.wait(remaining)
+                finally:
+                    self._blocking -= 1
+        self._append(payload)
+        return True
+
+    def _changed(self, count):
+        ''' count changes, flush to disk every `sync_every` of them. The lock must be held
+        '''
+        self._changes += count
+        if self._changes >= self.sync_every:
+            self._flush()
+
+    def _flush(self):
+        ''' flush write segment and cursor, the lock must be held
+        '''
+        self._segments[self._write_sid].flush()
+        self._cursor.flush()
+        self._changes = 0
+
+    def flush(self):
+        ''' write buffered changes to disk
+        '''
+        with self._lock:
+            self._flush()
+
+    def get(self, timeout=None):
+        ''' get data from inbox, wait up to timeout seconds if timeout is defined
+        '''
+        return self.get_many(1, timeout=timeout)[0]
+
+    def get_many(self, max_n, timeout=None):
+        ''' get up to max_n messages, wait up to timeout seconds for the first one
+        '''
+        if not self._count and (timeout is None or not self.wait(timeout)):
+            raise EmptyInboxException
+        with self._lock:
+            payloads = [self._take() for _ in range(min(max_n, self._count))]
+            if payloads:
+                self._changed(len(payloads))
+                if self._blocking:
+                    self._room.notify(len(payloads))
+        if not payloads:
+            raise EmptyInboxException
+        return [self._codec.loads(payload) for payload in payloads]
+
+    def put(self, message, timeout=None):
+        ''' put message to inbox, wait up to timeout seconds for room (OF_BLOCK only)
+        '''
+        self.put_many((message,), timeout=timeout)
+
+    def put_many(self, messages, timeout=None):
+        ''' put messages to inbox
+        '''
+        payloads = [self._codec.dumps(message) for message in messages]
+        if not payloads:
+            return
+        deadline = None if timeout is None else time.time() + timeout
+        with self._lock:
+            changes = 0
+            try:
+                for payload in payloads:
+                    self._offer(payload, deadline)
+                    changes += 1
+                    if self._waiters:
+                        self._ready.notify()
+            finally:
+                self._changed(changes)
+
+    def wait(self, timeout=None):
+        ''' wait for new messages, return True if inbox is not empty
+        '''
+        if self._count:
+            return True
+        deadline = None if timeout is None else time.time() + timeout
+        with self._lock:
+            self._waiters += 1
+            try:
+                while not self._count and not self._woken:
+                    remaining = None if deadline is None else deadline - time.time()
+                    if remaining is not None and remaining <= 0:
+                        break
+                    self._ready.wait(remaining)
+            finally:
+                self._waiters -= 1
+            self._woken = False
+        return self._count > 0
+
+    def wakeup(self):
+        ''' wake up actor waiting for new messages
+        '''
+        with self._lock:
+            self._woken = True
+            self._ready.notify_all()
+
+    def metrics(self):
+        ''' return inbox counters: depth, dropped and blocked messages
+        '''
+        return dict(depth=self._count, dropped=self.dropped, blocked=self.blocked)
+
+    def close(self):
+        ''' flush changes and close segment files
+        '''
+        with self._lock:
+            self._flush()
+            for segment in self._segments.values():
+                segment.close()
+            self._segments = dict()
+            self._cursor.close()
+            self._cursor_file.close()
+
+    def __len__(self):
+        ''' return length of inbox
+        '''
+        return self._count
@@ -1,27 +1,92 @@
 #!/usr/bin/env python
 # -*- coding: utf8 -*-
-from pika import BlockingConnection, ConnectionParameters, PlainCredentials, BasicProperties
+import time
+import collections
 from logging import getLogger
 
 try:
-    from ujson import loads, dumps
+    from pika import BlockingConnection, ConnectionParameters, PlainCredentials, BasicProperties
+    from pika.exceptions import NackError
 except ImportError:
-    from json import loads, dumps
+    # pika is needed by the default connection factory only
+    BlockingConnection = ConnectionParameters = PlainCredentials = BasicProperties = None
+    # catches nothing
+    NackError = ()
 
-from .exceptions import EmptyInboxException, QueueConnectionError
+from .base import OF_DROP_HEAD, OF_DROP_TAIL, OF_RAISE
+from .exceptions import EmptyInboxException, FullInboxException, QueueConnectionError
+from ..serialization import get_codec
 
 __all__ = ['RabbitMQInbox']
 
+# x-overflow queue argument of overflow policies
+OVERFLOW_ARGUMENTS = {
+    OF_DROP_HEAD: 'drop-head',
+    OF_DROP_TAIL: 'reject-publish',
+    OF_RAISE: 'reject-publish',
+}
+
+
+def pika_connection(**connection_parameters):
+    ''' default connection factory, returns pika BlockingConnection
+    '''
+    if BlockingConnection is None:
+        raise QueueConnectionError("pika is not installed")
+
+    cred_args = tuple()
+    if 'username' in connection_parameters:
+        cred_args = cred_args + (connection_parameters.pop('username'),)
+    if 'password' in connection_parameters:
+        cred_args = cred_args + (connection_parameters.pop('password'),)
+
+    credentials = PlainCredentials(*cred_args) if len(cred_args) == 2 else None
+    return BlockingConnection(ConnectionParameters(credentials=credentials, **connection_parameters))
+
 
 class RabbitMQQueue(object):
+    ''' RabbitMQ queue
+
+    Messages are pulled by basic_get() or, after consume(), pushed by the
+    broker up to `prefetch_count` unacked deliveries and buffered locally.
+    Consumed deliveries are acked by one basic_ack(multiple=True) when
+    `ack_batch` of them are taken or the local buffer is drained.
+    Queues are declared once per channel.
+
+    `maxsize` limits the length of the queues, 0 - unbounded. They are
+    declared with x-max-length and x-overflow arguments, so every client
+    of a queue must use the same `maxsize` and `overflow`. OF_DROP_HEAD
+    lets the broker drop the oldest messages, it doesn't report them.
+    OF_DROP_TAIL and OF_RAISE turn on publisher confirms, the new message
+    rejected by the broker is counted in `dropped` or FullInboxException
+    is raised. OF_BLOCK and OF_SPILL are not supported.
+    '''
     _channel = None
-    _connection_parameters = dict()
+    _connection = None
+
+    # max unacked deliveries pushed by broker to consumer
+    prefetch_count = 100
+    # taken deliveries acked at once, None - half of prefetch_count
+    ack_batch = None
 
     def __init__(self, **kwargs):
         self._queue = kwargs.pop('queue', None)
-        self._connection_parameters.update(kwargs)
+        self._connection_factory = kwargs.pop('connection_factory', pika_connection)
+        self.prefetch_count = kwargs.pop('prefetch_count', self.prefetch_count)
+        self.ack_batch = kwargs.pop('ack_batch', self.ack_batch)
+        self.maxsize = kwargs.pop('maxsize', 0)
+        self.overflow = kwargs.pop('overflow', OF_RAISE)
+        if self.overflow not in OVERFLOW_ARGUMENTS:
+            raise RuntimeError('Overflow policy is not supported by RabbitMQInbox: {}'.format(self.overflow))
+        self.dropped = 0
+        self._connection_parameters = dict(kwargs)
         self.logger = getLogger(self.__class__.__name__)
 
+        self._declared = set()
+        self._consumer_tag = None
+        self._deliveries = collections.deque()
+        self._unacked = 0
+        self._last_tag = None
+
     @property
     def queue(self):
         return self._queue
@@ -45,22 +110,30 @@ class RabbitMQQueue(object):
         if not self._connection_parameters:
             raise QueueConnectionError
 
-        connection_parameters = self._connection_parameters.copy()
-
-        cred_args = tuple()
-        if 'username' in connection_parameters:
-            cred_args = cred_args + (connection_parameters.pop('username'),)
-        if 'password' in connection_parameters:
-            cred_args = cred_args + (connection_parameters.pop('password'),)
-
-        credentials = PlainCredentials(*cred_args) if len(cred_args) == 2 else None
-        cp = ConnectionParameters(credentials=credentials, **connection_parameters)
-        connection = BlockingConnection(cp)
-        self._channel = connection.channel()
+        self._connection = self._connection_factory(**self._connection_parameters.copy())
+        self._channel = self._connection.channel()
+        if self.maxsize and self.overflow != OF_DROP_HEAD:
+            # rejected publishes are nacked
+            self._channel.confirm_delivery()
+        self._declared = set()
+        self._consumer_tag = None
 
         return self
 
-    def put(self, body, queue=None, **kwargs):
+    def close(self):
+        if self._channel is None:
+            return
+        if self._consumer_tag is not None:
+            self.ack()
+            self._channel.basic_cancel(self._consumer_tag)
+        self._connection.close()
+        self._channel = None
+        self._connection = None
+        self._consumer_tag = None
+        # unacked deliveries are requeued by broker
+        self._deliveries.clear()
+
+    def _target(self, queue):
         if not self._channel:
             self.connect()
 
@@ -68,24 +141,42 @@ class RabbitMQQueue(object):
         if queue is None:
             raise QueueConnectionError("No 'queue' parameter specified")
 
-        self._channel.queue_declare(queue)
+        if queue not in self._declared:
+            arguments = None
+            if self.maxsize:
+                arguments = {'x-max-length': self.maxsize, 'x-overflow': OVERFLOW_ARGUMENTS[self.overflow]}
+            self._channel.queue_declare(queue, arguments=arguments)
+            self._declared.add(queue)
+        return queue
+
+    def _publish(self, **message):
+        try:
+            self._channel.basic_publish(**message)
+        except NackError:
+            if self.overflow == OF_RAISE:
+                raise FullInboxException
+            self.dropped += 1
+
+    @staticmethod
+    def _properties(properties):
+        if BasicProperties is None:
+            return properties if properties else None
+        return BasicProperties(**properties)
+
+    def put(self, body, queue=None, **kwargs):
+        queue = self._target(queue)
+
         self.logger.debug(u"Put message [{0}] in '{1}' with kwargs: {2}".format(body, queue, kwargs))
-        message = dict(exchange='', routing_key=queue, properties=BasicProperties(**kwargs.pop('properties', {})))
+        message = dict(exchange='', routing_key=queue, properties=self._properties(kwargs.pop('properties', {})))
         message.update(kwargs)
         message['body'] = body
         message['routing_key'] = queue
 
-        return self._channel.basic_publish(**message)
+        return self._publish(**message)
 
     def get(self, queue=None):
-        if not self._channel:
-            self.connect()
-
-        queue = self._queue if queue is None else queue
-        if queue is None:
-            raise QueueConnectionError("No 'queue' parameter specified")
+        queue = self._target(queue)
 
-        self._channel.queue_declare(queue)
         method, poroperties, body = self._channel.basic_get(queue)
         if method:
             message = body
@@ -94,6 +185,70 @@ class RabbitMQQueue(object):
         else:
             return None
 
+    def put_many(self, bodies, queue=None, **kwargs):
+        queue = self._target(queue)
+
+        properties = self._properties(kwargs.pop('properties', {}))
+        for body in bodies:
+            self._publish(exchange='', routing_key=queue, body=body, properties=properties, **kwargs)
+
+    def get_many(self, count, queue=None):
+        queue = self._target(queue)
+
+        messages = list()
+        last_tag = None
+        for _ in range(count):
+            method, properties, body = self._channel.basic_get(queue)
+            if not method:
+                break
+            messages.append(body)
+            last_tag = method.delivery_tag
+        if last_tag is not None:
+            # one ack for the whole batch
+            self._channel.basic_ack(delivery_tag=last_tag, multiple=True)
+        return messages
+
+    def consume(self, queue=None):
+        queue = self._target(queue)
+        if self._consumer_tag is not None:
+            return self
+
+        self._channel.basic_qos(prefetch_count=self.prefetch_count)
+        self._consumer_tag = self._channel.basic_consume(queue=queue, on_message_callback=self._on_delivery)
+        return self
+
+    def _on_delivery(self, channel, method, properties, body):
+        self._deliveries.append((method.delivery_tag, body))
+
+    def get_consumed(self, count, timeout=None):
+        if self._consumer_tag is None:
+            self.consume()
+
+        if not self._deliveries:
+            # deliver what broker has sent already, wait up to timeout for more
+            deadline = None if timeout is None else time.time() + timeout
+            while True:
+                remaining = 0 if deadline is None else max(deadline - time.time(), 0)
+                self._connection.process_data_events(time_limit=remaining)
+                if self._deliveries or not remaining:
+                    break
+
+        messages = list()
+        while self._deliveries and len(messages) < count:
+            self._last_tag, body = self._deliveries.popleft()
+            messages.append(body)
+        self._unacked += len(messages)
+
+        ack_batch = self.ack_batch if self.ack_batch else max(self.prefetch_count // 2, 1)
+        if self._unacked >= ack_batch or not self._deliveries:
+            self.ack()
+        return messages
+
+    def ack(self):
+        if self._unacked:
+            self._channel.basic_ack(delivery_tag=self._last_tag, multiple=True)
+            self._unacked = 0
+
     def length(self, queue=None):
         if not self._channel:
             self.connect()
@@ -102,8 +257,8 @@ class RabbitMQQueue(object):
         if queue is None:
             raise QueueConnectionError("No 'queue' parameter specified")
 
-        queue_attr = self._channel.queue_declare(self._queue, passive=True)
-        return queue_attr.method.message_count
+        queue_attr = self._channel.queue_declare(queue, passive=True)
+        return queue_attr.method.message_count + len(self._deliveries)
 
 
 class RabbitMQInbox(object):
@@ -121,7 +276,7 @@ class RabbitMQInbox(object):
 
     @get_queue.setter
     def get_queue(self, value):
-        if type(value) not in str:
+        if not isinstance(value, str):
             raise ValueError("You must queue must be string")
         self._get_queue = value
 
@@ -138,7 +293,7 @@ class RabbitMQInbox(object):
 
     @put_queue.setter
     def put_queue(self, value):
-        if type(value) not in str:
+        if not isinstance(value, str):
             raise ValueError("You must queue must be string")
         self._put_queue = value
 
@@ -146,22 +301,55 @@ class RabbitMQInbox(object):
     def put_queue(self):
         self._put_queue = None
 
-    def __init__(self, logger=None, get_queue=None, put_queue=None, **conn):
+    def __init__(self, logger=None, get_queue=None, put_queue=None, consume=False, codec=None,
+                 maxsize=0, overflow=OF_RAISE, **conn):
+        ''' consume - get messages pushed by broker (see RabbitMQQueue.consume)
+        codec - name of message codec (see pyactors.serialization)
+        maxsize, overflow - queue length limit and overflow policy (see RabbitMQQueue)
+        '''
         self.get_queue = get_queue if get_queue is not None else self.get_queue
         self.put_queue = put_queue if put_queue is not None else self.put_queue
+        self._consume = consume
+        self._codec = get_codec(codec)
+
+        self._cli = RabbitMQQueue(maxsize=maxsize, overflow=overflow, **conn)
 
-        self._cli = RabbitMQQueue(**conn)
+    def get(self, timeout=None):
+        if self._consume:
+            return self.get_many(1, timeout=timeout)[0]
 
-    def get(self):
+        # basic_get does not block, timeout is accepted for inbox compatibility
         out = self._cli.get(self.get_queue)
 
         if out is None:
             raise EmptyInboxException
 
-        return loads(out)
+        return self._codec.loads(out)
+
+    def get_many(self, max_n, timeout=None):
+        if self._consume:
+            self._cli.consume(self.get_queue)
+            out = self._cli.get_consumed(max_n, timeout=timeout)
+        else:
+            # basic_get does not block, timeout is accepted for inbox compatibility
+            out = self._cli.get_many(max_n, self.get_queue)
+
+        if not out:
+            raise EmptyInboxException
+
+        return [self._codec.loads(body) for body in out]
 
     def put(self, message):
-        self._cli.put(dumps(message), self.put_queue)
+        self._cli.put(self._codec.dumps(message), self.put_queue)
+
+    def put_many(self, messages):
+        self._cli.put_many([self._codec.dumps(message) for message in messages], self.put_queue)
+
+    def close(self):
+        self._cli.close()
+
+    def metrics(self):
+        return dict(depth=len(self), dropped=self._cli.dropped, blocked=0)
 
     def __len__(self):
         return self._cli.length(self.get_queue)
@@ -1,26 +1,91 @@
 #!/usr/bin/env python
 # -*- coding: utf8 -*-
-from redis import StrictRedis
+import threading
+from math import ceil
+from redis import StrictRedis, ConnectionPool
+from redis.exceptions import ResponseError
 from logging import getLogger
 
-try:
-    from ujson import loads, dumps
-except ImportError:
-    from json import loads, dumps
-
-from .exceptions import EmptyInboxException, QueueConnectionError
+from .base import OF_DROP_HEAD, OF_DROP_TAIL, OF_RAISE
+from .exceptions import EmptyInboxException, FullInboxException, QueueConnectionError
+from ..serialization import get_codec
 
 __all__ = ['RedisInbox']
 
+# LPUSH to bounded list: KEYS[1] - list, ARGV[1] - maxsize, ARGV[2] - 1 to
+# drop the oldest messages, 0 to reject the new ones, ARGV[3:] - messages.
+# Returns the number of dropped or rejected messages
+BOUNDED_PUSH = '''
+local room = tonumber(ARGV[1]) - redis.call('LLEN', KEYS[1])
+local count = #ARGV - 2
+if ARGV[2] == '1' then
+    for i = 3, #ARGV do
+        redis.call('LPUSH', KEYS[1], ARGV[i])
+    end
+    if count > room then
+        redis.call('LTRIM', KEYS[1], 0, tonumber(ARGV[1]) - 1)
+        return count - room
+    end
+    return 0
+end
+local pushed = math.max(math.min(count, room), 0)
+for i = 3, 2 + pushed do
+    redis.call('LPUSH', KEYS[1], ARGV[i])
+end
+return count - pushed
+'''
+
+
+def redis_client(**connection_parameters):
+    ''' default client factory, returns StrictRedis with its own connection pool
+    '''
+    return StrictRedis(connection_pool=ConnectionPool(**connection_parameters))
+
 
 class RedisQueue(object):
+    ''' Redis list as queue
+
+    Connections are taken from the instance's own pool. Writes are buffered
+    on the client side and sent by one pipeline when `batch_size` messages
+    are buffered or `flush_interval` seconds have passed since the first
+    buffered message, every queue in the flushed batch gets one PUBLISH.
+    A failed flush puts the batch back to the buffer, so a write which
+    failed in the middle of the pipeline may be repeated by the next one.
+    Errors of the timer's flush are logged, the batch waits for the next
+    put(), flush() or close().
+
+    `maxsize` limits the length of the lists, 0 - unbounded. The length is
+    checked by BOUNDED_PUSH script on Redis, so the batch is checked when
+    it is flushed: OF_DROP_HEAD trims the oldest messages, OF_DROP_TAIL
+    drops the new ones, OF_RAISE drops them too and raises
+    FullInboxException. OF_BLOCK and OF_SPILL are not supported.
+    '''
     _cli = None
-    _connection_parameters = dict()
     _queue = None
 
+    # buffered messages which force flush, 1 - write every message at once
+    batch_size = 1
+    # max seconds a buffered message waits for flush
+    flush_interval = 0.005
+
     def __init__(self, **kwargs):
         self._queue = kwargs.pop('queue', None)
-        self._connection_parameters.update(kwargs)
+        self.batch_size = kwargs.pop('batch_size', self.batch_size)
+        self.flush_interval = kwargs.pop('flush_interval', self.flush_interval)
+        self._codec = get_codec(kwargs.pop('codec', None))
+        self._client_factory = kwargs.pop('client_factory', redis_client)
+        self.maxsize = kwargs.pop('maxsize', 0)
+        self.overflow = kwargs.pop('overflow', OF_RAISE)
+        if self.overflow not in (OF_DROP_HEAD, OF_DROP_TAIL, OF_RAISE):
+            raise RuntimeError('Overflow policy is not supported by RedisInbox: {}'.format(self.overflow))
+        self.dropped = 0
+        self._connection_parameters = dict(kwargs)
+        self._lmpop = True
+
+        self._buffer = dict()
+        self._buffered = 0
+        self._timer = None
+        self._lock = threading.Lock()
         self.logger = getLogger(self.__class__.__name__)
 
     def connect(self, **kwargs):
@@ -28,32 +93,148 @@ class RedisQueue(object):
             return self
 
         self._queue = kwargs.pop('queue') if kwargs.get('queue') else self._queue
-        self._connection_parameters.update(kwargs)
+        if kwargs:
+            self._connection_parameters.update(kwargs)
+            self.close()
 
         if not self._connection_parameters:
             raise QueueConnectionError
 
-        self._cli = StrictRedis(**self._connection_parameters)
+        self._cli = self._client_factory(**self._connection_parameters.copy())
         return self
 
+    def close(self):
+        self.flush()
+        if self._cli is not None:
+            self._cli.connection_pool.disconnect()
+        self._cli = None
+
     def put(self, message, **kwargs):
-        self.connect() if not self._cli else None
         queue = kwargs.pop('queue') if kwargs.get('queue') else self._queue
         publisher = kwargs.pop('publisher') if kwargs.get('publisher') else 'default'
 
-        pipe = self._cli.pipeline()
-        return pipe.lpush(queue, dumps(message)).publish(publisher, queue).execute()
+        with self._lock:
+            self._buffer.setdefault((queue, publisher), list()).append(self._codec.dumps(message))
+            self._buffered += 1
+            if self._buffered < self.batch_size:
+                if self._timer is None:
+                    self._timer = threading.Timer(self.flush_interval, self._flush_later)
+                    self._timer.daemon = True
+                    self._timer.start()
+                return None
+        return self.flush()
+
+    def put_many(self, messages, **kwargs):
+        queue = kwargs.pop('queue') if kwargs.get('queue') else self._queue
+        publisher = kwargs.pop('publisher') if kwargs.get('publisher') else 'default'
+
+        values = [self._codec.dumps(message) for message in messages]
+        if not values:
+            return None
+        with self._lock:
+            self._buffer.setdefault((queue, publisher), list()).extend(values)
+            self._buffered += len(values)
+        return self.flush()
+
+    def flush(self):
+        with self._lock:
+            buffer, self._buffer = self._buffer, dict()
+            self._buffered = 0
+            timer, self._timer = self._timer, None
+        if timer is not None:
+            timer.cancel()
+        if not buffer:
+            return None
+
+        try:
+            self.connect() if not self._cli else None
+            pipe = self._cli.pipeline(transaction=False)
+            for (queue, publisher), values in buffer.items():
+                if self.maxsize:
+                    pipe.eval(BOUNDED_PUSH, 1, queue, self.maxsize, int(self.overflow == OF_DROP_HEAD), *values)
+                else:
+                    pipe.lpush(queue, *values)
+                pipe.publish(publisher, queue)
+            result = pipe.execute()
+        except Exception:
+            with self._lock:
+                # the batch goes ahead of messages buffered while it was sent
+                for key, values in self._buffer.items():
+                    buffer.setdefault(key, list()).extend(values)
+                self._buffer = buffer
+                self._buffered = sum(len(values) for values in buffer.values())
+            raise
+
+        if self.maxsize:
+            rejected = sum(result[::2])
+            if rejected and self.overflow == OF_RAISE:
+                raise FullInboxException
+            self.dropped += rejected
+        return result
+
+    def _flush_later(self):
+        try:
+            self.flush()
+        except Exception as err:
+            self.logger.error(u'Buffered messages are not flushed, {} are kept: {}'.format(self._buffered, err))
 
     def get(self, **kwargs):
         self.connect() if not self._cli else None
         queue = kwargs.pop('queue') if kwargs.get('queue') else self._queue
-        timeout = kwargs.pop('timeout') if isinstance(kwargs.get('timeout'), int) else 1
+        timeout = kwargs.get('timeout')
+
+        if timeout is None:
+            out = self._cli.rpop(queue)
+        else:
+            out = self._cli.brpop(queue, timeout)
+            out = out[1] if out else None
+        return self._decode(out) if out is not None else None
 
+    def get_many(self, count, **kwargs):
+        self.connect() if not self._cli else None
+        queue = kwargs.pop('queue') if kwargs.get('queue') else self._queue
+
+        result = list()
+        for out in self._pop_many(queue, count):
+            message = self._decode(out)
+            if message is not None:
+                result.append(message)
+
+        if not result and kwargs.get('timeout') is not None:
+            # nothing is ready, block for the first message
+            out = self.get(queue=queue, timeout=kwargs['timeout'])
+            if out is not None:
+                result.append(out)
+                if count > 1:
+                    result.extend(self.get_many(count - 1, queue=queue))
+        return result
+
+    def _decode(self, data):
         try:
-            return loads(str(self._cli.brpop(queue, timeout)[1], 'utf-8'))
-        except (TypeError, ValueError):
+            return self._codec.loads(data)
+        except Exception as err:
+            self.logger.warning(u'Broken message is skipped: {}'.format(err))
             return None
 
+    def _pop_many(self, queue, count):
+        if self._lmpop:
+            try:
+                out = self._cli.lmpop(1, queue, direction='RIGHT', count=count)
+                return out[1] if out else []
+            except AttributeError:
+                # LMPOP needs redis-py 4.2+
+                self._lmpop = False
+            except ResponseError as err:
+                # and Redis server 7.0+, other errors are not about LMPOP support
+                if 'unknown command' not in str(err).lower():
+                    raise
+                self._lmpop = False
+
+        pipe = self._cli.pipeline(transaction=False)
+        for _ in range(count):
+            pipe.rpop(queue)
+        return [out for out in pipe.execute() if out is not None]
+
     def length(self, queue=None):
         self.connect() if not self._cli else None
         queue = queue if queue else self._queue
@@ -74,33 +255,72 @@ class RedisQueue(object):
 
 
 class RedisInbox(object):
+    ''' Inbox on Redis list
+
+    BRPOP waits in whole seconds, so get() and get_many() round timeout
+    up to the next second, timeouts below one second don't block at all.
+
+    `maxsize` and `overflow` bound the lists, see RedisQueue. Messages
+    dropped by OF_DROP_HEAD and OF_DROP_TAIL are counted in metrics().
+    '''
     _channel = None
 
     _get_queue = None
     _put_queue = None
 
-    def __init__(self, logger=None, get_queue=None, put_queue=None, **conn):
+    def __init__(self, logger=None, get_queue=None, put_queue=None, maxsize=0, overflow=OF_RAISE, **conn):
         self.get_queue = get_queue if get_queue is not None else self.get_queue
         self.put_queue = put_queue if put_queue is not None else self.put_queue
 
-        self._channel = RedisQueue(**conn)
+        self._channel = RedisQueue(maxsize=maxsize, overflow=overflow, **conn)
 
-    def get(self):
-        return self.get_from(self.get_queue)
+    def get(self, timeout=None):
+        return self.get_from(self.get_queue, timeout=timeout)
 
-    def get_from(self, queue):
-        out = self._channel.get(queue=queue)
+    def get_from(self, queue, timeout=None):
+        kwargs = dict(queue=queue, timeout=self._blocking_timeout(timeout))
+        out = self._channel.get(**kwargs)
         if out is None:
             raise EmptyInboxException
 
         return out
 
+    def get_many(self, max_n, timeout=None):
+        kwargs = dict(queue=self.get_queue, timeout=self._blocking_timeout(timeout))
+        out = self._channel.get_many(max_n, **kwargs)
+        if not out:
+            raise EmptyInboxException
+
+        return out
+
+    @staticmethod
+    def _blocking_timeout(timeout):
+        ''' return BRPOP timeout in whole seconds, None - pop without blocking
+
+        0 means forever for BRPOP, sub-second waits are not blocked
+        '''
+        if timeout is None or timeout < 1:
+            return None
+        return int(ceil(timeout))
+
     def put(self, message):
         return self.put_in(message, self.put_queue)
 
+    def put_many(self, messages):
+        return self._channel.put_many(messages, queue=self.put_queue)
+
     def put_in(self, message, queue):
         return self._channel.put(message, queue=queue)
 
+    def flush(self):
+        return self._channel.flush()
+
+    def close(self):
+        self._channel.close()
+
+    def metrics(self):
+        return dict(depth=len(self), dropped=self._channel.dropped, blocked=0)
+
     def __len__(self):
         return self.total(self._get_queue)
 
@@ -0,0 +1,389 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+import io
+import os
+import time
+import pickle
+import struct
+import logging
+import weakref
+import multiprocessing
+
+from multiprocessing import shared_memory
+
+from .base import OF_BLOCK, OF_DROP_HEAD, OF_DROP_TAIL, OF_RAISE
+from .exceptions import EmptyInboxException, FullInboxException
+
+__all__ = ['SharedMemoryInbox']
+
+# frame: pickle length, flags, number of out-of-band segments
+FRAME = struct.Struct('<IBH')
+# segment: buffer size, name length
+SEGMENT = struct.Struct('<QB')
+
+# frame flags
+FF_SPILLED = 1
+
+
+def _rebuild_bytes(buffer):
+    ''' rebuild bytes passed out-of-band
+    '''
+    return bytes(buffer)
+
+
+def _rebuild_bytearray(buffer):
+    ''' rebuild bytearray passed out-of-band
+    '''
+    return bytearray(buffer)
+
+
+def _rebuild_memoryview(buffer):
+    ''' memoryview passed out-of-band stays a view of shared memory
+    '''
+    return memoryview(buffer)
+
+
+class _Pickler(pickle.Pickler):
+    ''' Pickler which passes large bytes-like objects as out-of-band buffers
+    '''
+
+    _rebuild = {
+        bytes: _rebuild_bytes,
+        bytearray: _rebuild_bytearray,
+        memoryview: _rebuild_memoryview,
+    }
+
+    def __init__(self, file, threshold, buffer_callback):
+        super(_Pickler, self).__init__(file, protocol=5, buffer_callback=buffer_callback)
+        self._threshold = threshold
+
+    def reducer_override(self, obj):
+        rebuild = self._rebuild.get(type(obj))
+        if rebuild is None or len(obj) < self._threshold:
+            return NotImplemented
+        if isinstance(obj, memoryview) and not obj.contiguous:
+            return NotImplemented
+        return rebuild, (pickle.PickleBuffer(obj),)
+
+
+def _release(ring, pid):
+    ''' unlink ring of inbox in the process which created it
+    '''
+    ring.close()
+    if os.getpid() == pid:
+        ring.unlink()
+
+
+class SharedMemoryInbox(object):
+    ''' Inbox from ring buffer in multiprocessing.shared_memory
+
+    Messages are pickled with protocol 5. Buffers of at least
+    `oob_threshold` bytes (bytes, bytearray, memoryview, numpy arrays and
+    other PickleBuffer-aware objects) are not copied into the pickle: every
+    one of them gets its own shared memory segment and only the segment name
+    goes through the ring. The reader maps the segment, so memoryviews and
+    numpy arrays are received without copying; bytes and bytearray are
+    rebuilt by one copy. Segments are unlinked by the reader right after
+    they are mapped and released when the received objects are gone.
+
+    The inbox is full when the ring has no room for the message header or
+    `maxsize` messages (0 - unbounded) are queued. put() follows `overflow`
+    policy then: OF_BLOCK waits up to timeout for room, OF_DROP_HEAD drops
+    the oldest messages until the new one fits, OF_DROP_TAIL drops the new
+    one, OF_RAISE raises FullInboxException. Segments of dropped messages
+    are unlinked. Dropped messages and puts which had to wait are counted
+    in metrics().
+
+    The inbox must be created before the actor is forked.
+    '''
+
+    # size of ring buffer, bytes
+    capacity = 1 << 20
+    # buffers passed out-of-band starting from this size, bytes
+    oob_threshold = 1 << 16
+
+    def __init__(self, logger=None, capacity=None, oob_threshold=None, maxsize=0, overflow=OF_BLOCK):
+        ''' __init__
+        '''
+        if overflow not in (OF_BLOCK, OF_DROP_HEAD, OF_DROP_TAIL, OF_RAISE):
+            raise RuntimeError('Overflow policy is not supported by SharedMemoryInbox: {}'.format(overflow))
+        self.maxsize = maxsize
+        self.overflow = overflow
+        if capacity is not None:
+            self.capacity = capacity
+        if oob_threshold is not None:
+            self.oob_threshold = oob_threshold
+
+        self._ring = shared_memory.SharedMemory(create=True, size=self.capacity)
+        self._finalizer = weakref.finalize(self, _release, self._ring, os.getpid())
+        self._ready = multiprocessing.Condition(multiprocessing.Lock())
+        # read and write positions grow monotonically, offset in ring is position % capacity
+        self._head = multiprocessing.RawValue('Q', 0)
+        self._tail = multiprocessing.RawValue('Q', 0)
+        self._count = multiprocessing.RawValue('Q', 0)
+        self._woken = multiprocessing.RawValue('b', 0)
+        self._dropped = multiprocessing.RawValue('Q', 0)
+        self._blocked = multiprocessing.RawValue('Q', 0)
+        # mapped segments with received objects still referring to them
+        self._leases = list()
+
+        if logger is None:
+            self._logger = logging.getLogger('%s.SharedMemoryInbox' % __name__)
+        else:
+            self._logger = logger
+
+    def _segment(self, data):
+        ''' copy data to new shared memory segment, return segment name
+        '''
+        size = data.nbytes
+        segment = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        try:
+            segment.buf[:size] = data.cast('B')
+        finally:
+            segment.close()
+        return segment.name
+
+    def _encode(self, message):
+        ''' return frame of message
+        '''
+        buffers = list()
+        out = io.BytesIO()
+
+        def buffer_callback(buffer):
+            view = buffer.raw()
+            if view.nbytes < self.oob_threshold:
+                return True
+            buffers.append(view)
+            return False
+
+        _Pickler(out, self.oob_threshold, buffer_callback).dump(message)
+        payload = out.getbuffer()
+
+        flags = 0
+        if FRAME.size + len(payload) > self.capacity // 2:
+            # pickle itself is too large for the ring
+            buffers.insert(0, payload)
+            payload = b''
+            flags |= FF_SPILLED
+
+        parts = [b'']
+        for buffer in buffers:
+            name = self._segment(buffer).encode('ascii')
+            parts.append(SEGMENT.pack(buffer.nbytes, len(name)))
+            parts.append(name)
+        parts[0] = FRAME.pack(len(payload), flags, len(buffers))
+        parts.append(payload)
+        return b''.join(parts)
+
+    def _decode(self, frame):
+        ''' return message from frame
+        '''
+        size, flags, segments = FRAME.unpack_from(frame)
+        offset = FRAME.size
+        buffers = list()
+        for _ in range(segments):
+            nbytes, length = SEGMENT.unpack_from(frame, offset)
+            offset += SEGMENT.size
+            name = bytes(frame[offset:offset + length]).decode('ascii')
+            offset += length
+            segment = shared_memory.SharedMemory(name=name)
+            # the mapping stays valid after unlink, memory is freed when it's closed
+            segment.unlink()
+            buffers.append((segment, segment.buf[:nbytes]))
+
+        if flags & FF_SPILLED:
+            payload = buffers[0][1]
+            message = pickle.loads(payload, buffers=[view for _, view in buffers[1:]])
+        else:
+            payload = frame[offset:offset + size]
+            message = pickle.loads(payload, buffers=[view for _, view in buffers])
+        del payload
+
+        self._leases.extend(buffers)
+        self._collect()
+        return message
+
+    def _discard(self, frame):
+        ''' unlink out-of-band segments of message which is not delivered
+        '''
+        segments = FRAME.unpack_from(frame)[2]
+        offset = FRAME.size
+        for _ in range(segments):
+            length = SEGMENT.unpack_from(frame, offset)[1]
+            offset += SEGMENT.size
+            name = bytes(frame[offset:offset + length]).decode('ascii')
+            offset += length
+            try:
+                segment = shared_memory.SharedMemory(name=name)
+            except FileNotFoundError:
+                continue
+            segment.unlink()
+            segment.close()
+
+    def _collect(self):
+        ''' close segments which are not referred by received objects anymore
+        '''
+        leases = list()
+        for segment, view in self._leases:
+            try:
+                view.release()
+                segment.close()
+            except BufferError:
+                leases.append((segment, view))
+        self._leases = leases
+
+    def _fits(self, size):
+        ''' return True if frame of size fits, the condition lock must be held
+        '''
+        if self.maxsize and self._count.value >= self.maxsize:
+            return False
+        return self.capacity - (self._tail.value - self._head.value) >= size + 4
+
+    def _offer(self, frame, deadline=None):
+        ''' write frame to ring by overflow policy, the condition lock must be held.
+        Return True if frame is written
+        '''
+        if not self._fits(len(frame)):
+            if self.overflow == OF_DROP_TAIL:
+                self._dropped.value += 1
+                self._discard(frame)
+                return False
+            elif self.overflow == OF_RAISE:
+                raise FullInboxException
+            elif self.overflow == OF_DROP_HEAD:
+                while self._count.value and not self._fits(len(frame)):
+                    self._discard(self._read())
+                    self._dropped.value += 1
+            else:
+                self._blocked.value += 1
+                while not self._fits(len(frame)):
+                    remaining = None if deadline is None else deadline - time.time()
+                    if remaining is not None and remaining <= 0:
+                        raise FullInboxException
+                    self._ready.wait(remaining)
+        self._write(frame)
+        return True
+
+    def _write(self, frame):
+        ''' write frame to ring, the condition lock must be held
+        '''
+        size = len(frame)
+        self._copy_in(self._tail.value, struct.pack('<I', size))
+        self._copy_in(self._tail.value + 4, frame)
+        self._tail.value += size + 4
+        self._count.value += 1
+
+    def _read(self):
+        ''' read frame from ring, the condition lock must be held
+        '''
+        size = struct.unpack('<I', self._copy_out(self._head.value, 4))[0]
+        frame = self._copy_out(self._head.value + 4, size)
+        self._head.value += size + 4
+        self._count.value -= 1
+        return frame
+
+    def _copy_in(self, position, data):
+        ''' copy data to ring starting from position, wrap around the end of ring
+        '''
+        offset = position % self.capacity
+        first = min(len(data), self.capacity - offset)
+        self._ring.buf[offset:offset + first] = data[:first]
+        if first < len(data):
+            self._ring.buf[:len(data) - first] = data[first:]
+
+    def _copy_out(self, position, size):
+        ''' copy size bytes from ring starting from position
+        '''
+        offset = position % self.capacity
+        first = min(size, self.capacity - offset)
+        data = bytes(self._ring.buf[offset:offset + first])
+        if first < size:
+            data += bytes(self._ring.buf[:size - first])
+        return data
+
+    def get(self, timeout=None):
+        ''' get data from inbox, wait up to timeout seconds if timeout is defined
+        '''
+        return self.get_many(1, timeout=timeout)[0]
+
+    def get_many(self, max_n, timeout=None):
+        ''' get up to max_n messages, wait up to timeout seconds for the first one
+        '''
+        if not self._count.value and (timeout is None or not self.wait(timeout)):
+            raise EmptyInboxException
+        frames = list()
+        with self._ready:
+            while self._count.value and len(frames) < max_n:
+                frames.append(self._read())
+            if frames:
+                self._ready.notify_all()
+        if not frames:
+            raise EmptyInboxException
+        return [self._decode(frame) for frame in frames]
+
+    def put(self, message, timeout=None):
+        ''' put message to inbox, wait up to timeout seconds for room (OF_BLOCK only)
+        '''
+        self.put_many((message,), timeout=timeout)
+
+    def put_many(self, messages, timeout=None):
+        ''' put messages to inbox
+        '''
+        frames = [self._encode(message) for message in messages]
+        if not frames:
+            return
+        for frame in frames:
+            if len(frame) + 4 > self.capacity:
+                for unsent in frames:
+                    self._discard(unsent)
+                raise ValueError('Message header is larger than inbox: {}'.format(len(frame)))
+        deadline = None if timeout is None else time.time() + timeout
+        written = 0
+        try:
+            with self._ready:
+                for frame in frames:
+                    self._offer(frame, deadline)
+                    written += 1
+                    self._ready.notify_all()
+        finally:
+            # segments of messages which are not written
+            for frame in frames[written:]:
+                self._discard(frame)
+
+    def wait(self, timeout=None):
+        ''' wait for new messages, return True if inbox is not empty
+        '''
+        if self._count.value:
+            return True
+        deadline = None if timeout is None else time.time() + timeout
+        with self._ready:
+            while not self._count.value and not self._woken.value:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._ready.wait(remaining)
+            self._woken.value = 0
+        return self._count.value > 0
+
+    def wakeup(self):
+        ''' wake up actor waiting for new messages, works across processes
+        '''
+        with self._ready:
+            self._woken.value = 1
+            self._ready.notify_all()
+
+    def metrics(self):
+        ''' return inbox counters: depth, dropped and blocked messages
+        '''
+        return dict(depth=self._count.value, dropped=self._dropped.value, blocked=self._blocked.value)
+
+    def close(self):
+        ''' release ring buffer, unlink it in the process which created the inbox
+        '''
+        self._collect()
+        self._finalizer()
+
+    def __len__(self):
+        ''' return length of inbox
+        '''
+        return self._count.value
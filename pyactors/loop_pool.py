@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+import struct
+import pickle
+import socket
+import asyncio
+import threading
+import itertools
+import multiprocessing
+
+from .base import AF_ASYNCIO
+from .inbox import QueueInbox
+from .pool import BasePool, PC_SEND, PC_STOP
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+__all__ = ['LoopPool', 'loop_policy']
+
+# frame header: payload length
+FRAME = struct.Struct('<I')
+
+
+def loop_policy(use_uvloop=None):
+    ''' return event loop policy for workers, None for the default one
+
+    `use_uvloop`: None - uvloop if it's installed, True - uvloop or
+    RuntimeError, False - the default asyncio loop
+    '''
+    if use_uvloop is False:
+        return None
+    if uvloop is None:
+        if use_uvloop:
+            raise RuntimeError('uvloop is not installed')
+        return None
+    return uvloop.EventLoopPolicy()
+
+
+def _frame(command):
+    ''' return pool command as length prefixed frame
+    '''
+    payload = pickle.dumps(command, pickle.HIGHEST_PROTOCOL)
+    return FRAME.pack(len(payload)) + payload
+
+
+class LoopPool(BasePool):
+    ''' Pool of worker processes, each of them runs one event loop with many
+    asyncio actors
+
+    The API is the same as of ProcessPool: actors are created by spawn()
+    in the worker chosen by `placement(address, workers)` and get messages
+    by send(). Workers and the parent are connected by a mesh of socket
+    pairs created before the fork, so a message between two shards is one
+    write to a local socket. Messages sent to `pool.address` are delivered
+    to `pool.inbox` in the parent process.
+
+    Workers use uvloop when it's installed, see loop_policy().
+    '''
+    families = (AF_ASYNCIO,)
+
+    def __init__(self, workers=None, placement=None, name=None, logger=None, use_uvloop=None):
+        ''' __init__
+        '''
+        super(LoopPool, self).__init__(workers=workers, placement=placement, name=name, logger=logger)
+        self.policy = loop_policy(use_uvloop)
+        self.inbox = QueueInbox()
+
+        # node `size` is the parent, socket pairs of every two nodes
+        self._pairs = dict()
+        self._processes = list()
+        self._readers = list()
+        self._locks = [threading.Lock() for _ in range(self.size)]
+        # writers to peers, defined in worker processes only
+        self._writers = dict()
+        self._stopped = None
+
+    def _socket(self, node, peer):
+        ''' return socket of node connected to peer
+        '''
+        pair = self._pairs[(min(node, peer), max(node, peer))]
+        return pair[0] if node < peer else pair[1]
+
+    def _close_others(self, node):
+        ''' close sockets inherited by node but owned by other nodes
+        '''
+        for peers, pair in self._pairs.items():
+            for owner, sock in zip(peers, pair):
+                if owner != node:
+                    sock.close()
+
+    def start(self):
+        ''' start worker processes
+        '''
+        if self._processes:
+            raise RuntimeError('Pool is started already: {}'.format(self.name))
+        nodes = self.size + 1
+        self._pairs = dict(((node, peer), socket.socketpair())
+                           for node, peer in itertools.combinations(range(nodes), 2))
+        for index in range(self.size):
+            process = multiprocessing.Process(name='{}-{}'.format(self.name, index),
+                                              target=self._serve, args=(index,))
+            process.daemon = True
+            process.start()
+            self._processes.append(process)
+
+        # the parent keeps only its own sockets to workers
+        self._close_others(self.size)
+        for index in range(self.size):
+            reader = threading.Thread(name='{}-reader-{}'.format(self.name, index),
+                                      target=self._read, args=(self._socket(self.size, index),))
+            reader.daemon = True
+            reader.start()
+            self._readers.append(reader)
+
+    def stop(self, timeout=None):
+        ''' stop hosted actors and worker processes
+        '''
+        for index in range(len(self._processes)):
+            self._write(index, (PC_STOP,))
+        for process in self._processes:
+            process.join(timeout)
+        for reader in self._readers:
+            reader.join(timeout)
+        for pair in self._pairs.values():
+            for sock in pair:
+                sock.close()
+        self._processes = list()
+        self._readers = list()
+        self._pairs = dict()
+
+    def send(self, address, message):
+        ''' send message to hosted actor or to pool inbox
+        '''
+        if address == self.address:
+            if self._index is None:
+                self.inbox.put(message)
+            else:
+                self._write(self.size, (PC_SEND, address, message))
+            return
+        index = self.placement(address, self.size)
+        if index == self._index:
+            self._deliver(address, message)
+        else:
+            self._write(index, (PC_SEND, address, message))
+
+    def _command(self, index, command):
+        ''' write command to worker
+        '''
+        self._write(index, command)
+
+    def _write(self, node, command):
+        ''' send command to node, buffered by event loop in workers
+        '''
+        if self._index is None:
+            with self._locks[node]:
+                self._socket(self.size, node).sendall(_frame(command))
+        else:
+            self._writers[node].write(_frame(command))
+
+    def _read(self, sock):
+        ''' read messages to pool inbox from worker socket, in the parent
+        '''
+        stream = sock.makefile('rb')
+        try:
+            while True:
+                header = stream.read(FRAME.size)
+                if len(header) < FRAME.size:
+                    break
+                command = pickle.loads(stream.read(FRAME.unpack(header)[0]))
+                self.inbox.put(command[2])
+        except (OSError, ValueError):
+            pass
+        finally:
+            stream.close()
+
+    def _host(self, actor):
+        ''' start local actor as task of worker event loop
+        '''
+        address = actor.address
+        actor.start()
+        actor._task.add_done_callback(lambda task: self._forget(address))
+
+    async def _listen(self, reader):
+        ''' execute commands coming from peer
+        '''
+        while True:
+            try:
+                header = await reader.readexactly(FRAME.size)
+                payload = await reader.readexactly(FRAME.unpack(header)[0])
+            except (asyncio.IncompleteReadError, ConnectionError):
+                break
+            if not self._execute(pickle.loads(payload)):
+                self._stopped.set()
+
+    async def _main(self):
+        ''' worker event loop
+        '''
+        self._stopped = asyncio.Event()
+        listeners = list()
+        for peer in range(self.size + 1):
+            if peer == self._index:
+                continue
+            reader, writer = await asyncio.open_connection(sock=self._socket(self._index, peer))
+            self._writers[peer] = writer
+            listeners.append(asyncio.ensure_future(self._listen(reader)))
+
+        await self._stopped.wait()
+
+        for actor in list(self._hosted.values()):
+            if actor.processing:
+                actor.stop()
+        await asyncio.gather(*[actor.ajoin() for actor in list(self._hosted.values())])
+        self._drop_early()
+        for writer in self._writers.values():
+            try:
+                await writer.drain()
+            except ConnectionError:
+                pass
+            writer.close()
+        for listener in listeners:
+            listener.cancel()
+        self._hosted = dict()
+
+    def _serve(self, index):
+        ''' worker process, runs event loop until stop command
+        '''
+        self._index = index
+        self._close_others(index)
+        if self.policy is not None:
+            asyncio.set_event_loop_policy(self.policy)
+        asyncio.run(self._main())
@@ -0,0 +1,244 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+import time
+
+from .routing import route_table
+
+try:
+    from collections.abc import MutableMapping
+except ImportError:
+    from collections import MutableMapping
+
+# layers of MessageView before they are collapsed to one
+MAX_VIEW_DEPTH = 16
+
+# value of a key deleted from MessageView, it masks the key of lower layers
+_DELETED = object()
+
+# System message kinds
+SM_STOP = 0
+SM_PING = 1
+SM_PONG = 2
+
+
+class SystemMessage(object):
+    ''' Control message, inboxes deliver it ahead of regular messages
+    '''
+    __slots__ = ('kind', 'sender', 'payload')
+
+    def __init__(self, kind, sender=None, payload=None):
+        ''' __init__
+        '''
+        self.kind = kind
+        self.sender = sender
+        self.payload = payload
+
+    def __reduce__(self):
+        ''' pickle system message as its fields
+        '''
+        return (SystemMessage, (self.kind, self.sender, self.payload))
+
+    def __repr__(self):
+        ''' represent system message as string
+        '''
+        return u'SystemMessage(kind={}, sender={})'.format(self.kind, self.sender)
+
+
+class MessageView(MutableMapping):
+    ''' Copy-on-write message made of layers, the top layer overrides the lower ones
+
+    merge() returns a new view with the delta on top and shares the rest,
+    so a message passed along a route stores only the changes of each hop.
+    Shared layers are never changed in place: the first change of a view
+    copies its top layer, deleted keys are masked there. The layers are
+    flattened to dict lazily: on iteration, by flatten() and when the view
+    is pickled, a pickled view is restored as plain dict.
+    '''
+    __slots__ = ('_delta', '_parent', '_depth', '_flat', '_owned')
+
+    def __init__(self, delta=None, parent=None):
+        ''' __init__, delta is dict of the top layer, parent - any mapping below it,
+        neither of them is changed by the view
+        '''
+        self._delta = dict() if delta is None else delta
+        self._parent = parent
+        self._flat = None
+        self._owned = delta is None
+        depth = parent._depth + 1 if isinstance(parent, MessageView) else 1
+        if depth > MAX_VIEW_DEPTH:
+            # keep lookups short on long routes
+            self._delta, self._parent, depth = self._collapse(), None, 1
+            self._owned = True
+        self._depth = depth
+
+    def share(self):
+        ''' return new view of the same layers, both views copy the top layer
+        on their first change
+        '''
+        view = MessageView.__new__(MessageView)
+        view._delta, view._parent, view._depth, view._flat = self._delta, self._parent, self._depth, self._flat
+        view._owned = self._owned = False
+        return view
+
+    def merge(self, delta):
+        ''' return new view with delta on top of this one, later changes of
+        this view are not seen by the new one
+        '''
+        view = self.share()
+        return MessageView(delta, view) if delta else view
+
+    def _collapse(self):
+        ''' return dict of all layers
+        '''
+        layers, view = [], self
+        while isinstance(view, MessageView):
+            layers.append(view._delta)
+            view = view._parent
+        data = dict(view) if view is not None else dict()
+        for delta in reversed(layers):
+            data.update(delta)
+        for key in [key for key, value in data.items() if value is _DELETED]:
+            del data[key]
+        return data
+
+    def flatten(self):
+        ''' return the message as dict, the dict must not be changed
+        '''
+        if self._flat is None:
+            if self._parent is not None:
+                self._flat = self._collapse()
+            else:
+                # the top layer is the message, the view copies it on change
+                self._flat, self._owned = self._delta, False
+        return self._flat
+
+    def _own(self):
+        ''' return top layer the view may change
+        '''
+        if not self._owned:
+            self._delta = dict(self._delta)
+            self._owned = True
+        self._flat = None
+        return self._delta
+
+    def copy(self):
+        ''' return the message as new dict
+        '''
+        return dict(self.flatten())
+
+    def __getitem__(self, key):
+        ''' return value of the top layer having the key
+        '''
+        view = self
+        while isinstance(view, MessageView):
+            if key in view._delta:
+                value = view._delta[key]
+                if value is _DELETED:
+                    raise KeyError(key)
+                return value
+            view = view._parent
+        if view is None:
+            raise KeyError(key)
+        return view[key]
+
+    def __setitem__(self, key, value):
+        ''' set the key in the top layer
+        '''
+        self._own()[key] = value
+
+    def __delitem__(self, key):
+        ''' delete the key, it's masked in the top layer if lower layers have it
+        '''
+        if key not in self:
+            raise KeyError(key)
+        delta = self._own()
+        if self._parent is None:
+            del delta[key]
+        else:
+            delta[key] = _DELETED
+
+    def __contains__(self, key):
+        ''' check the key in layers
+        '''
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self):
+        ''' iterate over keys of the flattened message
+        '''
+        return iter(self.flatten())
+
+    def __len__(self):
+        ''' return number of keys
+        '''
+        return len(self.flatten())
+
+    def __bool__(self):
+        ''' check that any key is not deleted, without flattening the layers
+        '''
+        deleted, view = set(), self
+        while isinstance(view, MessageView):
+            for key, value in view._delta.items():
+                if value is _DELETED:
+                    deleted.add(key)
+                elif key not in deleted:
+                    return True
+            view = view._parent
+        return view is not None and any(key not in deleted for key in view)
+
+    __nonzero__ = __bool__
+
+    def __reduce__(self):
+        ''' the message leaves the process as plain dict
+        '''
+        return (dict, (self.flatten(),))
+
+    def __repr__(self):
+        ''' represent message view as string
+        '''
+        return u'MessageView({})'.format(self.flatten())
+
+
+class Envelope(object):
+    ''' Message of BaseActor with routing metadata kept apart from payload
+
+    `payload` is the user data, the dict BaseActor exposes as `message`.
+    `route` and `hop` point to the next step in the process-local route
+    table, `steps` carries the remaining steps when the message leaves the
+    process. `cid` is correlation id passed along the route, `created` is
+    the time the first message of the route was sent and `sent` - the time
+    of this hop. Payload is shared between hops while it's not changed.
+    '''
+    __slots__ = ('payload', 'sender', 'target', 'route', 'hop', 'steps', 'cid', 'created', 'sent')
+
+    def __init__(self, payload, sender=None, target=None, route=None, hop=0, steps=None,
+                 cid=None, created=None, sent=None):
+        ''' __init__
+        '''
+        self.payload = payload
+        self.sender = sender
+        self.target = target
+        self.route = route
+        self.hop = hop
+        self.steps = steps
+        self.cid = cid
+        self.sent = time.time() if sent is None else sent
+        self.created = self.sent if created is None else created
+
+    def __reduce__(self):
+        ''' pickle envelope as tuple of its fields, the remaining steps go instead of route id
+        '''
+        steps = self.steps
+        if steps is None and self.route is not None:
+            steps = list(route_table.steps(self.route)[self.hop:])
+        return (Envelope, (self.payload, self.sender, self.target, None, 0, steps,
+                           self.cid, self.created, self.sent))
+
+    def __repr__(self):
+        ''' represent envelope as string
+        '''
+        return u'Envelope(sender={}, target={}, route={}, hop={})'.format(
+            self.sender, self.target, self.route, self.hop)
@@ -0,0 +1,332 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+import os
+import uuid
+import queue
+import logging
+import functools
+import collections
+import multiprocessing
+
+from .base import AF_GENERATOR, AF_GREENLET
+from .inbox import ProcessInbox
+
+# Pool commands
+PC_SPAWN = 0
+PC_SEND = 1
+PC_STOP = 2
+
+
+def hash_placement(address, workers):
+    ''' place actor by its address hash
+    '''
+    return int(address, 16) % workers
+
+
+class ActorRef(object):
+    ''' Reference to actor hosted by process pool
+    '''
+
+    def __init__(self, address, pool):
+        ''' __init__
+        '''
+        self.address = address
+        self._pool = pool
+
+    def __str__(self):
+        ''' represent actor reference as string
+        '''
+        return u'ActorRef[{}]'.format(self.address)
+
+    def send(self, message):
+        ''' send message to referenced actor
+        '''
+        self._pool.send(self.address, message)
+
+
+class BasePool(object):
+    ''' Base of worker pools, hosted actors and pool commands of a worker
+
+    Subclasses pass commands to workers by _command() and define actor
+    families they can host. Messages which come before the spawn command
+    of their actor are kept until the actor is spawned, up to
+    `max_early_messages` per worker. Above the limit the worker drops one
+    message per new one: the oldest message to the actor which has been
+    waiting for its spawn longest. Dropped messages are counted by
+    `early_dropped`.
+    '''
+
+    # families of actors hosted by workers
+    families = ()
+    # max messages kept by worker for actors which are not spawned yet,
+    # the oldest message of the longest waiting actor is dropped above it
+    max_early_messages = 10000
+
+    def __init__(self, workers=None, placement=None, name=None, logger=None):
+        ''' __init__
+        '''
+        self.name = name if name else self.__class__.__name__
+        self.logger = logger if logger else logging.getLogger(self.name)
+        self.size = workers if workers else (os.cpu_count() or 1)
+        self.placement = placement if placement else hash_placement
+
+        self.address = uuid.uuid4().hex
+        # worker index and hosted actors, defined in worker processes only
+        self._index = None
+        self._hosted = dict()
+        self._early = collections.OrderedDict()
+        self._early_count = 0
+        self._gone = set()
+        # messages to actors not spawned yet, dropped by worker above the limit
+        self.early_dropped = 0
+
+    def spawn(self, actor_class, *args, **kwargs):
+        ''' create actor in one of workers, return reference to the actor
+        '''
+        address = uuid.uuid4().hex
+        self._command(self.placement(address, self.size), (PC_SPAWN, address, actor_class, args, kwargs))
+        return ActorRef(address, self)
+
+    def ref(self, address):
+        ''' return reference to actor by address
+        '''
+        return ActorRef(address, self)
+
+    def _command(self, index, command):
+        ''' pass command to worker
+        '''
+        raise RuntimeError('{}._command() is not implemented'.format(self.__class__.__name__))
+
+    def _deliver(self, address, message):
+        ''' put message to inbox of local actor, keep it until the actor is spawned
+        '''
+        actor = self._hosted.get(address)
+        if actor is not None:
+            actor.inbox.put(message)
+        elif address in self._gone:
+            self.logger.warning(u'Message to stopped actor {}: {}'.format(address, message))
+        else:
+            # spawn and send commands come from different producers
+            self._early.setdefault(address, collections.deque()).append(message)
+            self._early_count += 1
+            while self._early_count > self.max_early_messages:
+                oldest, messages = next(iter(self._early.items()))
+                dropped = messages.popleft()
+                if not messages:
+                    del self._early[oldest]
+                self._early_count -= 1
+                self.early_dropped += 1
+                self.logger.warning(u'{} - message to unknown actor {} is dropped: {}'.format(
+                    self.name, oldest, dropped))
+
+    def _spawn(self, address, actor_class, args, kwargs):
+        ''' create and start local actor
+        '''
+        actor = actor_class(*args, **kwargs)
+        if actor.family not in self.families:
+            raise RuntimeError('Actor can not be hosted by {}: {}'.format(self.name, actor))
+        actor.registry.unregister(actor)
+        actor.address = address
+        actor.registry.register(actor)
+        actor.pool = self
+        self._hosted[address] = actor
+        self._host(actor)
+        early = self._early.pop(address, None)
+        if early:
+            self._early_count -= len(early)
+            actor.inbox.put_many(list(early))
+
+    def _host(self, actor):
+        ''' start local actor
+        '''
+        actor.start()
+
+    def _forget(self, address):
+        ''' forget terminated local actor
+        '''
+        self._hosted.pop(address, None)
+        self._gone.add(address)
+
+    def _execute(self, command):
+        ''' execute pool command, return False on stop command
+        '''
+        if command[0] == PC_SEND:
+            self._deliver(command[1], command[2])
+        elif command[0] == PC_SPAWN:
+            try:
+                self._spawn(*command[1:])
+            except Exception as err:
+                self.logger.error(err)
+        elif command[0] == PC_STOP:
+            return False
+        return True
+
+    def _drop_early(self):
+        ''' drop messages to actors which were not spawned till the worker stop
+        '''
+        if self._early_count:
+            self.logger.warning(u'{} - undelivered messages to unknown actors: {}'.format(
+                self.name, self._early_count))
+        self._early = collections.OrderedDict()
+        self._early_count = 0
+
+
+class ProcessPool(BasePool):
+    ''' Pool of worker processes, each of them hosts many generator or greenlet actors
+
+    Actors are created inside workers by spawn(), the worker is chosen by
+    `placement(address, workers)`. Every worker has its own command queue,
+    the queues are created before the workers are forked, so any worker
+    (and the parent) can send messages to any hosted actor. Messages sent
+    to `pool.address` are delivered to `pool.inbox` in the parent process.
+
+    Workers step only ready actors: an actor is ready after spawn, after a
+    put to its inbox and while its generator has work to do. A worker
+    blocks on its command queue only when none of its actors is ready,
+    then actors stopped while they were parked are forgotten.
+    Messages which come before the spawn command of their actor are kept
+    until the actor is spawned.
+    '''
+
+    families = (AF_GENERATOR, AF_GREENLET)
+    # max commands handled by worker between steps of hosted actors
+    commands_per_pass = 100
+    # how long idle worker blocks on its commands queue, None - until new command
+    idle_timeout = None
+
+    def __init__(self, workers=None, placement=None, name=None, logger=None):
+        ''' __init__
+        '''
+        super(ProcessPool, self).__init__(workers=workers, placement=placement, name=name, logger=logger)
+        self.inbox = ProcessInbox()
+
+        self._queues = [multiprocessing.Queue() for _ in range(self.size)]
+        self._processes = list()
+        # ready queue of hosted actors, defined in worker processes only
+        self._ready = collections.deque()
+        self._scheduled = set()
+        self._listeners = dict()
+
+    def start(self):
+        ''' start worker processes
+        '''
+        if self._processes:
+            raise RuntimeError('Pool is started already: {}'.format(self.name))
+        for index in range(self.size):
+            process = multiprocessing.Process(name='{}-{}'.format(self.name, index),
+                                              target=self._serve, args=(index,))
+            process.daemon = True
+            process.start()
+            self._processes.append(process)
+
+    def stop(self, timeout=None):
+        ''' stop hosted actors and worker processes
+        '''
+        for commands in self._queues:
+            commands.put((PC_STOP,))
+        for process in self._processes:
+            process.join(timeout)
+        self._processes = list()
+
+    def send(self, address, message):
+        ''' send message to hosted actor or to pool inbox
+        '''
+        if address == self.address:
+            self.inbox.put(message)
+            return
+        index = self.placement(address, self.size)
+        if index == self._index:
+            self._deliver(address, message)
+        else:
+            self._command(index, (PC_SEND, address, message))
+
+    def _command(self, index, command):
+        ''' put command to queue of worker
+        '''
+        self._queues[index].put(command)
+
+    def _host(self, actor):
+        ''' start local actor, it's stepped while ready
+        '''
+        subscribe = getattr(actor.inbox, 'subscribe', None)
+        if subscribe is not None:
+            listener = functools.partial(self._schedule, actor.address)
+            self._listeners[actor.address] = listener
+            subscribe(listener)
+        actor.start()
+        self._schedule(actor.address)
+
+    def _schedule(self, address):
+        ''' add local actor to ready queue '''
+        if address not in self._scheduled:
+            self._scheduled.add(address)
+            self._ready.append(address)
+
+    def _forget(self, address):
+        ''' forget terminated local actor
+        '''
+        actor = self._hosted.get(address)
+        listener = self._listeners.pop(address, None)
+        if actor is not None and listener is not None:
+            actor.inbox.unsubscribe(listener)
+        super(ProcessPool, self)._forget(address)
+
+    def _step(self):
+        ''' run ready actors for one iteraction, return True if none of them is ready
+        '''
+        for _ in range(len(self._ready)):
+            address = self._ready.popleft()
+            self._scheduled.discard(address)
+            actor = self._hosted.get(address)
+            if actor is None:
+                continue
+            alive = actor.processing
+            if alive:
+                actor.waiting = False
+                try:
+                    alive = actor.run_once()
+                except Exception as err:
+                    self.logger.error(err)
+                    alive = False
+            if not alive:
+                self._forget(address)
+            elif not actor.waiting or len(actor.inbox) > 0 or address not in self._listeners:
+                # parked until the next message, if inbox can notify about it
+                self._schedule(address)
+        if self._ready:
+            return False
+        # nobody is ready, actors stopped while parked are found here
+        for address, actor in list(self._hosted.items()):
+            if not actor.processing:
+                self._forget(address)
+        return True
+
+    def _serve(self, index):
+        ''' worker process loop
+        '''
+        self._index = index
+        commands = self._queues[index]
+        running = True
+        idle = True
+        while running:
+            try:
+                command = commands.get(True, self.idle_timeout) if idle else commands.get_nowait()
+            except queue.Empty:
+                command = None
+            handled = 0
+            while command is not None:
+                running = self._execute(command) and running
+                handled += 1
+                if handled >= self.commands_per_pass:
+                    break
+                try:
+                    command = commands.get_nowait()
+                except queue.Empty:
+                    command = None
+            idle = self._step()
+
+        for actor in self._hosted.values():
+            if actor.processing:
+                actor.stop()
+        self._drop_early()
+        self._hosted = dict()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+
+
+class ActorRegistry(object):
+    ''' Index of actors known to one actor system
+
+    Actors are indexed by address, by name and by every class of their MRO,
+    so lookups cost O(1) by address and O(matches) by name or class.
+    The registry is shared by all actors of one tree and kept up to date
+    by Actor.add_child() and Actor.remove_child().
+    '''
+
+    def __init__(self):
+        ''' __init__
+        '''
+        self._by_address = dict()
+        self._by_name = dict()
+        self._by_class = dict()
+        self._version = 0
+
+    @property
+    def version(self):
+        ''' topology version, changed on every register/unregister
+        '''
+        return self._version
+
+    def register(self, actor):
+        ''' add actor to indexes
+        '''
+        if actor.address in self._by_address:
+            raise RuntimeError('Actor is registered already: {}'.format(actor))
+        self._by_address[actor.address] = actor
+        self._by_name.setdefault(actor.name, dict())[actor.address] = actor
+        for cls in type(actor).__mro__:
+            self._by_class.setdefault(cls, dict())[actor.address] = actor
+        self._version += 1
+
+    def unregister(self, actor):
+        ''' remove actor from indexes
+        '''
+        if self._by_address.pop(actor.address, None) is None:
+            raise RuntimeError('Actor is not registered: {}'.format(actor))
+        self._discard(self._by_name, actor.name, actor.address)
+        for cls in type(actor).__mro__:
+            self._discard(self._by_class, cls, actor.address)
+        self._version += 1
+
+    @staticmethod
+    def _discard(index, key, address):
+        ''' remove address from index bucket, drop empty buckets
+        '''
+        bucket = index.get(key)
+        if bucket is not None:
+            bucket.pop(address, None)
+            if not bucket:
+                index.pop(key)
+
+    def __len__(self):
+        ''' return number of registered actors
+        '''
+        return len(self._by_address)
+
+    def __contains__(self, actor):
+        ''' return True if actor is registered
+        '''
+        return self._by_address.get(actor.address) is actor
+
+    def actors(self):
+        ''' return list of all registered actors
+        '''
+        return list(self._by_address.values())
+
+    def by_address(self, address):
+        ''' return actors by address (string) or addresses (list or tuple)
+        '''
+        if isinstance(address, str):
+            actor = self._by_address.get(address)
+            return [actor] if actor is not None else []
+        return [self._by_address[addr] for addr in address if addr in self._by_address]
+
+    def by_name(self, name):
+        ''' return actors with the given name
+        '''
+        return list(self._by_name.get(name, dict()).values())
+
+    def by_class(self, actor_class):
+        ''' return actors of the class (or classes, if list or tuple), subclasses included
+        '''
+        if isinstance(actor_class, (list, tuple)):
+            result = dict()
+            for cls in actor_class:
+                result.update(self._by_class.get(cls, dict()))
+            return list(result.values())
+        return list(self._by_class.get(actor_class, dict()).values())
@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+import os
+import time
+import heapq
+import uuid
+import threading
+import multiprocessing
+
+from concurrent.futures import Future
+
+from .exceptions import ReplyError
+
+__all__ = ['ReplyFuture', 'ReplyChannel', 'ReplyPipe', 'reply_channel']
+
+
+class ReplyFuture(Future):
+    ''' Future of the reply to Actor.ask()
+
+    The future is resolved from the thread that delivers the reply. Use
+    result(timeout) in threads, `await future` in coroutines and
+    add_done_callback() or done() in generator actors, which must not block.
+    '''
+
+    def __init__(self, cid):
+        ''' __init__
+        '''
+        super(ReplyFuture, self).__init__()
+        self.cid = cid
+
+    def __await__(self):
+        ''' wait for the reply in asyncio event loop
+        '''
+        import asyncio
+        return asyncio.wrap_future(self).__await__()
+
+
+class ReplyChannel(object):
+    ''' Pending replies of one process, indexed by correlation id
+
+    open() registers a future for a new correlation id, resolve() and fail()
+    complete it when the reply comes. Futures with timeout are failed with
+    ReplyError when the timeout is over, by one reaper thread per process.
+    '''
+
+    def __init__(self):
+        ''' __init__
+        '''
+        self._pending = dict()
+        self._deadlines = list()
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._reaper = None
+
+    def open(self, timeout=None):
+        ''' return future for new correlation id, its id is `future.cid`
+        '''
+        future = ReplyFuture(uuid.uuid4().hex)
+        with self._lock:
+            self._pending[future.cid] = future
+            if timeout is not None:
+                heapq.heappush(self._deadlines, (time.time() + timeout, future.cid))
+                self._start_reaper()
+                self._changed.notify()
+        return future
+
+    def pending(self, cid):
+        ''' return True if the reply with correlation id is expected in this process
+        '''
+        return cid in self._pending
+
+    def _pop(self, cid):
+        ''' remove and return future by correlation id, None if it's not pending
+        '''
+        with self._lock:
+            return self._pending.pop(cid, None)
+
+    def resolve(self, cid, result):
+        ''' complete future with result, return False if the reply is not expected
+        '''
+        future = self._pop(cid)
+        if future is None:
+            return False
+        future.set_result(result)
+        return True
+
+    def fail(self, cid, error):
+        ''' complete future with error, return False if the reply is not expected
+        '''
+        future = self._pop(cid)
+        if future is None:
+            return False
+        future.set_exception(error if isinstance(error, BaseException) else ReplyError(error))
+        return True
+
+    def __len__(self):
+        ''' return number of pending replies
+        '''
+        return len(self._pending)
+
+    def _start_reaper(self):
+        ''' start reaper thread if it's not running in this process, the lock must be held
+        '''
+        if self._reaper is None or not self._reaper.is_alive():
+            self._reaper = threading.Thread(name='ReplyChannel-reaper', target=self._reap)
+            self._reaper.daemon = True
+            self._reaper.start()
+
+    def _reap(self):
+        ''' fail futures whose timeout is over, outside of the lock
+        '''
+        while True:
+            with self._lock:
+                future = None
+                while future is None:
+                    while self._deadlines and self._deadlines[0][1] not in self._pending:
+                        heapq.heappop(self._deadlines)
+                    if not self._deadlines:
+                        self._changed.wait()
+                        continue
+                    deadline, cid = self._deadlines[0]
+                    remaining = deadline - time.time()
+                    if remaining > 0:
+                        self._changed.wait(remaining)
+                        continue
+                    heapq.heappop(self._deadlines)
+                    future = self._pending.pop(cid)
+            future.set_exception(ReplyError('No reply in time, correlation id: {}'.format(future.cid)))
+
+
+class ReplyPipe(object):
+    ''' Replies of forked actor to the process which started it
+
+    The pipe is created with the actor, before the fork. The forked process
+    sends replies by put(), listen() starts thread in the starting process
+    which passes them to `deliver` until close() is called by forked one.
+    '''
+
+    def __init__(self):
+        ''' __init__
+        '''
+        self._pid = os.getpid()
+        self._queue = multiprocessing.Queue()
+        self._listener = None
+
+    @property
+    def forked(self):
+        ''' return True in the forked process
+        '''
+        return os.getpid() != self._pid
+
+    def put(self, cid, ok, result):
+        ''' send reply to the starting process
+        '''
+        self._queue.put((cid, ok, result))
+
+    def listen(self, deliver):
+        ''' start thread passing replies to deliver(cid, ok, result)
+        '''
+        self._listener = threading.Thread(name='ReplyPipe-listener', target=self._listen, args=(deliver,))
+        self._listener.daemon = True
+        self._listener.start()
+
+    def _listen(self, deliver):
+        ''' deliver replies until the pipe is closed
+        '''
+        while True:
+            reply = self._queue.get()
+            if reply is None:
+                break
+            deliver(*reply)
+
+    def close(self):
+        ''' stop listener, called by the forked process when it's over
+        '''
+        self._queue.put(None)
+
+
+reply_channel = ReplyChannel()
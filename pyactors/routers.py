@@ -0,0 +1,306 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+import time
+import bisect
+import random
+import hashlib
+import itertools
+
+from .base import AF_PROCESS
+from .routing import route_table
+from .messages import Envelope
+from .generator import GeneratorActor
+from .exceptions import EmptyInboxException
+
+__all__ = ['Resizer', 'Router', 'RoundRobinRouter', 'RandomRouter', 'SmallestMailboxRouter', 'ConsistentHashRouter']
+
+
+class Router(GeneratorActor):
+    ''' Router, forwards every message to one of its children (routees)
+
+    A router subclass can be used as a step of BaseActor route: the stage
+    gets each message once, by the routee chosen by select(), instead of
+    broadcasting it to every actor of the step class. Routees continue the
+    route after the router step, so `steps = [Parse, WorkRouter, Store]`
+    spreads the work of `WorkRouter` children.
+
+    Messages are forwarded as soon as the router is started by a sender
+    and on every iteraction of its loop. Routees are started when they get
+    a message and are not running. With `resizer` (see Resizer) the number
+    of routees follows the load: an idle router isn't parked while the
+    resizer can shrink the pool, so its loop keeps sampling the pool until
+    it's down to the lower bound.
+    '''
+
+    def __init__(self, routees=None, name=None, logger=None, resizer=None):
+        ''' __init__
+        '''
+        super(Router, self).__init__(name=name, logger=logger)
+        for routee in routees if routees else ():
+            self.add_child(routee)
+        self.resizer = resizer
+        # messages forwarded to routees
+        self.forwarded = 0
+
+    def select(self, message, routees):
+        ''' return routee for the message, routees is not empty
+        '''
+        raise RuntimeError('Router.select() is not implemented')
+
+    def start(self):
+        ''' start router and forward queued messages, senders start it after every put
+        '''
+        if not self.processing:
+            super(Router, self).start()
+            self.processing_loop = self.loop()
+        self.route()
+
+    def route(self):
+        ''' forward messages of inbox to routees, return number of forwarded ones
+        '''
+        if self.resizer is not None:
+            self.resizer.resize(self)
+        routees = self.children
+        forwarded = 0
+        while True:
+            try:
+                message = self.inbox.get()
+            except EmptyInboxException:
+                break
+            if not routees:
+                self.logger.error(u'{} - no routees, message is dropped'.format(self))
+                continue
+            routee = self.select(message, routees)
+            routee.inbox.put(self._for(routee, message))
+            forwarded += 1
+            if not routee.processing:
+                routee.start()
+        self.forwarded += forwarded
+        return forwarded
+
+    @staticmethod
+    def _for(routee, message):
+        ''' return message for routee, forked routees get the steps instead of process-local route id
+        '''
+        if (isinstance(message, Envelope) and message.route is not None and message.steps is None
+                and getattr(routee, '_family', None) == AF_PROCESS):
+            return Envelope(message.payload, sender=message.sender, target=routee.address,
+                            route=message.route, hop=message.hop,
+                            steps=list(route_table.steps(message.route)[message.hop:]),
+                            cid=message.cid, created=message.created)
+        return message
+
+    def loop(self):
+        ''' forward messages until the router is stopped
+        '''
+        while self.processing:
+            if not self.route() and (self.resizer is None or not self.resizer.can_shrink(self)):
+                self.waiting = True
+            yield
+
+
+class Resizer(object):
+    ''' Resizer, keeps the number of router routees between `lower` and `upper`
+
+    Every `interval` seconds the resizer samples the pressure on routees:
+    queued messages per routee and the time to drain them at the rate
+    routees processed messages since the previous sample. The pool grows
+    by `step` when there are more than `grow_depth` messages per routee or
+    the drain time is over `max_latency`, and shrinks by `step` when there
+    are at most `shrink_depth` messages per routee and the drain time is
+    below half of `max_latency`.
+
+    Hysteresis: the same decision must come from `checks` samples in a row
+    and resizes are `cooldown` seconds apart, except moves into the bounds.
+    Only routees with empty inboxes are retired, they are removed from the
+    router and stopped.
+    '''
+
+    def __init__(self, factory, lower=1, upper=10, grow_depth=10, shrink_depth=1, max_latency=None,
+                 interval=1.0, cooldown=5.0, checks=3, step=1):
+        ''' __init__, factory() returns new routee
+        '''
+        if not 0 < lower <= upper:
+            raise RuntimeError('Incorrect resizer bounds: {}, {}'.format(lower, upper))
+        self.factory = factory
+        self.lower = lower
+        self.upper = upper
+        self.grow_depth = grow_depth
+        self.shrink_depth = shrink_depth
+        self.max_latency = max_latency
+        self.interval = interval
+        self.cooldown = cooldown
+        self.checks = checks
+        self.step = step
+
+        self._sampled = None
+        self._sample = None
+        self._resized = None
+        self._trend = 0
+        self._streak = 0
+
+    def pressure(self, router, now):
+        ''' return queued messages per routee and estimated drain time, seconds
+        '''
+        routees = router.children
+        depth = sum(len(routee.inbox) for routee in routees)
+        per_routee = float(depth) / len(routees) if routees else float(depth)
+        latency = 0.0
+        if self._sample is not None:
+            sampled, forwarded, previous_depth = self._sample
+            processed = (router.forwarded - forwarded) - (depth - previous_depth)
+            if depth and processed > 0 and now > sampled:
+                latency = depth / (processed / (now - sampled))
+            elif depth:
+                latency = float('inf')
+        self._sample = (now, router.forwarded, depth)
+        return per_routee, latency
+
+    def decide(self, size, per_routee, latency):
+        ''' return +1 to grow the pool, -1 to shrink it or 0
+        '''
+        if per_routee > self.grow_depth or (self.max_latency is not None and latency > self.max_latency):
+            return 1 if size < self.upper else 0
+        if per_routee <= self.shrink_depth and (self.max_latency is None or latency < self.max_latency / 2.0):
+            return -1 if size > self.lower else 0
+        return 0
+
+    def can_shrink(self, router):
+        ''' return True if router pool is larger than the lower bound
+        '''
+        return len(router.children) > self.lower
+
+    def resize(self, router, now=None):
+        ''' resize router pool if it's time, return the change of its size
+        '''
+        now = time.time() if now is None else now
+        size = len(router.children)
+        if size < self.lower:
+            return self._apply(router, self.lower - size, now)
+        if size > self.upper:
+            return self._apply(router, self.upper - size, now)
+        if self._sampled is not None and now - self._sampled < self.interval:
+            return 0
+        self._sampled = now
+
+        trend = self.decide(size, *self.pressure(router, now))
+        if trend != self._trend:
+            self._trend, self._streak = trend, 0
+        self._streak += 1
+        if not trend or self._streak < self.checks:
+            return 0
+        if self._resized is not None and now - self._resized < self.cooldown:
+            return 0
+        if trend > 0:
+            return self._apply(router, min(self.step, self.upper - size), now)
+        return self._apply(router, -min(self.step, size - self.lower), now)
+
+    def _apply(self, router, change, now):
+        ''' add or retire routees, return the change of pool size
+        '''
+        if change > 0:
+            for _ in range(change):
+                routee = self.factory()
+                router.add_child(routee)
+                if router.processing:
+                    routee.start()
+        else:
+            idle = [routee for routee in router.children if len(routee.inbox) == 0][:-change]
+            for routee in idle:
+                router.remove_child(routee.address)
+                if routee.processing:
+                    routee.stop()
+            change = -len(idle)
+        if change:
+            router.logger.debug(u'{} - pool is resized by {}'.format(router, change))
+            self._resized = now
+            self._streak = 0
+        return change
+
+
+class RoundRobinRouter(Router):
+    ''' Router, forwards messages to routees in turn
+    '''
+
+    def __init__(self, routees=None, name=None, logger=None, resizer=None):
+        ''' __init__
+        '''
+        super(RoundRobinRouter, self).__init__(routees=routees, name=name, logger=logger, resizer=resizer)
+        self._rotation = itertools.count()
+
+    def select(self, message, routees):
+        ''' return the next routee
+        '''
+        return routees[next(self._rotation) % len(routees)]
+
+
+class RandomRouter(Router):
+    ''' Router, forwards messages to random routees
+    '''
+
+    def select(self, message, routees):
+        ''' return random routee
+        '''
+        return random.choice(routees)
+
+
+class SmallestMailboxRouter(Router):
+    ''' Router, forwards messages to the routee with the shortest inbox
+    '''
+
+    def select(self, message, routees):
+        ''' return routee with the smallest inbox, the first one of equals
+        '''
+        return min(routees, key=lambda routee: len(routee.inbox))
+
+
+class ConsistentHashRouter(Router):
+    ''' Router, forwards messages with the same key to the same routee
+
+    Routees are placed on a hash ring by `replicas` points each, so adding
+    or removing a routee moves only the keys of its share of the ring. The
+    key is `hash_key` field of message payload, override key() for others.
+    '''
+
+    # payload field used as key
+    hash_key = 'key'
+    # points of every routee on the ring
+    replicas = 100
+
+    def __init__(self, routees=None, name=None, logger=None, resizer=None, hash_key=None):
+        ''' __init__
+        '''
+        super(ConsistentHashRouter, self).__init__(routees=routees, name=name, logger=logger, resizer=resizer)
+        if hash_key is not None:
+            self.hash_key = hash_key
+        self._ring = None
+        self._ring_routees = None
+
+    @staticmethod
+    def _hash(value):
+        ''' return hash of value stable across processes
+        '''
+        return int(hashlib.md5(str(value).encode('utf-8')).hexdigest()[:16], 16)
+
+    def key(self, message):
+        ''' return hash key of message
+        '''
+        payload = message.payload if isinstance(message, Envelope) else message
+        try:
+            return payload[self.hash_key]
+        except (KeyError, TypeError, IndexError):
+            return payload
+
+    def select(self, message, routees):
+        ''' return routee owning the key of message on the ring
+        '''
+        addresses = tuple(routee.address for routee in routees)
+        if self._ring_routees != addresses:
+            by_address = dict((routee.address, routee) for routee in routees)
+            ring = sorted((self._hash('{}-{}'.format(address, replica)), address)
+                          for address in addresses for replica in range(self.replicas))
+            self._ring = ([point for point, _ in ring], [by_address[address] for _, address in ring])
+            self._ring_routees = addresses
+        points, owners = self._ring
+        index = bisect.bisect(points, self._hash(self.key(message))) % len(points)
+        return owners[index]
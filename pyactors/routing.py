@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+import threading
+
+
+class RouteTable(object):
+    ''' Table of compiled pipeline routes
+
+    Every distinct `steps` sequence is compiled once to a small integer id,
+    so messages carry the route id and the position (hop) in the route
+    instead of a copy of the remaining steps. Route ids are local to the
+    process, messages leaving the process must carry the steps themselves.
+    '''
+
+    def __init__(self):
+        ''' __init__
+        '''
+        self._ids = dict()
+        self._routes = list()
+        self._lock = threading.Lock()
+
+    def compile(self, steps):
+        ''' return route id for the steps, compile the route if it's new
+        '''
+        key = tuple(steps)
+        route_id = self._ids.get(key)
+        if route_id is None:
+            with self._lock:
+                route_id = self._ids.get(key)
+                if route_id is None:
+                    route_id = len(self._routes)
+                    self._routes.append(key)
+                    self._ids[key] = route_id
+        return route_id
+
+    def steps(self, route_id):
+        ''' return tuple of route steps
+        '''
+        try:
+            return self._routes[route_id]
+        except (IndexError, TypeError):
+            raise KeyError('Unknown route: {}'.format(route_id))
+
+    def __len__(self):
+        ''' return number of compiled routes
+        '''
+        return len(self._routes)
+
+
+route_table = RouteTable()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+import json
+import pickle
+import importlib
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+from .messages import Envelope
+from .routing import route_table
+
+__all__ = ['Codec', 'register_codec', 'get_codec', 'codecs', 'DEFAULT_CODEC']
+
+
+class Codec(object):
+    ''' Named pair of functions converting messages to bytes and back
+    '''
+
+    def __init__(self, name, dumps, loads):
+        ''' __init__
+        '''
+        self.name = name
+        self.dumps = dumps
+        self.loads = loads
+
+    def __repr__(self):
+        ''' represent codec as string
+        '''
+        return u'Codec({})'.format(self.name)
+
+
+_codecs = dict()
+
+
+def register_codec(name, dumps, loads):
+    ''' register codec, dumps(message) must return bytes, loads(bytes) - the message
+    '''
+    codec = Codec(name, dumps, loads)
+    _codecs[name] = codec
+    return codec
+
+
+def get_codec(codec=None):
+    ''' return codec by name, codec itself or DEFAULT_CODEC if codec is None
+    '''
+    if codec is None:
+        codec = DEFAULT_CODEC
+    if isinstance(codec, Codec):
+        return codec
+    try:
+        return _codecs[codec]
+    except KeyError:
+        raise KeyError('Unknown codec: {}, available: {}'.format(codec, ', '.join(codecs())))
+
+
+def codecs():
+    ''' return names of registered codecs
+    '''
+    return sorted(_codecs)
+
+
+def _default(obj):
+    ''' encode mappings other than dict (e.g. MessageView) as dicts, envelopes
+    and actor classes of their steps as tagged dicts
+
+    Route ids are local to the process, an envelope carries the remaining
+    steps of its route instead. Classes are encoded by import path.
+    '''
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    if isinstance(obj, Envelope):
+        steps = obj.steps
+        if steps is None and obj.route is not None:
+            steps = list(route_table.steps(obj.route)[obj.hop:])
+        return {'__envelope__': [obj.payload, obj.sender, obj.target, steps, obj.cid, obj.created, obj.sent]}
+    if isinstance(obj, type):
+        return {'__actor_class__': '{}:{}'.format(obj.__module__, obj.__qualname__)}
+    raise TypeError('Object of type {} is not serializable'.format(type(obj).__name__))
+
+
+def _object_hook(obj):
+    ''' decode tagged dicts made by _default() back to envelopes and classes
+    '''
+    if '__envelope__' in obj:
+        payload, sender, target, steps, cid, created, sent = obj['__envelope__']
+        return Envelope(payload, sender=sender, target=target, steps=steps, cid=cid, created=created, sent=sent)
+    if '__actor_class__' in obj:
+        module, _, name = obj['__actor_class__'].partition(':')
+        obj = importlib.import_module(module)
+        for attr in name.split('.'):
+            obj = getattr(obj, attr)
+    return obj
+
+
+register_codec('json', lambda message: json.dumps(message, default=_default).encode('utf-8'),
+               lambda data: json.loads(data, object_hook=_object_hook))
+register_codec('pickle', lambda message: pickle.dumps(message, pickle.DEFAULT_PROTOCOL), pickle.loads)
+register_codec('pickle5', lambda message: pickle.dumps(message, 5), pickle.loads)
+
+# codec of external inboxes (redis, rabbitmq, mmap), the same on every machine
+DEFAULT_CODEC = 'json'
+
+
+def _plain(obj):
+    ''' convert message to dicts, lists and scalars for encoders without default hook
+    '''
+    if isinstance(obj, (list, tuple)):
+        return [_plain(item) for item in obj]
+    if isinstance(obj, Mapping):
+        return dict((key, _plain(value)) for key, value in obj.items())
+    if obj is None or isinstance(obj, (str, bytes, int, float)):
+        return obj
+    return _plain(_default(obj))
+
+
+def _restore(obj):
+    ''' decode tagged dicts of message made by _plain()
+    '''
+    if isinstance(obj, list):
+        return [_restore(item) for item in obj]
+    if isinstance(obj, dict):
+        return _object_hook(dict((key, _restore(value)) for key, value in obj.items()))
+    return obj
+
+
+try:
+    import ujson
+except ImportError:
+    pass
+else:
+    # faster json, not the default: codec=ujson must be chosen by both sides
+    register_codec('ujson', lambda message: ujson.dumps(_plain(message)).encode('utf-8'),
+                   lambda data: _restore(ujson.loads(data)))
+
+try:
+    import msgpack
+except ImportError:
+    pass
+else:
+    register_codec('msgpack', lambda message: msgpack.packb(message, use_bin_type=True, default=_default),
+                   lambda data: msgpack.unpackb(data, raw=False, object_hook=_object_hook))
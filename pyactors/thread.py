@@ -1,16 +1,140 @@
 #!/usr/bin/env python
 # -*- coding: utf8 -*-
+import os
+import queue
+import logging
 import threading
 
 from .base import BaseActor, AF_THREAD
+from .inbox import QueueInbox
 from .generator import GeneratorActor
 
 
+class Dispatcher(object):
+    ''' Fixed-size pool of threads shared by ThreadedGeneratorActors
+
+    An actor is scheduled when it's started, when its inbox gets a message
+    or while its generators have work to do. A worker runs up to
+    `actor.throughput` iterations of run_once() per turn, then the actor
+    goes back to the end of the ready queue or, if it's waiting for
+    messages, it's parked until the next put to its inbox.
+    '''
+
+    def __init__(self, workers=None, name=None, logger=None):
+        ''' __init__
+        '''
+        self.name = name if name else self.__class__.__name__
+        self.logger = logger if logger else logging.getLogger(self.name)
+        self.size = workers if workers else (os.cpu_count() or 1)
+
+        self._ready = queue.Queue()
+        self._scheduled = set()
+        self._running = set()
+        self._lock = threading.Lock()
+        self._workers = list()
+
+    def start(self):
+        ''' start worker threads
+        '''
+        with self._lock:
+            if self._workers:
+                return
+            for i in range(self.size):
+                worker = threading.Thread(name='{}-{}'.format(self.name, i), target=self._work)
+                worker.daemon = True
+                worker.start()
+                self._workers.append(worker)
+
+    def shutdown(self, timeout=None):
+        ''' stop worker threads, actors are not stopped
+        '''
+        with self._lock:
+            workers, self._workers = self._workers, list()
+        for _ in workers:
+            self._ready.put(None)
+        for worker in workers:
+            worker.join(timeout)
+
+    def attach(self, actor):
+        ''' start dispatching actor
+        '''
+        self.start()
+        actor.inbox.subscribe(actor._dispatch)
+        self.schedule(actor)
+
+    def detach(self, actor):
+        ''' stop dispatching actor, signal its termination
+        '''
+        actor.inbox.unsubscribe(actor._dispatch)
+        actor._terminated.set()
+
+    def release(self, actor):
+        ''' detach stopped actor now, if it is not running in a worker
+        '''
+        with self._lock:
+            if actor.address in self._running:
+                return
+        self.detach(actor)
+
+    def schedule(self, actor):
+        ''' put actor to ready queue, if it's not there or running already
+        '''
+        with self._lock:
+            if actor.address in self._scheduled:
+                return
+            self._scheduled.add(actor.address)
+        self._ready.put(actor)
+
+    def _work(self):
+        ''' worker thread loop
+        '''
+        while True:
+            actor = self._ready.get()
+            if actor is None:
+                break
+            self._turn(actor)
+
+    def _turn(self, actor):
+        ''' run actor for up to `actor.throughput` iterations
+        '''
+        with self._lock:
+            self._running.add(actor.address)
+        running = actor.processing
+        for _ in range(max(actor.throughput, 1)):
+            if not running:
+                break
+            actor.waiting = False
+            try:
+                running = actor.run_once() and actor.processing
+            except Exception as err:
+                self.logger.error(err)
+                actor.stop()
+                running = False
+            if actor.waiting and len(actor.inbox) == 0:
+                break
+
+        with self._lock:
+            self._scheduled.discard(actor.address)
+            self._running.discard(actor.address)
+
+        if not running:
+            self.detach(actor)
+        elif not actor.waiting or len(actor.inbox) > 0:
+            self.schedule(actor)
+
+
 class ThreadedGeneratorActor(GeneratorActor):
     ''' Threaded GeneratorActor
+
+    The actor runs in its own thread, or in the threads of `dispatcher`
+    if it's defined (see Dispatcher)
     '''
 
-    def __init__(self, name=None, logger=None):
+    dispatcher = None
+    # run_once() iterations per dispatcher turn
+    throughput = 5
+
+    def __init__(self, name=None, logger=None, dispatcher=None, throughput=None):
         ''' __init__
         '''
         super(ThreadedGeneratorActor, self).__init__(name=name, logger=logger)
@@ -18,11 +142,22 @@ class ThreadedGeneratorActor(GeneratorActor):
         # Actor Family
         self._family = AF_THREAD
 
+        # Inbox shared by the actor's thread and senders from other threads
+        self.inbox = QueueInbox()
+
         self._processing = threading.Event()
         self._waiting = threading.Event()
 
-        self._thread = threading.Thread(name=self._name, target=self.run)
-        self._thread.daemon = True
+        if dispatcher is not None:
+            self.dispatcher = dispatcher
+        if throughput is not None:
+            self.throughput = throughput
+
+        if self.dispatcher is None:
+            self._thread = threading.Thread(name=self._name, target=self.run)
+            self._thread.daemon = True
+        else:
+            self._thread = None
 
     @property
     def processing(self):
@@ -62,12 +197,36 @@ class ThreadedGeneratorActor(GeneratorActor):
         else:
             self._waiting.clear()
 
+    def _dispatch(self):
+        ''' inbox listener, schedule actor in dispatcher
+        '''
+        self.dispatcher.schedule(self)
+
     def start(self):
         ''' start actor
         '''
         super(ThreadedGeneratorActor, self).start()
 
-        self._thread.start()
+        if self.dispatcher is not None:
+            self.dispatcher.attach(self)
+        else:
+            self._thread.start()
+
+    def run(self):
+        ''' run actor in its thread, signal termination when it's over
+        '''
+        try:
+            super(ThreadedGeneratorActor, self).run()
+        finally:
+            self._terminated.set()
+
+    def stop(self, timeout=None):
+        ''' stop actor
+        '''
+        report = super(ThreadedGeneratorActor, self).stop(timeout=timeout)
+        if self.dispatcher is not None:
+            self.dispatcher.release(self)
+        return report
 
 
 class BaseThreadedGeneratorActor(ThreadedGeneratorActor, BaseActor):
@@ -4,10 +4,10 @@ if '' not in sys.path:
 
 import logging
 
-from pyactors.greenlet import GreenletActor
+from pyactors.green import GreenletActor
 from pyactors.generator import GeneratorActor
-from pyactors.forked import ForkedGeneratorActor
-from pyactors.forked import ForkedGreenletActor
+from pyactors.generator import ForkedGeneratorActor
+from pyactors.green import ForkedGreenletActor
 from pyactors.exceptions import EmptyInboxException
     
 ''' 
@@ -144,7 +144,7 @@ class ForkedGenActor(ForkedGeneratorActor):
         ''' loop
         '''
         result = 0
-        for i in xrange(10):
+        for i in range(10):
             if self.processing:
                 result += i
                 if self.parent is not None:
@@ -183,7 +183,7 @@ class ForkedGreActor(ForkedGreenletActor):
         self.result = 0
     
     def loop(self):
-        for i in xrange(10):
+        for i in range(10):
             if self.processing:
                 self.result += i
                 if self.parent is not None:
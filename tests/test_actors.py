@@ -226,5 +226,45 @@ class ActorTest(unittest.TestCase):
         self.assertEqual(len(grandparent.children[0].children[0].find(actor_name='child')), 2)
 
 
+    def test_registry_shared_by_tree(self):
+        ''' test_actors.test_registry_shared_by_tree
+        '''
+        test_name = 'test_actors.test_registry_shared_by_tree'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        system = pyactors.ActorSystem()
+        parent = pyactors.Actor(name='parent')
+        child = pyactors.Actor(name='child')
+        parent.add_child(child)
+        system.add_child(parent)
+        self.assertIs(child.registry, system.registry)
+        self.assertEqual(len(system.registry), 3)
+
+        system.remove_child(parent.address)
+        self.assertIsNone(parent.parent)
+        self.assertIs(child.registry, parent.registry)
+        self.assertEqual(len(system.registry), 1)
+        self.assertEqual(len(parent.registry), 2)
+
+    def test_find_by_base_class(self):
+        ''' test_actors.test_find_by_base_class
+        '''
+        class BaseTestActor(pyactors.Actor):
+            pass
+
+        class TestActor(BaseTestActor):
+            pass
+
+        test_name = 'test_actors.test_find_by_base_class'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        parent = pyactors.Actor()
+        parent.add_child(BaseTestActor())
+        parent.add_child(TestActor())
+        self.assertEqual(len(parent.find(actor_class=BaseTestActor)), 2)
+        self.assertEqual(len(parent.find(actor_class=TestActor)), 1)
+        self.assertEqual(len(parent.find(actor_class=(TestActor, BaseTestActor))), 2)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,218 @@
+import sys
+if '' not in sys.path:
+    sys.path.append('')
+
+import time
+import asyncio
+import threading
+import unittest
+
+from pyactors.logs import file_logger
+from pyactors.aio import AsyncioActor, BaseAsyncioActor
+from pyactors.inbox import OF_DROP_HEAD, OF_BLOCK, OF_RAISE
+from pyactors.inbox.aio import AsyncioInbox
+from pyactors.exceptions import EmptyInboxException, FullInboxException
+
+
+class Collector(AsyncioActor):
+    ''' Collector, keeps messages until it's stopped
+    '''
+    def __init__(self, name=None):
+        super(Collector, self).__init__(name=name)
+        self.messages = list()
+
+    async def loop(self):
+        while self.processing:
+            message = await self.receive()
+            if message is None:
+                break
+            self.messages.append(message)
+
+
+class Echo(AsyncioActor):
+    ''' Echo, sends the first message to its parent and stops
+    '''
+    async def loop(self):
+        message = await self.receive()
+        if message is not None:
+            self.parent.inbox.put(message)
+
+
+class Doubler(BaseAsyncioActor):
+    ''' Doubler, replies to asked values
+    '''
+    @property
+    def is_waiting_message(self):
+        return False
+
+    def validate(self):
+        return self.envelope is not None
+
+    async def process(self):
+        await asyncio.sleep(0)
+        self.reply(self.message['value'] * 2)
+        self.envelope = None
+
+
+def run(coroutine):
+    ''' run coroutine in new event loop
+    '''
+    return asyncio.run(asyncio.wait_for(coroutine, 10))
+
+
+class AsyncioInboxTest(unittest.TestCase):
+
+    def test_get(self):
+        ''' test_asyncio_actors.test_get
+        '''
+        test_name = 'test_asyncio_actors.test_get'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        async def main():
+            inbox = AsyncioInbox()
+            inbox.bind(asyncio.get_running_loop())
+            self.assertRaises(EmptyInboxException, inbox.get)
+            with self.assertRaises(EmptyInboxException):
+                await inbox.aget(0.01)
+            inbox.put_many(range(5))
+            self.assertEqual((inbox.get(), len(inbox)), (0, 4))
+            self.assertEqual(await inbox.aget_many(10), [1, 2, 3, 4])
+
+            # puts from other thread go through event loop
+            thread = threading.Thread(target=inbox.put, args=('message',))
+            thread.start()
+            self.assertEqual(await inbox.aget(5), 'message')
+            thread.join()
+
+            inbox.wakeup()
+            with self.assertRaises(EmptyInboxException):
+                await inbox.aget()
+        run(main())
+
+    def test_overflow(self):
+        ''' test_asyncio_actors.test_overflow
+        '''
+        test_name = 'test_asyncio_actors.test_overflow'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        async def main():
+            inbox = AsyncioInbox(maxsize=3, overflow=OF_DROP_HEAD)
+            inbox.put_many(range(5))
+            self.assertEqual(inbox.get_many(5), [2, 3, 4])
+            self.assertEqual(inbox.metrics(), dict(depth=0, dropped=2, blocked=0))
+
+            inbox = AsyncioInbox(maxsize=1, overflow=OF_BLOCK)
+            inbox.put(1)
+            self.assertRaises(FullInboxException, inbox.put, 2)
+            put = asyncio.ensure_future(inbox.aput(2))
+            await asyncio.sleep(0)
+            self.assertFalse(put.done())
+            self.assertEqual(await inbox.aget(), 1)
+            await put
+            self.assertEqual((inbox.get(), inbox.blocked), (2, 1))
+        run(main())
+
+
+    def test_overflow_from_other_thread(self):
+        ''' test_asyncio_actors.test_overflow_from_other_thread
+        '''
+        test_name = 'test_asyncio_actors.test_overflow_from_other_thread'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=loop.run_forever)
+        thread.start()
+        try:
+            inbox = AsyncioInbox(maxsize=1, overflow=OF_RAISE)
+            inbox.bind(loop)
+            inbox.put(1)
+            self.assertRaises(FullInboxException, inbox.put, 2)
+            self.assertEqual(len(inbox), 1)
+
+            inbox = AsyncioInbox(maxsize=1, overflow=OF_BLOCK)
+            inbox.bind(loop)
+            inbox.put(1)
+            self.assertRaises(FullInboxException, inbox.put, 2, timeout=0.01)
+            # the caller's thread waits until the actor takes a message
+            writer = threading.Thread(target=inbox.put, args=(2,), kwargs=dict(timeout=5))
+            writer.start()
+            while inbox.blocked < 2:
+                time.sleep(0.001)
+            self.assertEqual(asyncio.run_coroutine_threadsafe(inbox.aget(5), loop).result(5), 1)
+            writer.join()
+            self.assertEqual(asyncio.run_coroutine_threadsafe(inbox.aget(5), loop).result(5), 2)
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+
+class AsyncioActorTest(unittest.TestCase):
+
+    def test_many_actors(self):
+        ''' test_asyncio_actors.test_many_actors
+        '''
+        test_name = 'test_asyncio_actors.test_many_actors'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        async def main():
+            parent = AsyncioActor(name='Parent')
+            children = [Echo() for _ in range(2000)]
+            for child in children:
+                parent.add_child(child)
+            parent.start()
+            for index, child in enumerate(children):
+                child.inbox.put(index)
+            self.assertTrue(await parent.ajoin(10))
+            self.assertFalse(any(child.processing for child in children))
+            self.assertEqual(sorted(parent.inbox.get_many(len(children))), list(range(len(children))))
+        run(main())
+
+    def test_stop(self):
+        ''' test_asyncio_actors.test_stop
+        '''
+        test_name = 'test_asyncio_actors.test_stop'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        async def main():
+            collector = Collector()
+            collector.start()
+            collector.inbox.put('message')
+            await asyncio.sleep(0.01)
+            self.assertTrue(collector.waiting)
+            collector.request_stop()
+            self.assertTrue(await collector.ajoin(5))
+            self.assertEqual(collector.messages, ['message'])
+
+            collector = Collector()
+            collector.start()
+            threading.Thread(target=collector.stop).start()
+            self.assertTrue(await collector.ajoin(5))
+        run(main())
+
+    def test_ask(self):
+        ''' test_asyncio_actors.test_ask
+        '''
+        test_name = 'test_asyncio_actors.test_ask'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        async def main():
+            doubler = Doubler()
+            doubler.start()
+            results = await asyncio.gather(*[doubler.ask(dict(value=value), timeout=5) for value in range(3)])
+            self.assertEqual(results, [0, 2, 4])
+            doubler.stop()
+            self.assertTrue(await doubler.ajoin(5))
+        run(main())
+
+    def test_start_outside_loop(self):
+        ''' test_asyncio_actors.test_start_outside_loop
+        '''
+        test_name = 'test_asyncio_actors.test_start_outside_loop'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        collector = Collector()
+        self.assertRaises(RuntimeError, collector.start)
+
+
+if __name__ == '__main__':
+    unittest.main()
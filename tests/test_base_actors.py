@@ -0,0 +1,210 @@
+import sys
+if '' not in sys.path:
+    sys.path.append('')
+
+import pickle
+import unittest
+
+from pyactors.base import ActorSystem
+from pyactors.logs import file_logger
+from pyactors.routing import route_table
+from pyactors.messages import Envelope, MessageView, MAX_VIEW_DEPTH
+from pyactors.inbox import DequeInbox, OF_DROP_HEAD
+from pyactors.generator import BaseGeneratorActor
+
+
+class Collector(BaseGeneratorActor):
+    ''' Collector, the last step of pipeline
+    '''
+    def __init__(self, **kwargs):
+        super(Collector, self).__init__(**kwargs)
+        self.results = list()
+        self.envelopes = list()
+
+    def process(self):
+        self.results.append(self.message)
+        self.envelopes.append(self.envelope)
+
+
+class Increment(BaseGeneratorActor):
+    ''' Increment, the middle step of pipeline
+    '''
+    def process(self):
+        self.send(value=self.message['value'] + 1)
+
+
+class Head(BaseGeneratorActor):
+    ''' Head, the first step of pipeline
+    '''
+    steps = [Increment, Collector]
+
+    def process(self):
+        self.send(value=self.message['value'])
+
+
+class BaseActorTest(unittest.TestCase):
+
+    def test_pipeline_routing(self):
+        ''' test_base_actors.test_pipeline_routing
+        '''
+        test_name = 'test_base_actors.test_pipeline_routing'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        system = ActorSystem()
+        head, increment, collector = Head(), Increment(), Collector()
+        for actor in (head, increment, collector):
+            system.add_child(actor)
+
+        for value in range(3):
+            head.inbox.put(dict(value=value))
+        head.start()
+
+        self.assertEqual([message['value'] for message in collector.results], [1, 2, 3])
+        route_id = collector.envelopes[0].route
+        self.assertEqual(route_table.steps(route_id), (Increment, Collector))
+        self.assertTrue(all(envelope.steps is None for envelope in collector.envelopes))
+        self.assertTrue(all(envelope.sender == increment.address for envelope in collector.envelopes))
+        self.assertTrue(all(set(message) == set(['value']) for message in collector.results))
+
+    def test_envelope(self):
+        ''' test_base_actors.test_envelope
+        '''
+        test_name = 'test_base_actors.test_envelope'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        envelope = Envelope(dict(value=1), sender='a', target='b', steps=[Collector], cid='c')
+        copy = pickle.loads(pickle.dumps(envelope))
+        self.assertEqual([getattr(copy, name) for name in Envelope.__slots__],
+                         [getattr(envelope, name) for name in Envelope.__slots__])
+        self.assertRaises(AttributeError, setattr, envelope, 'other', 1)
+
+        # process-local route id leaves the process as the remaining steps
+        route_id = route_table.compile([Increment, Collector])
+        envelope = Envelope(dict(value=1), sender='a', target='b', route=route_id, hop=1, cid='c')
+        copy = pickle.loads(pickle.dumps(envelope))
+        self.assertEqual((copy.route, copy.hop, copy.steps), (None, 0, [Collector]))
+        self.assertEqual((copy.payload, copy.sender, copy.target, copy.cid, copy.created, copy.sent),
+                         (envelope.payload, 'a', 'b', 'c', envelope.created, envelope.sent))
+
+        # unchanged payload is passed to the next hop without copying,
+        # every target gets its own copy-on-write view of it
+        class Forward(BaseGeneratorActor):
+            steps = [Collector]
+
+            def process(self):
+                self.send()
+                self.message['value'] = 'changed after send'
+
+        class Changer(Collector):
+            def process(self):
+                self.message['value'] += 1
+                del self.message['wide']
+                super(Changer, self).process()
+
+        system = ActorSystem()
+        forward, collector, changer = Forward(), Collector(), Changer()
+        for actor in (forward, collector, changer):
+            system.add_child(actor)
+        payload = dict(value=1, wide=list(range(100)))
+        forward.inbox.put(Envelope(payload, cid='request-1'))
+        forward.start()
+        self.assertEqual(collector.results[0], payload)
+        self.assertIs(collector.results[0]['wide'], payload['wide'])
+        self.assertEqual(changer.results[0], dict(value=2))
+        self.assertEqual(payload, dict(value=1, wide=list(range(100))))
+        self.assertEqual([envelope.cid for envelope in collector.envelopes + changer.envelopes],
+                         ['request-1', 'request-1'])
+
+    def test_route_cache_invalidation(self):
+        ''' test_base_actors.test_route_cache_invalidation
+        '''
+        test_name = 'test_base_actors.test_route_cache_invalidation'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        system = ActorSystem()
+        head, collector = Head(), Collector()
+        system.add_child(head)
+        system.add_child(collector)
+        route_id = route_table.compile([Collector])
+
+        self.assertEqual(head._resolve_route(route_id, 0)[0], [collector])
+        other = Collector()
+        system.add_child(other)
+        self.assertEqual(len(head._resolve_route(route_id, 0)[0]), 2)
+        system.remove_child(collector.address)
+        self.assertEqual(head._resolve_route(route_id, 0)[0], [other])
+
+    def test_message_view(self):
+        ''' test_base_actors.test_message_view
+        '''
+        test_name = 'test_base_actors.test_message_view'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        base = dict(ssid='s1', value=1, wide=list(range(100)))
+        view = MessageView(dict(value=2), base).merge(dict(step='two'))
+        self.assertEqual(view, dict(ssid='s1', value=2, wide=list(range(100)), step='two'))
+        self.assertEqual((view['value'], view.get('missing'), 'step' in view, 'other' in view),
+                         (2, None, True, False))
+        self.assertIs(view['wide'], base['wide'])
+        # changes copy the top layer and leave the shared layers as they are
+        other = view.share()
+        view['value'] = 3
+        del view['ssid']
+        self.assertEqual((view['value'], 'ssid' in view, len(view)), (3, False, 3))
+        self.assertEqual((other['value'], other['ssid']), (2, 's1'))
+        self.assertEqual(base['value'], 1)
+        view['ssid'] = 's2'
+        self.assertEqual(view.merge(dict(step='three')).copy(), dict(ssid='s2', value=3, wide=base['wide'],
+                                                                       step='three'))
+        empty = MessageView(None, dict(value=1))
+        del empty['value']
+        self.assertFalse(empty)
+        self.assertTrue(other)
+
+        # the view leaves the process as plain dict
+        copy = pickle.loads(pickle.dumps(Envelope(view)))
+        self.assertIs(type(copy.payload), dict)
+        self.assertEqual(copy.payload, view)
+
+        for value in range(MAX_VIEW_DEPTH * 2):
+            view = view.merge(dict(value=value))
+        self.assertLessEqual(view._depth, MAX_VIEW_DEPTH)
+        self.assertEqual(view['value'], MAX_VIEW_DEPTH * 2 - 1)
+
+        system = ActorSystem()
+        head, increment, collector = Head(), Increment(), Collector()
+        for actor in (head, increment, collector):
+            system.add_child(actor)
+        head.inbox.put(base)
+        head.start()
+        self.assertIsInstance(collector.results[0], MessageView)
+        self.assertEqual(collector.results[0]['value'], 2)
+        self.assertIs(collector.results[0]['wide'], base['wide'])
+
+    def test_batch_processing(self):
+        ''' test_base_actors.test_batch_processing
+        '''
+        test_name = 'test_base_actors.test_batch_processing'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        collector = Collector()
+        collector.batch_size = 4
+        collector.inbox.put_many(dict(value=value) for value in range(10))
+        collector.start()
+        self.assertEqual([message['value'] for message in collector.results], list(range(10)))
+        self.assertFalse(collector.processing)
+
+    def test_metrics(self):
+        ''' test_base_actors.test_metrics
+        '''
+        test_name = 'test_base_actors.test_metrics'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        collector = Collector()
+        collector.inbox = DequeInbox(maxsize=5, overflow=OF_DROP_HEAD)
+        collector.inbox.put_many(dict(value=value) for value in range(8))
+        self.assertEqual(collector.metrics(), dict(depth=5, dropped=3, blocked=0))
+        collector.start()
+        self.assertEqual([message['value'] for message in collector.results], [3, 4, 5, 6, 7])
+        self.assertEqual(collector.metrics()['depth'], 0)
+
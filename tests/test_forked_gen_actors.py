@@ -16,6 +16,20 @@ from tests import SenderGeneratorActor as SenderActor
 from tests import ReceiverGeneratorActor as ReceiverActor
 from tests import ForkedLongRunningActor as LongRunningActor
 
+
+class SlowForkedActor(ForkedGenActor):
+    ''' SlowForkedActor, takes 10ms per message
+    '''
+    def loop(self):
+        while self.processing:
+            try:
+                self.inbox.get(timeout=1)
+                time.sleep(0.01)
+            except EmptyInboxException:
+                pass
+            yield
+
+
 class ForkedGeneratorActorTest(unittest.TestCase):
 
     def test_run(self):
@@ -172,6 +186,22 @@ class ForkedGeneratorActorTest(unittest.TestCase):
         self.assertEqual(parent.processing, False)
         self.assertEqual(parent.waiting, False)
 
+    def test_request_stop(self):
+        ''' test_forked_gen_actors.test_request_stop
+        '''
+        test_name = 'test_forked_gen_actors.test_request_stop'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        actor = SlowForkedActor()
+        actor.inbox.put_many(range(500))
+        actor.start()
+        time.sleep(0.1)
+        actor.request_stop()
+        # the stop is handled ahead of the backlog of 5 seconds
+        self.assertTrue(actor.join(2))
+        self.assertEqual(actor.processing, False)
+        self.assertGreater(len(actor.inbox), 0)
+
     def test_send_msg_between_forked_actors(self):
         ''' test_forked_gen_actors.test_send_msg_between_forked_actors
         '''        
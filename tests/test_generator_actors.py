@@ -9,7 +9,9 @@ import unittest
 
 from pyactors.logs import file_logger
 from pyactors.generator import GeneratorActor
-from pyactors.exceptions import EmptyInboxException
+from pyactors.messages import SystemMessage, SM_PING, SM_PONG
+from pyactors.inbox import PriorityInbox, PRIORITY_LOW, OF_RAISE
+from pyactors.exceptions import EmptyInboxException, FullInboxException
 
 from tests import SenderGeneratorActor as Sender
 from tests import ReceiverGeneratorActor as Receiver
@@ -126,13 +128,124 @@ class GeneratorActorTest(unittest.TestCase):
         parent.add_child(Receiver(name='Receiver'))      
         parent.start()
         parent.run()
-        self.assertEqual(parent.inbox.get(), 'message from sender') 
+        self.assertEqual(parent.inbox.get(), 'message from sender')
 
 
+class WaitingActor(GeneratorActor):
+    ''' WaitingActor, counts its iteractions
+    '''
+    def __init__(self, name=None):
+        super(WaitingActor, self).__init__(name=name)
+        self.steps = 0
+        self.messages = list()
 
+    def loop(self):
+        while self.processing:
+            self.steps += 1
+            try:
+                self.messages.append(self.inbox.get())
+            except EmptyInboxException:
+                self.waiting = True
+            yield
+
+
+class SupervisorReadyQueueTest(unittest.TestCase):
 
+    def test_idle_children_are_parked(self):
+        ''' test_generator_actors.test_idle_children_are_parked
+        '''
+        test_name = 'test_generator_actors.test_idle_children_are_parked'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
 
+        parent = GeneratorActor()
+        children = [WaitingActor() for _ in range(100)]
+        for child in children:
+            parent.add_child(child)
+        parent.start()
+        for _ in range(1000):
+            parent.run_once()
+        self.assertEqual([child.steps for child in children], [1] * 100)
 
+        children[5].send('message')
+        for _ in range(10):
+            parent.run_once()
+        self.assertEqual(children[5].messages, ['message'])
+        self.assertEqual(sum(child.steps for child in children), 102)
 
+        parent.stop()
+        self.assertEqual(parent.run_once(), False)
+
+    def test_supervise_budget(self):
+        ''' test_generator_actors.test_supervise_budget
+        '''
+        test_name = 'test_generator_actors.test_supervise_budget'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        parent = GeneratorActor()
+        parent.supervise_budget = 5
+        for _ in range(5):
+            parent.add_child(TestActor())
+        parent.start()
+        parent.run_once()
+        self.assertEqual(len(parent.inbox), 5)
+        parent.run()
+        self.assertEqual(len(parent.inbox), 50)
+
+
+class SystemMessageTest(unittest.TestCase):
+
+    def test_request_stop_jumps_the_queue(self):
+        ''' test_generator_actors.test_request_stop_jumps_the_queue
+        '''
+        test_name = 'test_generator_actors.test_request_stop_jumps_the_queue'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        actor = WaitingActor()
+        actor.inbox.put_many(range(100))
+        actor.start()
+        actor.run_once()
+        actor.run_once()
+        actor.request_stop()
+        self.assertEqual(actor.run_once(), False)
+        self.assertEqual(actor.processing, False)
+        self.assertEqual(actor.messages, [0, 1])
+        self.assertEqual(len(actor.inbox), 98)
+
+    def test_request_stop_overtakes_full_priority_inbox(self):
+        ''' test_generator_actors.test_request_stop_overtakes_full_priority_inbox
+        '''
+        test_name = 'test_generator_actors.test_request_stop_overtakes_full_priority_inbox'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        actor = WaitingActor()
+        actor.inbox = PriorityInbox(maxsize=10, overflow=OF_RAISE)
+        actor.inbox.put_many(range(10), priority=PRIORITY_LOW)
+        self.assertRaises(FullInboxException, actor.inbox.put, 10)
+        actor.start()
+        actor.run_once()
+        # the stop request doesn't need room in the full inbox
+        actor.request_stop()
+        self.assertEqual(actor.processing, True)
+        self.assertEqual(actor.run_once(), False)
+        self.assertEqual(actor.processing, False)
+        self.assertEqual(actor.messages, [0])
+        self.assertEqual(len(actor.inbox), 9)
+
+    def test_ping(self):
+        ''' test_generator_actors.test_ping
+        '''
+        test_name = 'test_generator_actors.test_ping'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        parent = GeneratorActor()
+        child = WaitingActor()
+        parent.add_child(child)
+        child.inbox.put(0)
+        child.inbox.put_system(SystemMessage(SM_PING, sender=parent.address, payload='probe'))
+        parent.start()
+        parent.run_once()
+        pong = parent.inbox.get_system()
+        self.assertEqual((pong.kind, pong.sender, pong.payload), (SM_PONG, child.address, 'probe'))
+        self.assertEqual(child.messages, [0])
+        parent.stop()
 
-        
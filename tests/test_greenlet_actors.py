@@ -5,12 +5,32 @@ if '' not in sys.path:
 import unittest
 
 from pyactors.logs import file_logger
-from pyactors.exceptions import EmptyInboxException
+from pyactors.green import GreenletActor
+from pyactors.inbox import OF_RAISE
+from pyactors.inbox.green import GeventInbox
+from pyactors.exceptions import EmptyInboxException, FullInboxException
 
 from tests import TestGreenletActor as TestActor
 from tests import SenderGreenletActor as SenderActor
 from tests import ReceiverGreenletActor as ReceiverActor
 
+class BacklogActor(GreenletActor):
+    ''' BacklogActor, takes one message per greenlet switch
+    '''
+    def __init__(self, maxsize=0):
+        super(BacklogActor, self).__init__()
+        self.inbox = GeventInbox(maxsize=maxsize, overflow=OF_RAISE)
+        self.messages = list()
+
+    def loop(self):
+        while self.handle_system():
+            try:
+                self.messages.append(self.inbox.get())
+            except EmptyInboxException:
+                break
+            self.sleep()
+        self.stop()
+
 class GeventActorTest(unittest.TestCase):
 
     def test_run(self):
@@ -125,6 +145,27 @@ class GeventActorTest(unittest.TestCase):
         parent.stop()       
         self.assertEqual(parent.inbox.get(), 'message from sender')
 
+    def test_request_stop_overtakes_backlog(self):
+        ''' test_greenlet_actors.test_request_stop_overtakes_backlog
+        '''
+        test_name = 'test_greenlet_actors.test_request_stop_overtakes_backlog'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        actor = BacklogActor(maxsize=10)
+        actor.inbox.put_many(range(10))
+        self.assertRaises(FullInboxException, actor.inbox.put, 10)
+        actor.start()
+        # the actor's greenlet takes the first message
+        actor.sleep()
+        # the stop request doesn't need room in the full inbox, the actor's
+        # greenlet takes it ahead of the queued messages
+        actor.request_stop()
+        self.assertEqual(actor.processing, True)
+        actor.run()
+        self.assertEqual(actor.processing, False)
+        self.assertEqual(actor.messages, [0])
+        self.assertEqual(len(actor.inbox), 9)
+
 if __name__ == '__main__':
     unittest.main()
         
@@ -0,0 +1,609 @@
+import sys
+if '' not in sys.path:
+    sys.path.append('')
+
+import os
+import time
+import shutil
+import tempfile
+import threading
+import multiprocessing
+import unittest
+
+from pyactors.logs import file_logger
+from pyactors.inbox import DequeInbox, QueueInbox, PriorityInbox, ProcessInbox
+from pyactors.inbox import PRIORITY_HIGH, PRIORITY_LOW
+from pyactors.messages import SystemMessage, SM_STOP
+from pyactors.inbox import OF_BLOCK, OF_DROP_HEAD, OF_DROP_TAIL, OF_RAISE, OF_SPILL
+from pyactors.inbox.shm import SharedMemoryInbox
+from pyactors.inbox.mmapq import MmapInbox
+from pyactors.inbox.green import GeventInbox
+from pyactors.inbox.event import EventletInbox
+from pyactors.exceptions import EmptyInboxException, FullInboxException
+
+
+class InboxTest(unittest.TestCase):
+
+    def _put_later(self, inbox, message, delay=0.05):
+        timer = threading.Timer(delay, inbox.put, args=(message,))
+        timer.start()
+        return timer
+
+    def test_deque_inbox_get_timeout(self):
+        ''' test_inbox.test_deque_inbox_get_timeout
+        '''
+        test_name = 'test_inbox.test_deque_inbox_get_timeout'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        inbox = DequeInbox()
+        self.assertRaises(EmptyInboxException, inbox.get)
+        self.assertRaises(EmptyInboxException, inbox.get, 0.01)
+
+        self._put_later(inbox, 'message')
+        self.assertEqual(inbox.get(timeout=5), 'message')
+
+    def test_deque_inbox_wait_and_wakeup(self):
+        ''' test_inbox.test_deque_inbox_wait_and_wakeup
+        '''
+        test_name = 'test_inbox.test_deque_inbox_wait_and_wakeup'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        inbox = DequeInbox()
+        self.assertFalse(inbox.wait(0.01))
+
+        self._put_later(inbox, 'message')
+        self.assertTrue(inbox.wait())
+        self.assertEqual(len(inbox), 1)
+        self.assertEqual(inbox.get(), 'message')
+
+        threading.Timer(0.05, inbox.wakeup).start()
+        started = time.time()
+        self.assertFalse(inbox.wait())
+        self.assertLess(time.time() - started, 5)
+
+    def test_process_inbox_wait_and_wakeup(self):
+        ''' test_inbox.test_process_inbox_wait_and_wakeup
+        '''
+        test_name = 'test_inbox.test_process_inbox_wait_and_wakeup'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        inbox = ProcessInbox()
+        self.assertFalse(inbox.wait(0.01))
+
+        self._put_later(inbox, 'message')
+        self.assertTrue(inbox.wait(timeout=5))
+        self.assertEqual(inbox.get(), 'message')
+
+        inbox.wakeup()
+        self.assertFalse(inbox.wait(timeout=5))
+        self.assertRaises(EmptyInboxException, inbox.get, 0.01)
+
+    def test_deque_inbox_batches(self):
+        ''' test_inbox.test_deque_inbox_batches
+        '''
+        test_name = 'test_inbox.test_deque_inbox_batches'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        inbox = DequeInbox()
+        self.assertRaises(EmptyInboxException, inbox.get_many, 10)
+        inbox.put_many(range(5))
+        self.assertEqual(inbox.get_many(3), [0, 1, 2])
+        self.assertEqual(inbox.get_many(3), [3, 4])
+
+        self._put_later(inbox, 'message')
+        self.assertEqual(inbox.get_many(3, timeout=5), ['message'])
+
+    def test_process_inbox_batches(self):
+        ''' test_inbox.test_process_inbox_batches
+        '''
+        test_name = 'test_inbox.test_process_inbox_batches'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        inbox = ProcessInbox()
+        self.assertRaises(EmptyInboxException, inbox.get_many, 10)
+        inbox.put_many(range(5))
+        inbox.put('message')
+        self.assertEqual(inbox.get_many(3, timeout=5), [0, 1, 2])
+        self.assertEqual(inbox.get(), 3)
+        # multiprocessing.Queue flushes puts by feeder thread, items may come in two reads
+        messages = inbox.get_many(10, timeout=5)
+        if len(messages) < 2:
+            messages.extend(inbox.get_many(10, timeout=5))
+        self.assertEqual(messages, [4, 'message'])
+
+    def test_shm_inbox_large_buffers(self):
+        ''' test_inbox.test_shm_inbox_large_buffers
+        '''
+        test_name = 'test_inbox.test_shm_inbox_large_buffers'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        inbox = SharedMemoryInbox(capacity=4096, oob_threshold=1024)
+        try:
+            self.assertRaises(EmptyInboxException, inbox.get)
+            self.assertRaises(EmptyInboxException, inbox.get, 0.01)
+
+            blob = os.urandom(100000)
+            inbox.put(dict(blob=blob, array=bytearray(blob), view=memoryview(blob), small='message'))
+            message = inbox.get()
+            self.assertEqual(message['blob'], blob)
+            self.assertEqual(message['array'], bytearray(blob))
+            self.assertEqual(message['small'], 'message')
+            # memoryview refers to shared memory segment until it's released
+            self.assertEqual(message['view'].tobytes(), blob)
+            self.assertEqual(len(inbox._leases), 1)
+            del message
+            inbox._collect()
+            self.assertEqual(len(inbox._leases), 0)
+
+            # pickle larger than ring and many messages wrapping around the ring
+            inbox.put(list(range(5000)))
+            self.assertEqual(inbox.get(), list(range(5000)))
+            for i in range(100):
+                inbox.put_many([dict(value=i, padding='x' * 300)] * 3)
+                self.assertEqual([m['value'] for m in inbox.get_many(5)], [i] * 3)
+        finally:
+            inbox.close()
+
+    def test_shm_inbox_across_processes(self):
+        ''' test_inbox.test_shm_inbox_across_processes
+        '''
+        test_name = 'test_inbox.test_shm_inbox_across_processes'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        def writer(inbox):
+            for i in range(50):
+                inbox.put(bytes(2000) + bytes([i]))
+
+        inbox = SharedMemoryInbox(capacity=4096, oob_threshold=1024)
+        try:
+            process = multiprocessing.Process(target=writer, args=(inbox,))
+            process.start()
+            self.assertEqual([inbox.get(timeout=5)[-1] for _ in range(50)], list(range(50)))
+            process.join()
+
+            threading.Timer(0.05, inbox.wakeup).start()
+            self.assertFalse(inbox.wait(5))
+        finally:
+            inbox.close()
+
+    def test_shm_inbox_overflow(self):
+        ''' test_inbox.test_shm_inbox_overflow
+        '''
+        test_name = 'test_inbox.test_shm_inbox_overflow'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        inboxes = list()
+        try:
+            # full by maxsize
+            inbox = SharedMemoryInbox(capacity=4096, maxsize=3, overflow=OF_DROP_HEAD)
+            inboxes.append(inbox)
+            inbox.put_many(range(5))
+            self.assertEqual(inbox.get_many(5), [2, 3, 4])
+            self.assertEqual(inbox.metrics(), dict(depth=0, dropped=2, blocked=0))
+
+            # full ring
+            inbox = SharedMemoryInbox(capacity=1024, overflow=OF_DROP_TAIL)
+            inboxes.append(inbox)
+            inbox.put_many(['x' * 400, 'y' * 400, 'z' * 400])
+            self.assertEqual(inbox.get_many(3), ['x' * 400, 'y' * 400])
+            self.assertEqual(inbox.metrics()['dropped'], 1)
+
+            # segments of dropped messages are unlinked
+            inbox = SharedMemoryInbox(capacity=4096, oob_threshold=256, maxsize=1, overflow=OF_DROP_TAIL)
+            inboxes.append(inbox)
+            inbox.put(1)
+            segments = set(os.listdir('/dev/shm'))
+            inbox.put(bytes(1000))
+            self.assertEqual(set(os.listdir('/dev/shm')), segments)
+            self.assertEqual((inbox.get(), inbox.metrics()['dropped']), (1, 1))
+
+            inbox = SharedMemoryInbox(capacity=4096, maxsize=1, overflow=OF_RAISE)
+            inboxes.append(inbox)
+            inbox.put(1)
+            self.assertRaises(FullInboxException, inbox.put, 2)
+
+            inbox = SharedMemoryInbox(capacity=4096, maxsize=1, overflow=OF_BLOCK)
+            inboxes.append(inbox)
+            inbox.put(1)
+            self.assertRaises(FullInboxException, inbox.put, 2, timeout=0.01)
+            threading.Timer(0.05, inbox.get).start()
+            inbox.put(3, timeout=5)
+            self.assertEqual((inbox.get(), inbox.metrics()['blocked']), (3, 2))
+        finally:
+            for inbox in inboxes:
+                inbox.close()
+
+    def test_process_inbox_length(self):
+        ''' test_inbox.test_process_inbox_length
+        '''
+        test_name = 'test_inbox.test_process_inbox_length'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        def writer(inbox):
+            inbox.put('message')
+            inbox.put_many(range(4))
+
+        inbox = ProcessInbox()
+        self.assertEqual(len(inbox), 0)
+        process = multiprocessing.Process(target=writer, args=(inbox,))
+        process.start()
+        process.join()
+        # batch is counted by its messages, not as one queue item
+        self.assertEqual(len(inbox), 5)
+        inbox.wakeup()
+        self.assertEqual(len(inbox), 5)
+
+        self.assertEqual(inbox.get(timeout=5), 'message')
+        self.assertEqual(len(inbox), 4)
+        self.assertEqual(inbox.get_many(2, timeout=5), [0, 1])
+        self.assertEqual(inbox.metrics(), dict(depth=2, puts=5, gets=3, dropped=0, blocked=0))
+
+    def test_queue_inbox_get_timeout(self):
+        ''' test_inbox.test_queue_inbox_get_timeout
+        '''
+        test_name = 'test_inbox.test_queue_inbox_get_timeout'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        inbox = QueueInbox()
+        self.assertRaises(EmptyInboxException, inbox.get)
+        self.assertRaises(EmptyInboxException, inbox.get, 0.01)
+
+        self._put_later(inbox, 'message')
+        self.assertEqual(inbox.get(timeout=5), 'message')
+        self.assertEqual(len(inbox), 0)
+
+        threading.Timer(0.05, inbox.wakeup).start()
+        self.assertFalse(inbox.wait())
+
+    def test_queue_inbox_overflow(self):
+        ''' test_inbox.test_queue_inbox_overflow
+        '''
+        test_name = 'test_inbox.test_queue_inbox_overflow'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        inbox = QueueInbox(maxsize=3, overflow=OF_DROP_HEAD)
+        inbox.put_many(range(5))
+        self.assertEqual(inbox.get_many(10), [2, 3, 4])
+
+        inbox = QueueInbox(maxsize=3, overflow=OF_DROP_TAIL)
+        inbox.put_many(range(5))
+        self.assertEqual(inbox.get_many(10), [0, 1, 2])
+
+        inbox = QueueInbox(maxsize=3, overflow=OF_RAISE)
+        inbox.put_many(range(3))
+        self.assertRaises(FullInboxException, inbox.put, 3)
+        self.assertEqual(len(inbox), 3)
+
+        inbox = QueueInbox(maxsize=3, overflow=OF_BLOCK)
+        inbox.put_many(range(3))
+        self.assertRaises(FullInboxException, inbox.put, 3, 0.01)
+        # producer waits until consumer takes a message
+        threading.Timer(0.05, inbox.get).start()
+        inbox.put(3, timeout=5)
+        self.assertEqual(inbox.get_many(10), [1, 2, 3])
+
+    def test_queue_inbox_threads(self):
+        ''' test_inbox.test_queue_inbox_threads
+        '''
+        test_name = 'test_inbox.test_queue_inbox_threads'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        inbox = QueueInbox(maxsize=10)
+
+        def producer(start):
+            for value in range(start, start + 1000):
+                inbox.put(value)
+
+        producers = [threading.Thread(target=producer, args=(i * 1000,)) for i in range(4)]
+        for thread in producers:
+            thread.start()
+        received = list()
+        while len(received) < 4000:
+            received.extend(inbox.get_many(100, timeout=5))
+        for thread in producers:
+            thread.join()
+        self.assertEqual(sorted(received), list(range(4000)))
+
+    def test_deque_inbox_overflow(self):
+        ''' test_inbox.test_deque_inbox_overflow
+        '''
+        test_name = 'test_inbox.test_deque_inbox_overflow'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        inbox = DequeInbox(maxsize=3, overflow=OF_DROP_HEAD)
+        inbox.put_many(range(5))
+        self.assertEqual(inbox.metrics(), dict(depth=3, dropped=2, blocked=0))
+        self.assertEqual(inbox.get_many(10), [2, 3, 4])
+
+        inbox = DequeInbox(maxsize=3, overflow=OF_DROP_TAIL)
+        inbox.put_many(range(5))
+        self.assertEqual(inbox.get_many(10), [0, 1, 2])
+        self.assertEqual(inbox.metrics()['dropped'], 2)
+
+        inbox = DequeInbox(maxsize=1, overflow=OF_BLOCK)
+        inbox.put(0)
+        threading.Timer(0.05, inbox.get).start()
+        inbox.put(1, timeout=5)
+        self.assertEqual(inbox.metrics(), dict(depth=1, dropped=0, blocked=1))
+
+    def test_deque_inbox_spill(self):
+        ''' test_inbox.test_deque_inbox_spill
+        '''
+        test_name = 'test_inbox.test_deque_inbox_spill'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        inbox = DequeInbox(maxsize=3, overflow=OF_SPILL)
+        inbox.put_many(range(10))
+        self.assertEqual(len(inbox), 10)
+        self.assertEqual(inbox.get_many(4), [0, 1, 2])
+        inbox.put(10)
+        received = list()
+        while len(inbox):
+            received.append(inbox.get())
+        self.assertEqual(received, list(range(3, 11)))
+        self.assertEqual(inbox.metrics(), dict(depth=0, dropped=0, blocked=0))
+
+    def test_process_inbox_overflow(self):
+        ''' test_inbox.test_process_inbox_overflow
+        '''
+        test_name = 'test_inbox.test_process_inbox_overflow'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        self.assertRaises(RuntimeError, ProcessInbox, maxsize=3, overflow=OF_SPILL)
+
+        inbox = ProcessInbox(maxsize=3, overflow=OF_DROP_TAIL)
+        inbox.put_many(range(5))
+        inbox.put(5)
+        self.assertEqual(inbox.get_many(10, timeout=5), [0, 1, 2])
+        self.assertEqual(inbox.metrics()['dropped'], 3)
+
+        inbox = ProcessInbox(maxsize=3, overflow=OF_RAISE)
+        inbox.put_many(range(3))
+        self.assertRaises(FullInboxException, inbox.put, 3)
+
+        inbox = ProcessInbox(maxsize=2, overflow=OF_BLOCK)
+        inbox.put_many(range(2))
+        self.assertRaises(FullInboxException, inbox.put, 2, 0.01)
+        threading.Timer(0.05, inbox.get, args=(5,)).start()
+        inbox.put(2, timeout=5)
+        self.assertEqual([inbox.get(timeout=5), inbox.get(timeout=5)], [1, 2])
+        self.assertEqual(inbox.metrics()['blocked'], 2)
+
+    def test_priority_inbox(self):
+        ''' test_inbox.test_priority_inbox
+        '''
+        test_name = 'test_inbox.test_priority_inbox'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        inbox = PriorityInbox()
+        self.assertRaises(EmptyInboxException, inbox.get)
+        inbox.put('normal')
+        inbox.put_many(['low-1', 'low-2'], priority=PRIORITY_LOW)
+        inbox.put('high', priority=PRIORITY_HIGH)
+        self.assertEqual(len(inbox), 4)
+        self.assertEqual(inbox.get(), 'high')
+        self.assertEqual(inbox.get_many(10), ['normal', 'low-1', 'low-2'])
+
+        self.assertEqual(inbox.get_system(), None)
+        threading.Timer(0.05, inbox.put_system, args=(SystemMessage(SM_STOP),)).start()
+        self.assertTrue(inbox.wait(5))
+        self.assertEqual(inbox.get_system().kind, SM_STOP)
+        self.assertEqual(len(inbox), 0)
+
+    def test_priority_inbox_overflow(self):
+        ''' test_inbox.test_priority_inbox_overflow
+        '''
+        test_name = 'test_inbox.test_priority_inbox_overflow'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        # the oldest message of the lowest level is dropped
+        inbox = PriorityInbox(maxsize=3, overflow=OF_DROP_HEAD)
+        inbox.put_many(['low-1', 'low-2'], priority=PRIORITY_LOW)
+        inbox.put('normal')
+        inbox.put('high', priority=PRIORITY_HIGH)
+        self.assertEqual(inbox.get_many(10), ['high', 'normal', 'low-2'])
+        self.assertEqual(inbox.metrics(), dict(depth=0, dropped=1, blocked=0))
+
+        inbox = PriorityInbox(maxsize=1, overflow=OF_RAISE)
+        inbox.put(1)
+        self.assertRaises(FullInboxException, inbox.put, 2, PRIORITY_HIGH)
+
+        inbox = PriorityInbox(maxsize=1, overflow=OF_BLOCK)
+        inbox.put(1)
+        self.assertRaises(FullInboxException, inbox.put, 2, timeout=0.01)
+        threading.Timer(0.05, inbox.get).start()
+        inbox.put(3, priority=PRIORITY_HIGH, timeout=5)
+        self.assertEqual((inbox.get(), inbox.metrics()['blocked']), (3, 2))
+
+        self.assertRaises(RuntimeError, PriorityInbox, maxsize=1, overflow=OF_SPILL)
+
+    def test_process_inbox_system_messages(self):
+        ''' test_inbox.test_process_inbox_system_messages
+        '''
+        test_name = 'test_inbox.test_process_inbox_system_messages'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        def writer(inbox):
+            inbox.put_many(range(3))
+            inbox.put_system(SystemMessage(SM_STOP))
+
+        inbox = ProcessInbox()
+        self.assertEqual(inbox.get_system(), None)
+        process = multiprocessing.Process(target=writer, args=(inbox,))
+        process.start()
+        process.join()
+        self.assertEqual(inbox.get_system().kind, SM_STOP)
+        self.assertEqual(inbox.get_system(), None)
+        # system messages are not counted as regular ones
+        self.assertEqual(len(inbox), 3)
+        self.assertEqual(inbox.get_many(3, timeout=5), [0, 1, 2])
+
+        # wakeup markers of system messages don't hide queued messages
+        inbox = ProcessInbox()
+        inbox.put(1)
+        inbox.put_system(SystemMessage(SM_STOP))
+        inbox.wakeup()
+        inbox.put(2)
+        self.assertEqual(inbox.get(timeout=5), 1)
+        self.assertEqual((inbox.get(), len(inbox)), (2, 0))
+        self.assertRaises(EmptyInboxException, inbox.get)
+        self.assertEqual(inbox.get_system().kind, SM_STOP)
+
+    def test_green_inboxes_wakeup_markers(self):
+        ''' test_inbox.test_green_inboxes_wakeup_markers
+        '''
+        test_name = 'test_inbox.test_green_inboxes_wakeup_markers'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        for inbox_class in (GeventInbox, EventletInbox):
+            inbox = inbox_class(logger=logger)
+            inbox.put(1)
+            inbox.wakeup()
+            inbox.put(2)
+            self.assertEqual(len(inbox), 2)
+            self.assertEqual(inbox.get(), 1)
+            self.assertEqual((inbox.get(), len(inbox)), (2, 0))
+            self.assertRaises(EmptyInboxException, inbox.get)
+
+            # a marker alone ends waiting
+            inbox.wakeup()
+            self.assertEqual(len(inbox), 0)
+            self.assertEqual(inbox.wait(timeout=5), False)
+            inbox.put_many([3, 4])
+            self.assertEqual(inbox.get_many(5), [3, 4])
+
+    def test_green_inboxes_overflow(self):
+        ''' test_inbox.test_green_inboxes_overflow
+        '''
+        test_name = 'test_inbox.test_green_inboxes_overflow'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        for inbox_class in (GeventInbox, EventletInbox):
+            self.assertRaises(RuntimeError, inbox_class, maxsize=2, overflow=OF_SPILL)
+
+            inbox = inbox_class(logger=logger, maxsize=3, overflow=OF_DROP_HEAD)
+            inbox.put_many(range(5))
+            self.assertEqual(inbox.get_many(5), [2, 3, 4])
+            self.assertEqual(inbox.metrics(), dict(depth=0, dropped=2, blocked=0))
+
+            inbox = inbox_class(logger=logger, maxsize=2, overflow=OF_DROP_TAIL)
+            inbox.put_many(range(4))
+            self.assertEqual((len(inbox), inbox.dropped), (2, 2))
+            self.assertEqual(inbox.get(), 0)
+            # the taken message frees its slot
+            inbox.put(5)
+            self.assertEqual(inbox.get_many(5), [1, 5])
+
+            inbox = inbox_class(logger=logger, maxsize=1, overflow=OF_RAISE)
+            inbox.put(1)
+            self.assertRaises(FullInboxException, inbox.put, 2)
+            self.assertEqual(inbox.get(), 1)
+
+            inbox = inbox_class(logger=logger, maxsize=1, overflow=OF_BLOCK)
+            inbox.put(1)
+            self.assertRaises(FullInboxException, inbox.put, 2, timeout=0.01)
+            self.assertEqual(inbox.metrics(), dict(depth=1, dropped=0, blocked=1))
+
+    def test_green_inboxes_system_messages(self):
+        ''' test_inbox.test_green_inboxes_system_messages
+        '''
+        test_name = 'test_inbox.test_green_inboxes_system_messages'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        for inbox_class in (GeventInbox, EventletInbox):
+            inbox = inbox_class(logger=logger, maxsize=2, overflow=OF_RAISE)
+            inbox.put_many([1, 2])
+            # system messages don't count against maxsize
+            inbox.put_system(SystemMessage(SM_STOP))
+            self.assertEqual(len(inbox), 2)
+            self.assertEqual(inbox.wait(timeout=0), True)
+            self.assertEqual(inbox.get_system().kind, SM_STOP)
+            self.assertEqual(inbox.get_system(), None)
+            self.assertEqual(inbox.get_many(5), [1, 2])
+
+            # put_system() ends waiting on an empty inbox
+            inbox.put_system(SystemMessage(SM_STOP))
+            inbox.get_system()
+            self.assertEqual(inbox.wait(timeout=5), False)
+            self.assertEqual(len(inbox), 0)
+
+    def test_mmap_inbox_persistence(self):
+        ''' test_inbox.test_mmap_inbox_persistence
+        '''
+        test_name = 'test_inbox.test_mmap_inbox_persistence'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        path = tempfile.mkdtemp()
+        try:
+            inbox = MmapInbox(path, segment_size=1024, sync_every=10)
+            self.assertRaises(EmptyInboxException, inbox.get)
+            inbox.put_many(dict(value=value, padding='x' * 50) for value in range(100))
+            self.assertEqual(len(inbox), 100)
+            self.assertGreater(len([name for name in os.listdir(path) if name.endswith('.seg')]), 5)
+            self.assertEqual([m['value'] for m in inbox.get_many(40)], list(range(40)))
+            inbox.close()
+
+            # restart: the rest of messages is read from the cursor, read out segments are deleted
+            inbox = MmapInbox(path, segment_size=1024)
+            self.assertEqual(len(inbox), 60)
+            inbox.put(dict(value=100))
+            self.assertEqual([m['value'] for m in inbox.get_many(100)], list(range(40, 101)))
+            self.assertEqual(len([name for name in os.listdir(path) if name.endswith('.seg')]), 1)
+
+            self._put_later(inbox, 'message')
+            self.assertEqual(inbox.get(timeout=5), 'message')
+            inbox.close()
+
+            inbox = MmapInbox(path, segment_size=1024)
+            self.assertEqual(len(inbox), 0)
+            # message larger than segment gets its own segment
+            inbox.put('y' * 5000)
+            self.assertEqual(inbox.get(), 'y' * 5000)
+            inbox.close()
+        finally:
+            shutil.rmtree(path)
+
+    def test_mmap_inbox_overflow(self):
+        ''' test_inbox.test_mmap_inbox_overflow
+        '''
+        test_name = 'test_inbox.test_mmap_inbox_overflow'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        path = tempfile.mkdtemp()
+        try:
+            self.assertRaises(RuntimeError, MmapInbox, path, maxsize=2, overflow=OF_SPILL)
+
+            inbox = MmapInbox(os.path.join(path, 'head'), maxsize=3, overflow=OF_DROP_HEAD)
+            inbox.put_many(range(5))
+            self.assertEqual(inbox.get_many(5), [2, 3, 4])
+            self.assertEqual(inbox.metrics(), dict(depth=0, dropped=2, blocked=0))
+            inbox.close()
+
+            inbox = MmapInbox(os.path.join(path, 'tail'), maxsize=2, overflow=OF_DROP_TAIL)
+            inbox.put_many(range(4))
+            self.assertEqual((len(inbox), inbox.dropped), (2, 2))
+            self.assertEqual(inbox.get(), 0)
+            inbox.put(5)
+            self.assertEqual(inbox.get_many(5), [1, 5])
+            inbox.close()
+
+            inbox = MmapInbox(os.path.join(path, 'raise'), maxsize=1, overflow=OF_RAISE)
+            inbox.put(1)
+            self.assertRaises(FullInboxException, inbox.put, 2)
+            self.assertEqual(inbox.get(), 1)
+            inbox.close()
+
+            inbox = MmapInbox(os.path.join(path, 'block'), maxsize=1, overflow=OF_BLOCK)
+            inbox.put(1)
+            self.assertRaises(FullInboxException, inbox.put, 2, timeout=0.01)
+            # the taken message makes room for the waiting put
+            timer = threading.Timer(0.05, inbox.get)
+            timer.start()
+            inbox.put(3, timeout=5)
+            timer.join()
+            self.assertEqual(inbox.get(), 3)
+            self.assertEqual(inbox.metrics(), dict(depth=0, dropped=0, blocked=2))
+            inbox.close()
+        finally:
+            shutil.rmtree(path)
+
@@ -0,0 +1,171 @@
+import sys
+if '' not in sys.path:
+    sys.path.append('')
+
+import unittest
+
+from pyactors.aio import AsyncioActor
+from pyactors.base import ActorSystem
+from pyactors.logs import file_logger
+from pyactors.pool import PC_SPAWN
+from pyactors.loop_pool import LoopPool, loop_policy, uvloop
+from pyactors.exceptions import EmptyInboxException
+
+
+class SquareActor(AsyncioActor):
+    ''' Square Actor, replies with square of received numbers
+    '''
+    def __init__(self, name=None, reply_to=None):
+        super(SquareActor, self).__init__(name=name)
+        self.reply_to = reply_to
+
+    async def loop(self):
+        while self.processing:
+            value = await self.receive()
+            if value is None:
+                break
+            self.pool.send(self.reply_to, value * value)
+
+
+class ForwardActor(AsyncioActor):
+    ''' Forward Actor, forwards received messages to target actor and
+    reports them to echo address if it's defined
+    '''
+    def __init__(self, name=None, target=None, echo=None):
+        super(ForwardActor, self).__init__(name=name)
+        self.target = target
+        self.echo = echo
+
+    async def loop(self):
+        while self.processing:
+            message = await self.receive()
+            if message is None:
+                break
+            self.pool.send(self.target, message)
+            if self.echo is not None:
+                self.pool.send(self.echo, ('forwarded', message))
+
+
+class LateSpawnPool(LoopPool):
+    ''' Loop pool which holds spawn commands of late_class actors until release()
+    '''
+    def __init__(self, late_class=None, **kwargs):
+        super(LateSpawnPool, self).__init__(**kwargs)
+        self.late_class = late_class
+        self.held = list()
+
+    def _command(self, index, command):
+        if command[0] == PC_SPAWN and command[2] is self.late_class:
+            self.held.append((index, command))
+        else:
+            super(LateSpawnPool, self)._command(index, command)
+
+    def release(self):
+        for index, command in self.held:
+            super(LateSpawnPool, self)._command(index, command)
+        self.held = list()
+
+
+class LoopPoolTest(unittest.TestCase):
+
+    def _results(self, inbox, count):
+        return [inbox.get(timeout=10) for _ in range(count)]
+
+    def test_spawn_and_send(self):
+        ''' test_loop_pool.test_spawn_and_send
+        '''
+        test_name = 'test_loop_pool.test_spawn_and_send'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        pool = LoopPool(workers=2)
+        pool.start()
+        try:
+            actors = [pool.spawn(SquareActor, reply_to=pool.address) for _ in range(10)]
+            for i, actor in enumerate(actors):
+                actor.send(i)
+            self.assertEqual(sorted(self._results(pool.inbox, 10)), [i * i for i in range(10)])
+        finally:
+            pool.stop(timeout=10)
+
+    def test_cross_shard_messages(self):
+        ''' test_loop_pool.test_cross_shard_messages
+        '''
+        test_name = 'test_loop_pool.test_cross_shard_messages'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        system = ActorSystem()
+        pool = system.start_loop_pool(workers=3)
+        try:
+            square = system.spawn(SquareActor, reply_to=pool.address)
+            forwarders = [system.spawn(ForwardActor, target=square.address) for _ in range(30)]
+            for i, actor in enumerate(forwarders):
+                actor.send(i)
+            self.assertEqual(sorted(self._results(pool.inbox, 30)), [i * i for i in range(30)])
+        finally:
+            system.stop()
+        self.assertIsNone(system.pool)
+
+    def test_messages_ahead_of_spawn(self):
+        ''' test_loop_pool.test_messages_ahead_of_spawn
+        '''
+        test_name = 'test_loop_pool.test_messages_ahead_of_spawn'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        pool = LateSpawnPool(late_class=SquareActor, workers=2, logger=logger)
+        pool.start()
+        try:
+            square = pool.spawn(SquareActor, reply_to=pool.address)
+            # forwarders on both shards, at least one of them is on another shard than square
+            forwarders = list()
+            while len(set(pool.placement(actor.address, pool.size) for actor in forwarders + [square])) < 2:
+                forwarders.append(pool.spawn(ForwardActor, target=square.address, echo=pool.address))
+            for i, actor in enumerate(forwarders):
+                actor.send(i)
+            self.assertEqual(sorted(self._results(pool.inbox, len(forwarders))),
+                             [('forwarded', i) for i in range(len(forwarders))])
+            square.send(len(forwarders))
+
+            # messages from the shards and from the parent wait for the spawn
+            pool.release()
+            self.assertEqual(sorted(self._results(pool.inbox, len(forwarders) + 1)),
+                             [i * i for i in range(len(forwarders) + 1)])
+        finally:
+            pool.stop(timeout=10)
+
+    def test_early_messages_limit(self):
+        ''' test_loop_pool.test_early_messages_limit
+        '''
+        test_name = 'test_loop_pool.test_early_messages_limit'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        pool = LateSpawnPool(late_class=SquareActor, workers=1, logger=logger)
+        pool.max_early_messages = 3
+        pool.start()
+        try:
+            square = pool.spawn(SquareActor, reply_to=pool.address)
+            for i in range(5):
+                square.send(i)
+            # the oldest messages are dropped one by one
+            pool.release()
+            square.send(5)
+            self.assertEqual(self._results(pool.inbox, 4), [4, 9, 16, 25])
+            self.assertRaises(EmptyInboxException, pool.inbox.get, timeout=0.2)
+        finally:
+            pool.stop(timeout=10)
+
+    def test_loop_policy(self):
+        ''' test_loop_pool.test_loop_policy
+        '''
+        test_name = 'test_loop_pool.test_loop_policy'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        self.assertIsNone(loop_policy(False))
+        if uvloop is None:
+            self.assertIsNone(loop_policy())
+            self.assertRaises(RuntimeError, loop_policy, True)
+        else:
+            self.assertIsInstance(loop_policy(), uvloop.EventLoopPolicy)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,168 @@
+import sys
+if '' not in sys.path:
+    sys.path.append('')
+
+import unittest
+
+from pyactors.base import ActorSystem
+from pyactors.logs import file_logger
+from pyactors.generator import GeneratorActor
+from pyactors.pool import ProcessPool, PC_SPAWN, PC_SEND
+from pyactors.exceptions import EmptyInboxException
+
+
+class SquareActor(GeneratorActor):
+    ''' Square Actor, replies with square of received numbers
+    '''
+    def __init__(self, name=None, reply_to=None):
+        super(SquareActor, self).__init__(name=name)
+        self.reply_to = reply_to
+
+    def loop(self):
+        while self.processing:
+            try:
+                value = self.inbox.get()
+            except EmptyInboxException:
+                self.waiting = True
+                yield
+                continue
+            self.pool.send(self.reply_to, value * value)
+            yield
+
+
+class ForwardActor(GeneratorActor):
+    ''' Forward Actor, forwards received messages to target actor and
+    reports them to echo address if it's defined
+    '''
+    def __init__(self, name=None, target=None, echo=None):
+        super(ForwardActor, self).__init__(name=name)
+        self.target = target
+        self.echo = echo
+
+    def loop(self):
+        while self.processing:
+            try:
+                message = self.inbox.get()
+            except EmptyInboxException:
+                self.waiting = True
+                yield
+                continue
+            self.pool.send(self.target, message)
+            if self.echo is not None:
+                self.pool.send(self.echo, ('forwarded', message))
+            yield
+
+
+class LateSpawnPool(ProcessPool):
+    ''' Process pool which holds spawn commands of late_class actors until release()
+    '''
+    def __init__(self, late_class=None, **kwargs):
+        super(LateSpawnPool, self).__init__(**kwargs)
+        self.late_class = late_class
+        self.held = list()
+
+    def _command(self, index, command):
+        if command[0] == PC_SPAWN and command[2] is self.late_class:
+            self.held.append((index, command))
+        else:
+            super(LateSpawnPool, self)._command(index, command)
+
+    def release(self):
+        for index, command in self.held:
+            super(LateSpawnPool, self)._command(index, command)
+        self.held = list()
+
+
+class ProcessPoolTest(unittest.TestCase):
+
+    def _results(self, inbox, count):
+        return [inbox.get(timeout=10) for _ in range(count)]
+
+    def test_spawn_and_send(self):
+        ''' test_process_pool.test_spawn_and_send
+        '''
+        test_name = 'test_process_pool.test_spawn_and_send'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        pool = ProcessPool(workers=2)
+        pool.start()
+        try:
+            actors = [pool.spawn(SquareActor, reply_to=pool.address) for _ in range(10)]
+            for i, actor in enumerate(actors):
+                actor.send(i)
+            self.assertEqual(sorted(self._results(pool.inbox, 10)), [i * i for i in range(10)])
+        finally:
+            pool.stop(timeout=10)
+
+    def test_messages_ahead_of_spawn(self):
+        ''' test_process_pool.test_messages_ahead_of_spawn
+        '''
+        test_name = 'test_process_pool.test_messages_ahead_of_spawn'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        pool = LateSpawnPool(late_class=SquareActor, workers=2, logger=logger)
+        pool.start()
+        try:
+            square = pool.spawn(SquareActor, reply_to=pool.address)
+            # forwarders on both workers, at least one of them is on another worker than square
+            forwarders = list()
+            while len(set(pool.placement(actor.address, pool.size) for actor in forwarders + [square])) < 2:
+                forwarders.append(pool.spawn(ForwardActor, target=square.address, echo=pool.address))
+            for i, actor in enumerate(forwarders):
+                actor.send(i)
+            self.assertEqual(sorted(self._results(pool.inbox, len(forwarders))),
+                             [('forwarded', i) for i in range(len(forwarders))])
+            square.send(len(forwarders))
+
+            # messages from the workers and from the parent wait for the spawn
+            pool.release()
+            self.assertEqual(sorted(self._results(pool.inbox, len(forwarders) + 1)),
+                             [i * i for i in range(len(forwarders) + 1)])
+        finally:
+            pool.stop(timeout=10)
+
+    def test_early_messages_limit(self):
+        ''' test_process_pool.test_early_messages_limit
+        '''
+        test_name = 'test_process_pool.test_early_messages_limit'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        pool = ProcessPool(workers=1, logger=logger)
+        pool._index = 0
+        pool.max_early_messages = 3
+        first, second = 'a' * 32, 'b' * 32
+        for address, message in ((first, 1), (second, 2), (first, 3), (second, 4)):
+            pool._execute((PC_SEND, address, message))
+        # one message per new one, the oldest of the actor waiting longest
+        self.assertEqual([(address, list(messages)) for address, messages in pool._early.items()],
+                         [(first, [3]), (second, [2, 4])])
+        self.assertEqual((pool._early_count, pool.early_dropped), (3, 1))
+        pool._execute((PC_SEND, second, 5))
+        self.assertEqual([(address, list(messages)) for address, messages in pool._early.items()],
+                         [(second, [2, 4, 5])])
+        self.assertEqual((pool._early_count, pool.early_dropped), (3, 2))
+
+        pool._execute((PC_SPAWN, second, ForwardActor, (), dict(target=pool.address)))
+        while not pool._step():
+            pass
+        self.assertEqual((pool._early_count, pool.inbox.get_many(3, timeout=5)), (0, [2, 4, 5]))
+        pool._hosted[second].stop()
+        pool._step()
+
+    def test_cross_worker_messages(self):
+        ''' test_process_pool.test_cross_worker_messages
+        '''
+        test_name = 'test_process_pool.test_cross_worker_messages'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        system = ActorSystem()
+        pool = system.start_pool(workers=3)
+        try:
+            square = system.spawn(SquareActor, reply_to=pool.address)
+            forwarders = [system.spawn(ForwardActor, target=square.address) for _ in range(6)]
+            for i, actor in enumerate(forwarders):
+                actor.send(i)
+            self.assertEqual(sorted(self._results(pool.inbox, 6)), [i * i for i in range(6)])
+        finally:
+            system.stop()
+        self.assertIsNone(system.pool)
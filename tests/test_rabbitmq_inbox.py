@@ -0,0 +1,232 @@
+import sys
+if '' not in sys.path:
+    sys.path.append('')
+
+import collections
+import unittest
+
+from pika.exceptions import NackError
+
+from pyactors.logs import file_logger
+from pyactors.inbox import OF_BLOCK, OF_DROP_HEAD, OF_DROP_TAIL, OF_RAISE, OF_SPILL
+from pyactors.inbox.rabbitmq import RabbitMQInbox
+from pyactors.exceptions import EmptyInboxException, FullInboxException
+
+
+class Method(object):
+    ''' Method frame of delivery
+    '''
+    def __init__(self, delivery_tag=None, message_count=0):
+        self.delivery_tag = delivery_tag
+        self.message_count = message_count
+
+
+class DeclareResult(object):
+    ''' Result of queue_declare
+    '''
+    def __init__(self, message_count):
+        self.method = Method(message_count=message_count)
+
+
+class FakeBroker(object):
+    ''' In-process AMQP stand-in, one channel per connection
+    '''
+    def __init__(self):
+        self.queues = collections.defaultdict(collections.deque)
+        self.arguments = dict()
+        self.calls = collections.Counter()
+        self.acks = list()
+        self.connections = list()
+
+    def connect(self, **params):
+        connection = FakeConnection(self)
+        self.connections.append(connection)
+        return connection
+
+
+class FakeConnection(object):
+
+    def __init__(self, broker):
+        self.broker = broker
+        self._channel = FakeChannel(broker)
+        self.closed = False
+
+    def channel(self):
+        return self._channel
+
+    def process_data_events(self, time_limit=0):
+        self._channel.push()
+
+    def close(self):
+        self.closed = True
+
+
+class FakeChannel(object):
+
+    def __init__(self, broker):
+        self.broker = broker
+        self.prefetch_count = 0
+        self.consumers = dict()
+        self.unacked = collections.OrderedDict()
+        self.next_tag = 1
+        self.confirms = False
+
+    def _call(self, name):
+        self.broker.calls[name] += 1
+
+    def confirm_delivery(self):
+        self.confirms = True
+
+    def queue_declare(self, queue, passive=False, arguments=None):
+        self._call('queue_declare')
+        if not passive:
+            self.broker.arguments[queue] = arguments or dict()
+        return DeclareResult(len(self.broker.queues[queue]))
+
+    def basic_publish(self, exchange, routing_key, body, properties=None):
+        self._call('basic_publish')
+        messages = self.broker.queues[routing_key]
+        arguments = self.broker.arguments.get(routing_key, dict())
+        if 'x-max-length' in arguments and len(messages) >= arguments['x-max-length']:
+            if arguments['x-overflow'] == 'drop-head':
+                messages.popleft()
+            elif self.confirms:
+                raise NackError([body])
+            else:
+                return
+        messages.append(body)
+
+    def basic_get(self, queue):
+        self._call('basic_get')
+        if not self.broker.queues[queue]:
+            return None, None, None
+        body = self.broker.queues[queue].popleft()
+        return self._deliver(body), None, body
+
+    def basic_qos(self, prefetch_count=0):
+        self.prefetch_count = prefetch_count
+
+    def basic_consume(self, queue, on_message_callback):
+        tag = 'ctag-{}'.format(len(self.consumers))
+        self.consumers[tag] = (queue, on_message_callback)
+        return tag
+
+    def basic_cancel(self, consumer_tag):
+        self.consumers.pop(consumer_tag)
+
+    def basic_ack(self, delivery_tag, multiple=False):
+        self._call('basic_ack')
+        self.broker.acks.append((delivery_tag, multiple))
+        for tag in list(self.unacked):
+            if tag == delivery_tag or (multiple and tag < delivery_tag):
+                self.unacked.pop(tag)
+
+    def _deliver(self, body):
+        method = Method(delivery_tag=self.next_tag)
+        self.unacked[self.next_tag] = body
+        self.next_tag += 1
+        return method
+
+    def push(self):
+        ''' push deliveries to consumers while prefetch window is open
+        '''
+        for queue, callback in self.consumers.values():
+            messages = self.broker.queues[queue]
+            while messages and (not self.prefetch_count or len(self.unacked) < self.prefetch_count):
+                body = messages.popleft()
+                callback(self, self._deliver(body), None, body)
+
+
+class RabbitMQInboxTest(unittest.TestCase):
+
+    def _inbox(self, broker, **kwargs):
+        return RabbitMQInbox(get_queue='actor', put_queue='actor', host='localhost',
+                             connection_factory=broker.connect, **kwargs)
+
+    def test_queue_is_declared_once(self):
+        ''' test_rabbitmq_inbox.test_queue_is_declared_once
+        '''
+        test_name = 'test_rabbitmq_inbox.test_queue_is_declared_once'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        broker = FakeBroker()
+        inbox = self._inbox(broker)
+        for i in range(10):
+            inbox.put(dict(value=i))
+        self.assertEqual([inbox.get()['value'] for _ in range(10)], list(range(10)))
+        self.assertRaises(EmptyInboxException, inbox.get)
+        self.assertEqual(broker.calls['queue_declare'], 1)
+        self.assertEqual(broker.calls['basic_publish'], 10)
+
+    def test_consume_with_prefetch_and_batched_acks(self):
+        ''' test_rabbitmq_inbox.test_consume_with_prefetch_and_batched_acks
+        '''
+        test_name = 'test_rabbitmq_inbox.test_consume_with_prefetch_and_batched_acks'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        broker = FakeBroker()
+        inbox = self._inbox(broker, consume=True, prefetch_count=10, ack_batch=5)
+        inbox.put_many(dict(value=i) for i in range(25))
+
+        values = list()
+        while True:
+            try:
+                values.extend(message['value'] for message in inbox.get_many(3, timeout=0))
+            except EmptyInboxException:
+                break
+        self.assertEqual(values, list(range(25)))
+        self.assertEqual(broker.calls['basic_get'], 0)
+        # every ack confirms the batch of deliveries before it
+        self.assertTrue(all(multiple for _, multiple in broker.acks))
+        self.assertLess(len(broker.acks), 25)
+
+        channel = broker.connections[0].channel()
+        self.assertEqual(len(channel.unacked), 0)
+        self.assertEqual(broker.calls['queue_declare'], 1)
+
+        inbox.close()
+        self.assertTrue(broker.connections[0].closed)
+        self.assertEqual(channel.consumers, dict())
+
+    def test_bounded_queue(self):
+        ''' test_rabbitmq_inbox.test_bounded_queue
+        '''
+        test_name = 'test_rabbitmq_inbox.test_bounded_queue'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        for overflow in (OF_BLOCK, OF_SPILL):
+            self.assertRaises(RuntimeError, self._inbox, FakeBroker(), maxsize=2, overflow=overflow)
+
+        broker = FakeBroker()
+        inbox = self._inbox(broker, maxsize=3, overflow=OF_DROP_HEAD)
+        inbox.put_many(dict(value=i) for i in range(5))
+        self.assertEqual(broker.arguments['actor'], {'x-max-length': 3, 'x-overflow': 'drop-head'})
+        self.assertFalse(broker.connections[0].channel().confirms)
+        self.assertEqual([message['value'] for message in inbox.get_many(10)], [2, 3, 4])
+
+        broker = FakeBroker()
+        inbox = self._inbox(broker, maxsize=3, overflow=OF_DROP_TAIL)
+        inbox.put_many(dict(value=i) for i in range(5))
+        inbox.put(dict(value=5))
+        self.assertEqual(broker.arguments['actor'], {'x-max-length': 3, 'x-overflow': 'reject-publish'})
+        self.assertEqual(inbox.metrics(), dict(depth=3, dropped=3, blocked=0))
+        self.assertEqual([message['value'] for message in inbox.get_many(10)], [0, 1, 2])
+
+        broker = FakeBroker()
+        inbox = self._inbox(broker, maxsize=2, overflow=OF_RAISE)
+        inbox.put_many(dict(value=i) for i in range(2))
+        self.assertRaises(FullInboxException, inbox.put, dict(value=2))
+        self.assertRaises(FullInboxException, inbox.put_many, [dict(value=3)])
+        self.assertEqual(inbox.metrics(), dict(depth=2, dropped=0, blocked=0))
+        self.assertEqual([message['value'] for message in inbox.get_many(10)], [0, 1])
+
+        # unbounded queues are declared without arguments
+        broker = FakeBroker()
+        inbox = self._inbox(broker)
+        inbox.put(dict(value=0))
+        self.assertEqual(broker.arguments['actor'], dict())
+        self.assertFalse(broker.connections[0].channel().confirms)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,313 @@
+import sys
+if '' not in sys.path:
+    sys.path.append('')
+
+import time
+import collections
+import unittest
+
+from redis.exceptions import ConnectionError, ResponseError
+
+from pyactors.logs import file_logger
+from pyactors.inbox import OF_BLOCK, OF_DROP_HEAD, OF_DROP_TAIL, OF_RAISE, OF_SPILL
+from pyactors.inbox.redismq import RedisInbox, BOUNDED_PUSH
+from pyactors.exceptions import EmptyInboxException, FullInboxException
+
+
+class FakePool(object):
+    ''' Connection pool of FakeRedis
+    '''
+    def __init__(self):
+        self.disconnected = False
+
+    def disconnect(self):
+        self.disconnected = True
+
+
+class FakeRedis(object):
+    ''' In-process Redis stand-in, lists and the calls made to them
+    '''
+    def __init__(self, lmpop=True):
+        self.lists = collections.defaultdict(collections.deque)
+        self.calls = collections.Counter()
+        self.published = list()
+        self.timeouts = list()
+        self.clients = list()
+        self.lmpop_supported = lmpop
+        self.lmpop_error = None
+        self.fail_writes = 0
+
+    def connect(self, **params):
+        ''' client factory, every client shares the lists
+        '''
+        client = FakeClient(self)
+        self.clients.append(client)
+        return client
+
+
+class FakeClient(object):
+
+    def __init__(self, server):
+        self.server = server
+        self.connection_pool = FakePool()
+
+    def pipeline(self, transaction=True):
+        self.server.calls['pipeline'] += 1
+        return FakePipeline(self)
+
+    def lpush(self, queue, *values):
+        self.server.calls['lpush'] += 1
+        for value in values:
+            # redis returns bytes whatever was written
+            self.server.lists[queue].appendleft(value.encode('utf-8') if isinstance(value, str) else value)
+        return len(self.server.lists[queue])
+
+    def publish(self, channel, message):
+        self.server.calls['publish'] += 1
+        self.server.published.append((channel, message))
+        return 0
+
+    def rpop(self, queue):
+        self.server.calls['rpop'] += 1
+        items = self.server.lists[queue]
+        return items.pop() if items else None
+
+    def brpop(self, queue, timeout):
+        self.server.calls['brpop'] += 1
+        self.server.timeouts.append(timeout)
+        items = self.server.lists[queue]
+        return (queue, items.pop()) if items else None
+
+    def lmpop(self, num_keys, queue, direction=None, count=1):
+        if not self.server.lmpop_supported:
+            raise ResponseError("unknown command 'LMPOP'")
+        if self.server.lmpop_error:
+            error, self.server.lmpop_error = self.server.lmpop_error, None
+            raise ResponseError(error)
+        self.server.calls['lmpop'] += 1
+        items = self.server.lists[queue]
+        out = [items.pop() for _ in range(min(count, len(items)))]
+        return [queue, out] if out else None
+
+    def llen(self, queue):
+        return len(self.server.lists[queue])
+
+    def eval(self, script, num_keys, queue, maxsize, drop_head, *values):
+        ''' runs BOUNDED_PUSH only, in Python
+        '''
+        assert script == BOUNDED_PUSH
+        self.server.calls['eval'] += 1
+        items = self.server.lists[queue]
+        room = maxsize - len(items)
+        if drop_head:
+            self.lpush(queue, *values)
+            while len(items) > maxsize:
+                items.pop()
+            return max(len(values) - room, 0)
+        pushed = max(min(len(values), room), 0)
+        if pushed:
+            self.lpush(queue, *values[:pushed])
+        return len(values) - pushed
+
+
+class FakePipeline(object):
+
+    def __init__(self, client):
+        self.client = client
+        self.commands = list()
+
+    def __getattr__(self, name):
+        def command(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+            return self
+        return command
+
+    def execute(self):
+        server = self.client.server
+        if server.fail_writes and any(name in ('lpush', 'eval') for name, _, _ in self.commands):
+            server.fail_writes -= 1
+            raise ConnectionError('Connection refused')
+        return [getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in self.commands]
+
+
+class RedisInboxTest(unittest.TestCase):
+
+    def _inbox(self, server, **kwargs):
+        return RedisInbox(get_queue='actor', put_queue='actor', host='localhost',
+                          client_factory=server.connect, **kwargs)
+
+    def test_put_and_get(self):
+        ''' test_redis_inbox.test_put_and_get
+        '''
+        test_name = 'test_redis_inbox.test_put_and_get'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        server = FakeRedis()
+        inbox = self._inbox(server)
+        for i in range(3):
+            inbox.put(dict(value=i))
+        self.assertEqual(len(server.lists['actor']), 3)
+        self.assertEqual(server.published, [('default', 'actor')] * 3)
+        self.assertEqual([inbox.get()['value'] for _ in range(3)], [0, 1, 2])
+        self.assertRaises(EmptyInboxException, inbox.get)
+
+        # the client and its pool belong to the inbox
+        other = self._inbox(server)
+        other.put(dict(value=3))
+        self.assertEqual(len(server.clients), 2)
+        inbox.close()
+        self.assertTrue(server.clients[0].connection_pool.disconnected)
+        self.assertFalse(server.clients[1].connection_pool.disconnected)
+
+    def test_batched_writes(self):
+        ''' test_redis_inbox.test_batched_writes
+        '''
+        test_name = 'test_redis_inbox.test_batched_writes'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        server = FakeRedis()
+        inbox = self._inbox(server, batch_size=5, flush_interval=0.05)
+        for i in range(4):
+            inbox.put(dict(value=i))
+        self.assertEqual(len(server.lists['actor']), 0)
+        # the fifth message flushes the batch by one pipeline and one PUBLISH
+        inbox.put(dict(value=4))
+        self.assertEqual(len(server.lists['actor']), 5)
+        self.assertEqual((server.calls['pipeline'], server.calls['publish']), (1, 1))
+
+        # the timer flushes messages below batch_size
+        inbox.put(dict(value=5))
+        deadline = time.time() + 5
+        while len(server.lists['actor']) < 6 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(len(server.lists['actor']), 6)
+        self.assertEqual([message['value'] for message in inbox.get_many(10)], list(range(6)))
+
+    def test_failed_timer_flush(self):
+        ''' test_redis_inbox.test_failed_timer_flush
+        '''
+        test_name = 'test_redis_inbox.test_failed_timer_flush'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        server = FakeRedis()
+        inbox = self._inbox(server, batch_size=10, flush_interval=0.01)
+        server.fail_writes = 1
+        inbox.put(dict(value=0))
+        deadline = time.time() + 5
+        while server.fail_writes and time.time() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.05)
+        self.assertEqual(server.fail_writes, 0)
+        self.assertEqual(len(server.lists['actor']), 0)
+
+        # the failed batch is kept and goes ahead of the next messages
+        inbox.put(dict(value=1))
+        inbox.flush()
+        self.assertEqual([message['value'] for message in inbox.get_many(10)], [0, 1])
+
+        # flush() called by the writer raises, the batch is kept too
+        server.fail_writes = 1
+        self.assertRaises(ConnectionError, inbox.put_many, [dict(value=2)])
+        inbox.put_many([dict(value=3)])
+        self.assertEqual([message['value'] for message in inbox.get_many(10)], [2, 3])
+
+    def test_get_many(self):
+        ''' test_redis_inbox.test_get_many
+        '''
+        test_name = 'test_redis_inbox.test_get_many'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        for lmpop in (True, False):
+            server = FakeRedis(lmpop=lmpop)
+            inbox = self._inbox(server)
+            inbox.put_many(dict(value=i) for i in range(5))
+            self.assertEqual([message['value'] for message in inbox.get_many(3)], [0, 1, 2])
+            self.assertEqual([message['value'] for message in inbox.get_many(3)], [3, 4])
+            self.assertRaises(EmptyInboxException, inbox.get_many, 3)
+            if lmpop:
+                self.assertEqual(server.calls['rpop'], 0)
+            else:
+                # pipelined RPOP after the first LMPOP failed
+                self.assertEqual((server.calls['lmpop'], server.calls['rpop']), (0, 9))
+
+    def test_lmpop_errors(self):
+        ''' test_redis_inbox.test_lmpop_errors
+        '''
+        test_name = 'test_redis_inbox.test_lmpop_errors'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        server = FakeRedis()
+        inbox = self._inbox(server)
+        inbox.put_many(dict(value=i) for i in range(3))
+        # errors other than unknown command are raised, LMPOP is used further
+        server.lmpop_error = 'WRONGTYPE Operation against a key holding the wrong kind of value'
+        self.assertRaises(ResponseError, inbox.get_many, 3)
+        self.assertEqual([message['value'] for message in inbox.get_many(3)], [0, 1, 2])
+        self.assertEqual((server.calls['lmpop'], server.calls['rpop']), (1, 0))
+
+    def test_broken_messages_are_skipped(self):
+        ''' test_redis_inbox.test_broken_messages_are_skipped
+        '''
+        test_name = 'test_redis_inbox.test_broken_messages_are_skipped'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        server = FakeRedis()
+        inbox = self._inbox(server)
+        inbox.put(dict(value=0))
+        server.lists['actor'].appendleft(b'{broken')
+        inbox.put(dict(value=1))
+        self.assertEqual(inbox.get(), dict(value=0))
+        self.assertRaises(EmptyInboxException, inbox.get)
+        self.assertEqual([message['value'] for message in inbox.get_many(10)], [1])
+
+    def test_bounded_lists(self):
+        ''' test_redis_inbox.test_bounded_lists
+        '''
+        test_name = 'test_redis_inbox.test_bounded_lists'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        for overflow in (OF_BLOCK, OF_SPILL):
+            self.assertRaises(RuntimeError, self._inbox, FakeRedis(), maxsize=2, overflow=overflow)
+
+        server = FakeRedis()
+        inbox = self._inbox(server, maxsize=3, overflow=OF_DROP_HEAD)
+        inbox.put_many(dict(value=i) for i in range(5))
+        self.assertEqual(inbox.metrics(), dict(depth=3, dropped=2, blocked=0))
+        self.assertEqual([message['value'] for message in inbox.get_many(10)], [2, 3, 4])
+
+        server = FakeRedis()
+        inbox = self._inbox(server, maxsize=3, overflow=OF_DROP_TAIL)
+        inbox.put_many(dict(value=i) for i in range(5))
+        inbox.put(dict(value=5))
+        self.assertEqual(inbox.metrics(), dict(depth=3, dropped=3, blocked=0))
+        self.assertEqual([message['value'] for message in inbox.get_many(10)], [0, 1, 2])
+
+        # the batch is checked when it's flushed
+        server = FakeRedis()
+        inbox = self._inbox(server, maxsize=2, overflow=OF_RAISE, batch_size=3)
+        inbox.put(dict(value=0))
+        inbox.put(dict(value=1))
+        self.assertRaises(FullInboxException, inbox.put, dict(value=2))
+        self.assertEqual(inbox.metrics(), dict(depth=2, dropped=0, blocked=0))
+        self.assertEqual([message['value'] for message in inbox.get_many(10)], [0, 1])
+        self.assertEqual(server.calls['eval'], 1)
+
+    def test_get_timeout(self):
+        ''' test_redis_inbox.test_get_timeout
+        '''
+        test_name = 'test_redis_inbox.test_get_timeout'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        server = FakeRedis()
+        inbox = self._inbox(server)
+        # sub-second timeouts don't block, longer ones are rounded up to seconds
+        self.assertRaises(EmptyInboxException, inbox.get, timeout=0.01)
+        self.assertRaises(EmptyInboxException, inbox.get_many, 3, timeout=0)
+        self.assertEqual(server.calls['brpop'], 0)
+        self.assertRaises(EmptyInboxException, inbox.get, timeout=1.5)
+        self.assertRaises(EmptyInboxException, inbox.get_many, 3, timeout=1)
+        self.assertEqual(server.timeouts, [2, 1])
+
+
+if __name__ == '__main__':
+    unittest.main()
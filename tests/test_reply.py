@@ -0,0 +1,138 @@
+import sys
+if '' not in sys.path:
+    sys.path.append('')
+
+import asyncio
+import unittest
+
+from pyactors.logs import file_logger
+from pyactors.generator import GeneratorActor, ForkedGeneratorActor, BaseGeneratorActor
+from pyactors.thread import ThreadedGeneratorActor
+from pyactors.exceptions import EmptyInboxException, ReplyError
+from pyactors.reply import reply_channel
+
+
+def doubler(actor):
+    ''' replies to asked values with doubled ones, until None is asked
+    '''
+    while actor.processing:
+        try:
+            envelope = actor.inbox.get()
+        except EmptyInboxException:
+            actor.waiting = True
+            yield
+            continue
+        if envelope.payload is None:
+            break
+        actor.reply(envelope.payload * 2, envelope)
+        yield
+    actor.stop()
+
+
+class Doubler(GeneratorActor):
+    ''' Doubler
+    '''
+    def loop(self):
+        return doubler(self)
+
+
+class ThreadedDoubler(ThreadedGeneratorActor):
+    ''' ThreadedDoubler
+    '''
+    def loop(self):
+        return doubler(self)
+
+
+class ForkedDoubler(ForkedGeneratorActor):
+    ''' ForkedDoubler
+    '''
+    def loop(self):
+        return doubler(self)
+
+
+class Checker(BaseGeneratorActor):
+    ''' Checker, replies to positive values and fails negative ones
+    '''
+    def process(self):
+        if self.message['value'] < 0:
+            self.error(u'negative value')
+        else:
+            self.reply(True)
+
+
+class ReplyTest(unittest.TestCase):
+
+    def test_generator_ask(self):
+        ''' test_reply.test_generator_ask
+        '''
+        test_name = 'test_reply.test_generator_ask'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        actor = Doubler()
+        futures = [actor.ask(value) for value in range(3)]
+        actor.start()
+        # generator actors must not block, the futures are checked after run
+        while actor.run_once() and not all(future.done() for future in futures):
+            pass
+        self.assertEqual([future.result(0) for future in futures], [0, 2, 4])
+        self.assertTrue(all(not reply_channel.pending(future.cid) for future in futures))
+
+    def test_base_actor_reply(self):
+        ''' test_reply.test_base_actor_reply
+        '''
+        test_name = 'test_reply.test_base_actor_reply'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        actor = Checker()
+        positive = actor.ask(dict(value=1))
+        actor.start()
+        self.assertTrue(positive.result(0))
+
+        actor = Checker()
+        negative = actor.ask(dict(value=-1))
+        actor.start()
+        self.assertRaises(ReplyError, negative.result, 0)
+
+    def test_ask_timeout(self):
+        ''' test_reply.test_ask_timeout
+        '''
+        test_name = 'test_reply.test_ask_timeout'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        future = Doubler().ask(1, timeout=0.05)
+        self.assertRaises(ReplyError, future.result, 5)
+        self.assertFalse(reply_channel.pending(future.cid))
+
+    def test_threaded_ask(self):
+        ''' test_reply.test_threaded_ask
+        '''
+        test_name = 'test_reply.test_threaded_ask'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        actor = ThreadedDoubler()
+        actor.start()
+        self.assertEqual(actor.ask(5, timeout=5).result(5), 10)
+
+        async def ask():
+            return await actor.ask(6, timeout=5)
+        self.assertEqual(asyncio.run(ask()), 12)
+
+        actor.send(None)
+        self.assertTrue(actor.join(5))
+
+    def test_forked_ask(self):
+        ''' test_reply.test_forked_ask
+        '''
+        test_name = 'test_reply.test_forked_ask'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        actor = ForkedDoubler()
+        actor.start()
+        futures = [actor.ask(value, timeout=10) for value in range(5)]
+        self.assertEqual([future.result(10) for future in futures], [0, 2, 4, 6, 8])
+        actor.send(None)
+        self.assertTrue(actor.join(10))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,288 @@
+import sys
+if '' not in sys.path:
+    sys.path.append('')
+
+import time
+import unittest
+
+from pyactors.base import ActorSystem
+from pyactors.logs import file_logger
+from pyactors.generator import BaseGeneratorActor
+from pyactors.thread import ThreadedGeneratorActor
+from pyactors.exceptions import EmptyInboxException
+from pyactors.generator import GeneratorActor
+from pyactors.routers import Resizer, RoundRobinRouter, RandomRouter, SmallestMailboxRouter, ConsistentHashRouter
+
+
+class Collector(BaseGeneratorActor):
+    ''' Collector, the last step of pipeline
+    '''
+    def __init__(self, **kwargs):
+        super(Collector, self).__init__(**kwargs)
+        self.results = list()
+
+    def process(self):
+        self.results.append(self.message)
+
+
+class Worker(BaseGeneratorActor):
+    ''' Worker, marks messages by its name
+    '''
+    def process(self):
+        self.send(worker=self.name)
+
+
+class WorkRouter(RoundRobinRouter):
+    ''' WorkRouter, the routed stage of pipeline
+    '''
+    pass
+
+
+class Head(BaseGeneratorActor):
+    ''' Head, the first step of pipeline
+    '''
+    steps = [WorkRouter, Collector]
+
+    def process(self):
+        self.send()
+
+
+class Counter(ThreadedGeneratorActor):
+    ''' Counter, threaded routee counting its messages
+    '''
+    def __init__(self, name=None):
+        super(Counter, self).__init__(name=name)
+        self.count = 0
+
+    def loop(self):
+        while self.processing:
+            try:
+                self.inbox.get()
+                self.count += 1
+            except EmptyInboxException:
+                self.waiting = True
+            yield
+
+
+class Idle(GeneratorActor):
+    ''' Idle, routee which keeps its messages
+    '''
+    def loop(self):
+        while self.processing:
+            self.waiting = True
+            yield
+
+
+class Sink(GeneratorActor):
+    ''' Sink, routee which takes its messages
+    '''
+    def __init__(self, name=None):
+        super(Sink, self).__init__(name=name)
+        self.count = 0
+
+    def loop(self):
+        while self.processing:
+            try:
+                self.inbox.get()
+                self.count += 1
+            except EmptyInboxException:
+                self.waiting = True
+            yield
+
+
+def drain(inbox):
+    ''' take all messages of inbox
+    '''
+    return inbox.get_many(len(inbox)) if len(inbox) else []
+
+
+class RoutersTest(unittest.TestCase):
+
+    def test_pipeline_step(self):
+        ''' test_routers.test_pipeline_step
+        '''
+        test_name = 'test_routers.test_pipeline_step'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        system = ActorSystem()
+        head, router, collector = Head(), WorkRouter(), Collector()
+        for i in range(3):
+            router.add_child(Worker(name='worker-%d' % i))
+        for actor in (head, router, collector):
+            system.add_child(actor)
+
+        for value in range(6):
+            head.inbox.put(dict(value=value))
+        head.start()
+
+        # every message is processed once, by the workers in turn
+        self.assertEqual([message['value'] for message in collector.results], list(range(6)))
+        self.assertEqual([message['worker'] for message in collector.results],
+                         ['worker-0', 'worker-1', 'worker-2'] * 2)
+
+    def test_smallest_mailbox(self):
+        ''' test_routers.test_smallest_mailbox
+        '''
+        test_name = 'test_routers.test_smallest_mailbox'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        routees = [Counter() for _ in range(3)]
+        router = SmallestMailboxRouter(routees=routees)
+        routees[0].inbox.put_many(range(2))
+        routees[1].inbox.put(0)
+        self.assertIs(router.select('message', routees), routees[2])
+        routees[2].inbox.put_many(range(3))
+        self.assertIs(router.select('message', routees), routees[1])
+
+    def test_consistent_hash(self):
+        ''' test_routers.test_consistent_hash
+        '''
+        test_name = 'test_routers.test_consistent_hash'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        routees = [Counter() for _ in range(4)]
+        router = ConsistentHashRouter(routees=routees, hash_key='user')
+        messages = [dict(user='user-%d' % (i % 20), value=i) for i in range(200)]
+        owners = dict()
+        for message in messages:
+            owners.setdefault(message['user'], set()).add(router.select(message, routees))
+        self.assertTrue(all(len(owner) == 1 for owner in owners.values()))
+        self.assertGreater(len(set().union(*owners.values())), 1)
+
+        # removed routee moves only its own keys
+        removed = routees[0]
+        router.remove_child(removed.address)
+        for user, owner in owners.items():
+            routee = router.select(dict(user=user), router.children)
+            if removed not in owner:
+                self.assertEqual(set([routee]), owner)
+
+    def test_threaded_routees(self):
+        ''' test_routers.test_threaded_routees
+        '''
+        test_name = 'test_routers.test_threaded_routees'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        routees = [Counter() for _ in range(4)]
+        router = RandomRouter(routees=routees)
+        for value in range(100):
+            router.inbox.put(value)
+        router.start()
+        self.assertEqual(len(router.inbox), 0)
+        deadline = time.time() + 5
+        while sum(routee.count for routee in routees) < 100 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(sum(routee.count for routee in routees), 100)
+        self.assertGreater(len([routee for routee in routees if routee.count]), 1)
+        router.stop()
+        self.assertTrue(all(routee.join(5) for routee in routees))
+
+
+    def test_router_steps_routees(self):
+        ''' test_routers.test_router_steps_routees
+        '''
+        test_name = 'test_routers.test_router_steps_routees'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        routees = [Sink() for _ in range(3)]
+        router = RoundRobinRouter(routees=routees)
+        router.inbox.put_many(range(9))
+        router.start()
+        for _ in range(10):
+            router.run_once()
+        self.assertEqual([routee.count for routee in routees], [3, 3, 3])
+        router.stop()
+
+    def test_resizer(self):
+        ''' test_routers.test_resizer
+        '''
+        test_name = 'test_routers.test_resizer'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        resizer = Resizer(Idle, lower=2, upper=4, grow_depth=10, shrink_depth=1,
+                          interval=1, cooldown=10, checks=2)
+        router = RoundRobinRouter(resizer=resizer)
+
+        # the pool is moved into the bounds at once
+        self.assertEqual(resizer.resize(router, now=0), 2)
+        self.assertEqual(len(router.children), 2)
+
+        # grows after `checks` samples in a row, not sooner than `cooldown`
+        router.inbox.put_many(range(100))
+        router.resizer = None
+        router.route()
+        self.assertEqual([resizer.resize(router, now=now) for now in (0.5, 1, 2, 3, 11, 12, 13)],
+                         [0, 0, 0, 0, 1, 0, 0])
+        self.assertEqual(len(router.children), 3)
+        self.assertEqual([resizer.resize(router, now=now) for now in (21, 22, 31, 32, 41, 42)],
+                         [1, 0, 0, 0, 0, 0])
+        self.assertEqual(len(router.children), 4)
+
+        # alternating load doesn't flap the pool
+        busy = router.children[0]
+        queued = drain(busy.inbox)
+        for routee in router.children[1:]:
+            drain(routee.inbox)
+        for now in range(50, 60):
+            if now % 2:
+                busy.inbox.put_many(queued * 2)
+            else:
+                drain(busy.inbox)
+            self.assertEqual(resizer.resize(router, now=now), 0)
+
+        # shrinks by retiring idle routees down to the lower bound
+        drain(busy.inbox)
+        routees = router.children
+        self.assertEqual([resizer.resize(router, now=now) for now in (60, 61, 71, 72, 82, 83)],
+                         [0, -1, 0, -1, 0, 0])
+        self.assertEqual(len(router.children), 2)
+        retired = [routee for routee in routees if routee not in router.children]
+        self.assertTrue(all(routee.parent is None and not routee.processing for routee in retired))
+
+    def test_idle_router_shrinks(self):
+        ''' test_routers.test_idle_router_shrinks
+        '''
+        test_name = 'test_routers.test_idle_router_shrinks'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        resizer = Resizer(Sink, lower=1, upper=3, interval=0.01, cooldown=0.05, checks=2)
+        router = RoundRobinRouter(routees=[Sink() for _ in range(3)], resizer=resizer)
+        parent = GeneratorActor()
+        parent.add_child(router)
+        router.inbox.put_many(range(30))
+        parent.start()
+
+        # no messages come after the first ones, the supervisor keeps stepping the router
+        deadline = time.time() + 5
+        while len(router.children) > 1 and time.time() < deadline:
+            parent.run_once()
+            time.sleep(0.001)
+        self.assertEqual(router.forwarded, 30)
+        self.assertEqual(len(router.children), 1)
+
+        # the router is parked at the lower bound
+        parent.run_once()
+        parent.run_once()
+        self.assertTrue(router.waiting)
+        parent.stop()
+
+    def test_resizer_latency(self):
+        ''' test_routers.test_resizer_latency
+        '''
+        test_name = 'test_routers.test_resizer_latency'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        resizer = Resizer(Idle, lower=1, upper=3, grow_depth=1000, max_latency=2.0,
+                          interval=0, cooldown=0, checks=1)
+        router = RoundRobinRouter(routees=[Idle()])
+        router.inbox.put_many(range(20))
+        router.route()
+        resizer.resize(router, now=0)
+        # 2 of 20 messages are processed in a second, the rest needs 9 seconds
+        router.children[0].inbox.get_many(2)
+        self.assertEqual(resizer.pressure(router, now=1), (18.0, 9.0))
+        self.assertEqual(resizer.resize(router, now=2), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
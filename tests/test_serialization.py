@@ -0,0 +1,137 @@
+import sys
+if '' not in sys.path:
+    sys.path.append('')
+
+import shutil
+import tempfile
+import unittest
+
+from pyactors.base import ActorSystem
+from pyactors.logs import file_logger
+from pyactors.routing import route_table
+from pyactors.messages import Envelope, MessageView
+from pyactors.inbox import ProcessInbox
+from pyactors.inbox.mmapq import MmapInbox
+from pyactors.inbox.redismq import RedisInbox
+from pyactors.inbox.rabbitmq import RabbitMQInbox
+from pyactors.serialization import codecs, get_codec, register_codec, Codec
+
+from tests.test_base_actors import Head, Increment, Collector
+from tests.test_redis_inbox import FakeRedis
+from tests.test_rabbitmq_inbox import FakeBroker
+
+
+class SerializationTest(unittest.TestCase):
+
+    def test_codecs(self):
+        ''' test_serialization.test_codecs
+        '''
+        test_name = 'test_serialization.test_codecs'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        message = dict(route=1, hop=2, value=u'message', values=[1, 2.5, None])
+        for name in codecs():
+            codec = get_codec(name)
+            data = codec.dumps(message)
+            self.assertIsInstance(data, bytes)
+            self.assertEqual(codec.loads(data), message)
+            # payload of BaseActor messages is encoded as plain dict by every codec
+            view = MessageView(dict(value=u'view'), message)
+            self.assertEqual(codec.loads(codec.dumps(view)), dict(message, value=u'view'))
+
+        self.assertEqual(get_codec().name, 'json')
+
+        self.assertIsInstance(get_codec(), Codec)
+        self.assertIs(get_codec(get_codec('pickle')), get_codec('pickle'))
+        self.assertRaises(KeyError, get_codec, 'unknown')
+
+    def test_register_codec(self):
+        ''' test_serialization.test_register_codec
+        '''
+        test_name = 'test_serialization.test_register_codec'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        register_codec('repr', lambda message: repr(message).encode('utf-8'),
+                       lambda data: eval(data.decode('utf-8')))
+        self.assertIn('repr', codecs())
+
+        inbox = ProcessInbox(codec='repr')
+        inbox.put(dict(value=1))
+        inbox.put_many([(1, 2), 'message'])
+        self.assertEqual(inbox.get_many(3, timeout=5), [dict(value=1), (1, 2), 'message'])
+
+    def test_mmap_inbox_codec(self):
+        ''' test_serialization.test_mmap_inbox_codec
+        '''
+        test_name = 'test_serialization.test_mmap_inbox_codec'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        path = tempfile.mkdtemp()
+        try:
+            inbox = MmapInbox(path, codec='pickle')
+            inbox.put(dict(value=(1, 2), data=b'bytes'))
+            self.assertEqual(inbox.get(), dict(value=(1, 2), data=b'bytes'))
+            inbox.close()
+        finally:
+            shutil.rmtree(path)
+
+
+    def test_envelope_codecs(self):
+        ''' test_serialization.test_envelope_codecs
+        '''
+        test_name = 'test_serialization.test_envelope_codecs'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        route_id = route_table.compile([Head, Increment, Collector])
+        envelope = Envelope(MessageView(dict(value=2), dict(value=1, mid='m')), sender='a', target='b',
+                            route=route_id, hop=1, cid='c')
+        path = tempfile.mkdtemp()
+        try:
+            for name in codecs():
+                if name == 'repr':
+                    continue
+                inboxes = [MmapInbox(path, codec=name),
+                           RedisInbox(get_queue='actor', put_queue='actor', host='localhost',
+                                      client_factory=FakeRedis().connect, codec=name),
+                           RabbitMQInbox(get_queue='actor', put_queue='actor', host='localhost',
+                                         connection_factory=FakeBroker().connect, codec=name)]
+                for inbox in inboxes:
+                    inbox.put(envelope)
+                    copy = inbox.get()
+                    self.assertEqual(dict(copy.payload), dict(value=2, mid='m'))
+                    self.assertEqual((copy.sender, copy.target, copy.cid), ('a', 'b', 'c'))
+                    self.assertEqual((copy.created, copy.sent), (envelope.created, envelope.sent))
+                    # the process-local route leaves the process as its remaining steps
+                    if copy.route is None:
+                        self.assertEqual(list(copy.steps), [Increment, Collector])
+                    else:
+                        self.assertEqual((copy.route, copy.hop), (route_id, 1))
+                inboxes[0].close()
+        finally:
+            shutil.rmtree(path)
+
+    def test_pipeline_through_mmap_inbox(self):
+        ''' test_serialization.test_pipeline_through_mmap_inbox
+        '''
+        test_name = 'test_serialization.test_pipeline_through_mmap_inbox'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        path = tempfile.mkdtemp()
+        try:
+            system = ActorSystem()
+            head, increment, collector = Head(), Increment(), Collector()
+            increment.inbox = MmapInbox(path, codec='json')
+            for actor in (head, increment, collector):
+                system.add_child(actor)
+
+            for value in range(3):
+                head.inbox.put(dict(value=value))
+            head.start()
+            self.assertEqual([message['value'] for message in collector.results], [1, 2, 3])
+            self.assertTrue(all(envelope.sender == increment.address for envelope in collector.envelopes))
+            increment.inbox.close()
+        finally:
+            shutil.rmtree(path)
+
+if __name__ == '__main__':
+    unittest.main()
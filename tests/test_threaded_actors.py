@@ -3,11 +3,12 @@ if '' not in sys.path:
     sys.path.append('')
 
 import time
+import threading
 import unittest
 
 from pyactors.logs import file_logger
 from pyactors.generator import GeneratorActor
-from pyactors.thread import ThreadedGeneratorActor
+from pyactors.thread import ThreadedGeneratorActor, Dispatcher
 from pyactors.exceptions import EmptyInboxException
 
 from tests import TestGeneratorActor as TestActor
@@ -22,7 +23,7 @@ class ThreadedActor(ThreadedGeneratorActor):
         self.result = 0
     
     def loop(self):
-        for i in xrange(10):
+        for i in range(10):
             if self.processing:
                 self.result += i
                 if self.parent is not None:
@@ -32,6 +33,28 @@ class ThreadedActor(ThreadedGeneratorActor):
                 break
         self.stop()
 
+class DispatchedActor(ThreadedGeneratorActor):
+    ''' DispatchedActor, sums 10 numbers in dispatcher turns
+
+    every step is recorded in `trace`, the first one waits for `gate`
+    '''
+    def __init__(self, name=None, dispatcher=None, throughput=None, trace=None, gate=None):
+        super(DispatchedActor, self).__init__(name=name, dispatcher=dispatcher, throughput=throughput)
+        self.result = 0
+        self.trace = trace if trace is not None else list()
+        self.gate = gate
+
+    def loop(self):
+        if self.gate is not None:
+            self.gate.wait(5)
+        for i in range(10):
+            if not self.processing:
+                break
+            self.result += i
+            self.trace.append(self.name)
+            yield
+        self.stop()
+
 class LongRunningActor(ThreadedGeneratorActor):
     ''' LongRunningActor
     '''
@@ -75,6 +98,30 @@ class ThreadedReceiverActor(ThreadedGeneratorActor):
                 break
         self.stop()
 
+class ThreadedWaitingActor(ThreadedGeneratorActor):
+    ''' Threaded Actor waiting for messages
+    '''
+    def __init__(self, name=None, dispatcher=None):
+        super(ThreadedWaitingActor, self).__init__(name=name, dispatcher=dispatcher)
+        self.messages = list()
+
+    def loop(self):
+        while self.processing:
+            try:
+                self.messages.append(self.inbox.get())
+            except EmptyInboxException:
+                self.waiting = True
+            yield
+        self.stop()
+
+class StubbornActor(ThreadedGeneratorActor):
+    ''' Threaded Actor ignoring stop for a while
+    '''
+    def loop(self):
+        time.sleep(0.5)
+        yield
+        self.stop()
+
 class ThreadedGeneratorActorTest(unittest.TestCase):
 
     def test_incorrect_processing_value_set(self):
@@ -255,5 +302,99 @@ class ThreadedGeneratorActorTest(unittest.TestCase):
         self.assertEqual(
                 [actor.message for actor in parent.find(actor_name='Receiver')],
                 ['message from sender']
-        ) 
-        
+        )
+
+    def test_waiting_actor_wakeup(self):
+        ''' test_threaded_actors.test_waiting_actor_wakeup
+        '''
+        test_name = 'test_threaded_actors.test_waiting_actor_wakeup'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        actor = ThreadedWaitingActor()
+        actor.start()
+        time.sleep(0.1)
+        self.assertTrue(actor.waiting)
+        actor.send('message')
+        for _ in range(100):
+            if actor.messages:
+                break
+            time.sleep(0.01)
+        self.assertEqual(actor.messages, ['message'])
+
+        actor.stop()
+        actor._thread.join(5)
+        self.assertFalse(actor._thread.is_alive())
+
+    def test_dispatcher(self):
+        ''' test_threaded_actors.test_dispatcher
+        '''
+        test_name = 'test_threaded_actors.test_dispatcher'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        dispatcher = Dispatcher(workers=2)
+        threads = threading.active_count()
+        actors = [ThreadedWaitingActor(dispatcher=dispatcher) for _ in range(50)]
+        for actor in actors:
+            self.assertIsNone(actor._thread)
+            actor.start()
+        self.assertEqual(threading.active_count(), threads + 2)
+
+        for i, actor in enumerate(actors):
+            actor.send(i)
+        for _ in range(500):
+            if all(actor.messages for actor in actors):
+                break
+            time.sleep(0.01)
+        self.assertEqual([actor.messages for actor in actors], [[i] for i in range(50)])
+
+        for actor in actors:
+            actor.stop()
+        dispatcher.shutdown()
+        self.assertEqual(threading.active_count(), threads)
+
+    def test_dispatched_actors_with_throughput(self):
+        ''' test_threaded_actors.test_dispatched_actors_with_throughput
+        '''
+        test_name = 'test_threaded_actors.test_dispatched_actors_with_throughput'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        trace = list()
+        gate = threading.Event()
+        dispatcher = Dispatcher(workers=1)
+        actors = [DispatchedActor(name='Actor-{}'.format(i), dispatcher=dispatcher,
+                                  throughput=2, trace=trace, gate=gate) for i in range(3)]
+        # the only worker is held by the first actor until all of them are ready
+        for actor in actors:
+            actor.start()
+        gate.set()
+        for _ in range(500):
+            if not any(actor.processing for actor in actors):
+                break
+            time.sleep(0.01)
+        dispatcher.shutdown()
+        self.assertEqual([actor.result for actor in actors], [45, 45, 45])
+        # every turn ends after `throughput` steps, the actors take turns
+        self.assertEqual(trace, ['Actor-0', 'Actor-0', 'Actor-1', 'Actor-1', 'Actor-2', 'Actor-2'] * 5)
+
+    def test_stop_report(self):
+        ''' test_threaded_actors.test_stop_report
+        '''
+        test_name = 'test_threaded_actors.test_stop_report'
+        logger = file_logger(test_name, filename='logs/%s.log' % test_name)
+
+        parent = GeneratorActor()
+        waiting = ThreadedWaitingActor()
+        stubborn = StubbornActor()
+        parent.add_child(waiting)
+        parent.add_child(stubborn)
+        parent.start()
+        time.sleep(0.1)
+
+        report = parent.stop(timeout=0.1)
+        self.assertFalse(report)
+        self.assertEqual(report.stopped, [waiting])
+        self.assertEqual(report.failed, [stubborn])
+        self.assertIs(parent.stop_report, report)
+        self.assertTrue(stubborn.join(5))
+        self.assertTrue(parent.stop())
+